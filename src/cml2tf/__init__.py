@@ -1,3 +1,3 @@
-from cml2tf import main
+from cml2tf import api, main
 
-__ALL__ = [main]
+__ALL__ = [api, main]
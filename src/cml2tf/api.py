@@ -0,0 +1,214 @@
+# (c) 2023-2024 Piotr Wojciechowski <piotr@it-playground.pl>
+# MIT License (see LICENSE)
+
+import os
+from typing import Dict, Iterable, List, NamedTuple, Optional, Union
+
+from cml2tf.hcl import EMITTERS
+from cml2tf.shards import DEFAULT_SHARD_SIZE, SHARD_MODES
+
+YAML_PARSERS = ("auto", "libyaml", "python")
+
+Source = Union[dict, bytes, str, "os.PathLike[str]"]
+
+
+class ConversionError(Exception):
+    """Raised when a lab topology cannot be read or converted.
+
+    For a topology with integrity errors, errors lists every one of them.
+    """
+
+    def __init__(self, message: str, errors: Iterable[str] = ()) -> None:
+        super().__init__(message)
+        self.errors = list(errors)
+
+
+class ConvertOptions(NamedTuple):
+    """Options of a conversion, the counterpart of the command line flags."""
+
+    configs: bool = False
+    shard: Optional[str] = None
+    shard_size: int = DEFAULT_SHARD_SIZE
+    parser: str = "auto"
+    template_cache: Optional[str] = None
+    emitter: str = "jinja"
+
+
+def yaml_loader(parser: str = "auto") -> type:
+    """
+    Select the YAML loader class used to parse topology files.
+
+    The libyaml based CSafeLoader is considerably faster than the pure-Python
+    SafeLoader but it is only available when PyYAML was built against libyaml.
+    In 'auto' mode the C loader is preferred and the pure-Python loader is used
+    as a fallback.
+
+    :param parser: One of 'auto', 'libyaml' or 'python'.
+    :return: The loader class to pass to yaml.load().
+    :raises ConversionError: If libyaml is requested but not available.
+    """
+
+    import yaml
+
+    if parser not in YAML_PARSERS:
+        raise ValueError(f"Unknown YAML parser '{parser}'")
+    if parser == "python":
+        return yaml.SafeLoader
+    c_loader = getattr(yaml, "CSafeLoader", None)
+    if parser == "libyaml" and c_loader is None:
+        raise ConversionError("PyYAML was built without libyaml support")
+    return c_loader or yaml.SafeLoader
+
+
+def load_topology(source: Source, parser: str = "auto") -> dict:
+    """
+    Load a CML2 topology.
+
+    :param source: The topology as a dictionary, its YAML document as bytes, or
+        the path to its YAML file.
+    :param parser: The YAML parser to use, see yaml_loader().
+    :return: The topology as a dictionary.
+    :raises ConversionError: If the file cannot be read or is not a topology.
+    """
+
+    import yaml
+
+    if isinstance(source, dict):
+        topology = source
+    else:
+        try:
+            if isinstance(source, bytes):
+                topology = yaml.load(source, Loader=yaml_loader(parser))
+            else:
+                with open(source) as file:
+                    topology = yaml.load(file, Loader=yaml_loader(parser))
+        except OSError as error:
+            raise ConversionError(f"Unable to read topology file: {error}") from error
+        except yaml.YAMLError as error:
+            raise ConversionError(f"Invalid topology file: {error}") from error
+    if not isinstance(topology, dict) or not isinstance(topology.get("lab"), dict):
+        raise ConversionError("The topology has no lab information")
+    return topology
+
+
+def convert(source: Source, options: Optional[ConvertOptions] = None) -> Dict[str, str]:
+    """
+    Convert a CML2 topology to the files of a Terraform project, in memory.
+
+    The topology is validated first, and all of its integrity errors are
+    reported in the message of the ConversionError.
+
+    Nothing is written and nothing is printed. Every call works on its own
+    topology model and only shares the thread-safe template environment, so
+    it can be called concurrently from many threads.
+
+    :param source: The topology as a dictionary, its YAML document as bytes, or
+        the path to its YAML file.
+    :param options: The options of the conversion, the defaults if None.
+    :return: A mapping of file names to their content, in the order written.
+    :raises ConversionError: If the topology cannot be read or converted.
+    """
+
+    from cml2tf.configstore import ConfigStore
+    from cml2tf.environment import get_environment
+    from cml2tf.main import stream_main_tf, stream_shard
+    from cml2tf.shards import plan_shards
+    from cml2tf.topology import CML2Topology
+    from cml2tf.validate import check_topology
+
+    options = options or ConvertOptions()
+    if options.parser not in YAML_PARSERS:
+        raise ValueError(f"Unknown YAML parser '{options.parser}'")
+    if options.emitter not in EMITTERS:
+        raise ValueError(f"Unknown emitter '{options.emitter}'")
+    if options.shard is not None and options.shard not in SHARD_MODES:
+        raise ValueError(f"Unknown shard mode '{options.shard}'")
+    if options.shard_size < 1:
+        raise ValueError("Shard size must be at least 1")
+
+    topology_data = load_topology(source, options.parser)
+    try:
+        check_topology(topology_data)
+        topology = CML2Topology(topology_data)
+    except ValueError as error:
+        raise ConversionError(str(error), getattr(error, "errors", ())) from error
+    environment = get_environment(options.template_cache)
+
+    files = {"variables.tf": environment.get_template("variables.tf.j2").render()}
+    nodes, links = topology.get_lab_nodes(), topology.get_lab_links()
+    if options.configs:
+        store = ConfigStore()
+        for node in nodes:
+            for config in node.node_configuration.configs():
+                if not config.empty() and store.add(config):
+                    files[config.filename()] = config.out()
+
+    if options.shard:
+        files["main.tf"] = "".join(
+            stream_main_tf(environment, topology, options, [], [])
+        )
+        for filename, shard_nodes, shard_links in plan_shards(
+            nodes, links, options.shard, options.shard_size
+        ):
+            files[filename] = "".join(
+                stream_shard(environment, options, shard_nodes, shard_links)
+            )
+    else:
+        files["main.tf"] = "".join(stream_main_tf(environment, topology, options))
+    return files
+
+
+def convert_to_directory(
+    source: Source,
+    directory: Union[str, "os.PathLike[str]"],
+    options: Optional[ConvertOptions] = None,
+    force: bool = False,
+) -> List[str]:
+    """
+    Convert a CML2 topology into a Terraform project directory.
+
+    The files are written into a staged directory which replaces the project
+    directory once all of them are written. With force, an existing project
+    directory is replaced, keeping its variables.tf and files which are not
+    generated, like the Terraform state.
+
+    :param source: The topology as a dictionary, its YAML document as bytes, or
+        the path to its YAML file.
+    :param directory: The path of the project directory.
+    :param options: The options of the conversion, the defaults if None.
+    :param force: Replace an existing project directory.
+    :return: The names of the files written.
+    :raises ConversionError: If the topology cannot be converted or written.
+    """
+
+    from cml2tf.manifest import MANIFEST_FILE, Manifest, digest
+    from cml2tf.staging import StagedDirectory
+
+    directory = os.fspath(directory)
+    if os.path.exists(directory) and not force:
+        raise ConversionError(f"Directory '{directory}' already exists")
+    files = convert(source, options)
+    if os.path.exists(os.path.join(directory, "variables.tf")):
+        del files["variables.tf"]
+
+    # The manifest records the files, so files of a previous conversion which
+    # are no longer generated are removed. It has no resource hashes, so the
+    # next incremental conversion renders everything again.
+    previous = Manifest.load(directory)
+    manifest = Manifest(
+        files={
+            filename: digest(content)
+            for filename, content in files.items()
+            if filename != "variables.tf"
+        }
+    )
+    try:
+        with StagedDirectory(directory) as staging:
+            for filename, content in files.items():
+                staging.write(filename, content)
+            manifest.record_fingerprints(staging.path, previous)
+            staging.write(MANIFEST_FILE, manifest.dumps())
+            staging.commit(drop=previous.files.keys() - manifest.files.keys())
+    except OSError as error:
+        raise ConversionError(f"Unable to write '{directory}': {error}") from error
+    return list(files)
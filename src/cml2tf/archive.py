@@ -0,0 +1,84 @@
+# (c) 2023-2024 Piotr Wojciechowski <piotr@it-playground.pl>
+# MIT License (see LICENSE)
+
+import contextlib
+import gzip
+import io
+import os
+import tarfile
+import tempfile
+from typing import BinaryIO, Dict
+
+# Suffixes of archive paths which are compressed with gzip
+GZIP_SUFFIXES = (".gz", ".tgz")
+
+
+def is_gzip_path(path: str) -> bool:
+    """
+    Check whether an archive path asks for gzip compression.
+
+    :param path: The path of the archive.
+    :return: True if the path ends in one of GZIP_SUFFIXES.
+    """
+
+    return path.lower().endswith(GZIP_SUFFIXES)
+
+
+def write_archive(
+    files: Dict[str, str], fileobj: BinaryIO, compress: bool = False
+) -> None:
+    """
+    Write the files of a Terraform project into a tar archive.
+
+    The archive is written as a stream, so the file object does not have to
+    be seekable, like a pipe to stdout. Members have no timestamp, and the
+    gzip header has neither a timestamp nor a file name, so the same files
+    always give the same archive, compressed or not.
+
+    :param files: A mapping of file names to their content.
+    :param fileobj: The binary file object to write the archive to.
+    :param compress: Compress the archive with gzip.
+    :return: None
+    :raises OSError: If the archive cannot be written.
+    """
+
+    stream = (
+        gzip.GzipFile(filename="", mode="wb", fileobj=fileobj, mtime=0)
+        if compress
+        else contextlib.nullcontext(fileobj)
+    )
+    with stream as target, tarfile.open(fileobj=target, mode="w|") as archive:
+        for filename, content in files.items():
+            data = content.encode()
+            info = tarfile.TarInfo(filename)
+            info.size = len(data)
+            info.mode = 0o644
+            archive.addfile(info, io.BytesIO(data))
+
+
+def save_archive(files: Dict[str, str], path: str, compress: bool = False) -> None:
+    """
+    Save the files of a Terraform project as a tar archive file.
+
+    The archive is written into a temporary sibling of the path, which then
+    replaces the path, so a failed write leaves an existing archive untouched.
+
+    :param files: A mapping of file names to their content.
+    :param path: The path of the archive.
+    :param compress: Compress the archive with gzip.
+    :return: None
+    :raises OSError: If the archive cannot be written.
+    """
+
+    directory, name = os.path.split(os.path.abspath(path))
+    handle, staged = tempfile.mkstemp(
+        prefix=f".{name}.", suffix=".staged", dir=directory
+    )
+    try:
+        with os.fdopen(handle, "wb") as file:
+            write_archive(files, file, compress)
+        os.chmod(staged, 0o644)
+        os.replace(staged, path)
+    except BaseException:
+        os.unlink(staged)
+        raise
@@ -0,0 +1,151 @@
+# (c) 2023-2024 Piotr Wojciechowski <piotr@it-playground.pl>
+# MIT License (see LICENSE)
+
+import contextlib
+import glob
+import io
+import os
+from argparse import Namespace
+from typing import List, NamedTuple, Optional
+
+
+class BatchResult(NamedTuple):
+    input: str
+    outdir: str
+    ok: bool
+    message: str
+
+
+def expand_inputs(inputs: List[str]) -> List[str]:
+    """
+    Expand the input arguments into a list of topology files.
+
+    Every input can be a topology file, a directory, in which case all YAML
+    files in it are used, or a glob pattern.
+
+    :param inputs: The input arguments as given on the command line.
+    :return: The list of topology files, in the order they were given.
+    """
+
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            files.extend(
+                sorted(
+                    glob.glob(os.path.join(item, "*.yaml"))
+                    + glob.glob(os.path.join(item, "*.yml"))
+                )
+            )
+        elif is_pattern(item):
+            files.extend(sorted(glob.glob(item)))
+        else:
+            files.append(item)
+    return files
+
+
+def is_pattern(item: str) -> bool:
+    """
+    Check whether an input argument is a glob pattern.
+
+    :param item: The input argument.
+    :return: True if the argument contains glob wildcards.
+    """
+
+    return any(char in item for char in "*?[")
+
+
+def _init_worker(template_cache: Optional[str]) -> None:
+    """
+    Initialize a worker process of the batch conversion pool.
+
+    The Jinja environment is created once per worker and reused for every lab
+    converted by that worker.
+
+    :param template_cache: The directory of the template bytecode cache.
+    :return: None
+    """
+
+    from cml2tf.environment import get_environment
+
+    get_environment(template_cache)
+
+
+def convert_lab(
+    yaml_file: str, outdir: str, flags: Namespace, capture: bool = True
+) -> BatchResult:
+    """
+    Convert a single lab and report the result instead of exiting.
+
+    The converter reports errors by printing and exiting. With capture, as in
+    the worker processes of a batch, its output is captured and the last line
+    is used as the error message of a failed lab. Without capture, the output
+    is printed as the conversion goes.
+
+    :param yaml_file: The path to the YAML file containing the CML2 topology.
+    :param outdir: The output directory for the lab.
+    :param flags: provided command line flags
+    :param capture: Capture the output of the converter instead of printing it.
+    :return: The result of the conversion.
+    """
+
+    from cml2tf.main import convert_topology_file
+
+    output = io.StringIO()
+    try:
+        with (
+            contextlib.redirect_stdout(output) if capture else contextlib.nullcontext()
+        ):
+            convert_topology_file(yaml_file, outdir, flags)
+    except SystemExit as error:
+        if not capture:
+            return BatchResult(yaml_file, outdir, False, f"exit status {error.code}")
+        lines = output.getvalue().strip().splitlines()
+        return BatchResult(yaml_file, outdir, False, lines[-1] if lines else "")
+    except Exception as error:
+        return BatchResult(yaml_file, outdir, False, f"Error: {error!r}")
+    return BatchResult(yaml_file, outdir, True, "")
+
+
+def batch_convert(
+    labs: List[str], outdirs: List[str], flags: Namespace, jobs: Optional[int]
+) -> List[BatchResult]:
+    """
+    Convert many labs using a pool of worker processes.
+
+    Every lab is converted into its own output directory. A lab that fails to
+    convert does not abort the remaining labs.
+
+    :param labs: The paths to the YAML files containing the CML2 topologies.
+    :param outdirs: The output directory of each lab.
+    :param flags: provided command line flags
+    :param jobs: The number of worker processes (by default the CPU count).
+    :return: The result of every conversion, in the order of the labs.
+    """
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(getattr(flags, "template_cache", None),),
+    ) as pool:
+        return list(
+            pool.map(convert_lab, labs, outdirs, [flags] * len(labs), chunksize=1)
+        )
+
+
+def print_summary(results: List[BatchResult]) -> None:
+    """
+    Print the per-lab summary of a batch conversion.
+
+    :param results: The results returned by batch_convert().
+    :return: None
+    """
+
+    for result in results:
+        if result.ok:
+            print(f"OK      {result.input} -> {result.outdir}")
+        else:
+            print(f"FAILED  {result.input}: {result.message}")
+    converted = sum(result.ok for result in results)
+    print(f"Converted {converted} of {len(results)} labs")
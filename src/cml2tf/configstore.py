@@ -0,0 +1,75 @@
+# (c) 2023-2024 Piotr Wojciechowski <piotr@it-playground.pl>
+# MIT License (see LICENSE)
+
+from typing import TYPE_CHECKING, Dict
+
+from cml2tf.manifest import digest, encoded_size
+
+if TYPE_CHECKING:
+    from cml2tf.topology.nodeconfig import NodeConfig
+
+
+class ConfigStore:
+    """Content-addressed store of node configuration files.
+
+    Cloned routers and hosts often share byte-identical configurations. Every
+    distinct configuration is stored once, in the file named after the first
+    node using it, and all other nodes with the same configuration reference
+    that file.
+    """
+
+    def __init__(self) -> None:
+        self.files: Dict[str, str] = {}
+        self._by_digest: Dict[str, str] = {}
+        self.references = 0
+        self.bytes_referenced = 0
+        self.bytes_stored = 0
+
+    def add(self, config: "NodeConfig") -> bool:
+        """
+        Add a node configuration to the store.
+
+        A configuration identical to one already stored is pointed at the file
+        of that configuration.
+
+        :param config: The node configuration.
+        :return: True if the configuration needs a file of its own.
+        """
+
+        content = config.out()
+        content_digest = digest(content)
+        size = encoded_size(content)
+        self.references += 1
+        self.bytes_referenced += size
+
+        filename = self._by_digest.get(content_digest)
+        if filename is not None:
+            config.store(filename)
+            return False
+        filename = config.filename()
+        self._by_digest[content_digest] = filename
+        self.files[filename] = content_digest
+        self.bytes_stored += size
+        return True
+
+    def ratio(self) -> float:
+        """
+        Return the deduplication ratio of the stored configurations.
+
+        :return: The number of configurations per stored file.
+        """
+
+        return self.references / len(self.files) if self.files else 1.0
+
+    def summary(self) -> str:
+        """
+        Describe the deduplication of the stored configurations.
+
+        :return: A one line summary.
+        """
+
+        return (
+            f"{self.references} configurations stored in {len(self.files)} files "
+            + f"(dedup ratio {self.ratio():.1f}x, "
+            + f"{self.bytes_referenced - self.bytes_stored} bytes saved)."
+        )
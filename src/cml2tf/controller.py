@@ -0,0 +1,216 @@
+# (c) 2023-2024 Piotr Wojciechowski <piotr@it-playground.pl>
+# MIT License (see LICENSE)
+
+import http.client
+import json
+import queue
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+from urllib.parse import quote, urlsplit
+
+API_PATH = "/api/v0"
+
+# HTTP status codes worth retrying, the request may succeed later
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class ControllerError(Exception):
+    """Raised when a lab cannot be read from the CML controller."""
+
+
+class CMLController:
+    """Read lab topologies from a CML2 controller over its REST API.
+
+    All requests share a pool of persistent HTTP connections, one per worker
+    at most. The topology of a lab is fetched without the node configurations,
+    which are then fetched concurrently by up to 'workers' threads. Failed
+    requests are retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        username: str,
+        password: str,
+        verify: bool = True,
+        workers: int = 8,
+        retries: int = 3,
+        backoff: float = 0.5,
+        timeout: float = 30.0,
+    ) -> None:
+        parts = urlsplit(url if "://" in url else f"https://{url}")
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ControllerError(f"Invalid controller URL '{url}'")
+        self._scheme = parts.scheme
+        self._host = parts.hostname
+        self._port = parts.port
+        self._base = parts.path.rstrip("/") + API_PATH
+        self._username = username
+        self._password = password
+        self._ssl_context = None
+        if self._scheme == "https":
+            self._ssl_context = ssl.create_default_context()
+            if not verify:
+                self._ssl_context.check_hostname = False
+                self._ssl_context.verify_mode = ssl.CERT_NONE
+        self._workers = workers
+        self._retries = retries
+        self._backoff = backoff
+        self._timeout = timeout
+        self._pool: queue.LifoQueue = queue.LifoQueue()
+        self._token: Optional[str] = None
+        self._token_lock = threading.Lock()
+
+    def __enter__(self) -> "CMLController":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close all pooled connections.
+
+        :return: None
+        """
+
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    @contextmanager
+    def _connection(self) -> Iterator[http.client.HTTPConnection]:
+        """
+        Borrow a connection from the pool, or open a new one.
+
+        A connection that failed is closed instead of being returned to the pool.
+
+        :return: The connection.
+        """
+
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            if self._scheme == "https":
+                connection = http.client.HTTPSConnection(
+                    self._host,
+                    self._port,
+                    timeout=self._timeout,
+                    context=self._ssl_context,
+                )
+            else:
+                connection = http.client.HTTPConnection(
+                    self._host, self._port, timeout=self._timeout
+                )
+        try:
+            yield connection
+        except BaseException:
+            connection.close()
+            raise
+        self._pool.put(connection)
+
+    def _request(self, method: str, path: str, body=None, auth: bool = True):
+        """
+        Send an API request and return its decoded JSON response.
+
+        Connection errors and responses with a retryable status code are retried
+        up to 'retries' times, waiting 'backoff' seconds, doubled every time.
+
+        :param method: The HTTP method.
+        :param path: The API path, relative to the API base path.
+        :param body: The request body, encoded as JSON.
+        :param auth: If True then authenticate first and send the token.
+        :return: The decoded response.
+        :raises ControllerError: If the request fails.
+        """
+
+        headers = {"Accept": "application/json"}
+        if auth:
+            headers["Authorization"] = f"Bearer {self._authenticate()}"
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+
+        for attempt in range(self._retries + 1):
+            try:
+                with self._connection() as connection:
+                    connection.request(
+                        method, self._base + path, body=payload, headers=headers
+                    )
+                    response = connection.getresponse()
+                    data = response.read()
+            except (OSError, http.client.HTTPException) as error:
+                problem = f"{type(error).__name__}: {error}"
+            else:
+                if response.status < 300:
+                    try:
+                        return json.loads(data)
+                    except ValueError as error:
+                        raise ControllerError(
+                            f"Invalid response to {method} {path}: {error}"
+                        ) from None
+                problem = f"HTTP {response.status} {response.reason}"
+                if response.status not in RETRY_STATUS:
+                    break
+            if attempt < self._retries:
+                time.sleep(self._backoff * 2**attempt)
+        raise ControllerError(f"{method} {path} failed: {problem}")
+
+    def _authenticate(self) -> str:
+        """
+        Return the API token, authenticating on first use.
+
+        :return: The API token.
+        """
+
+        with self._token_lock:
+            if self._token is None:
+                self._token = self._request(
+                    "POST",
+                    "/authenticate",
+                    {"username": self._username, "password": self._password},
+                    auth=False,
+                )
+        return self._token
+
+    def lab_ids(self) -> List[str]:
+        """
+        List all labs on the controller.
+
+        :return: The IDs of the labs.
+        """
+
+        return self._request("GET", "/labs")
+
+    def lab_topology(self, lab_id: str) -> dict:
+        """
+        Read the topology of a lab, including all node configurations.
+
+        The result has the same structure as a topology exported to YAML, so it
+        can be converted the same way.
+
+        :param lab_id: The ID of the lab.
+        :return: A dictionary representing the CML2 topology.
+        """
+
+        lab_path = f"/labs/{quote(lab_id, safe='')}"
+        topology = self._request(
+            "GET", f"{lab_path}/topology?exclude_configurations=true"
+        )
+        nodes = topology.get("nodes") or []
+
+        def fetch_config(node: dict) -> None:
+            node_path = f"{lab_path}/nodes/{quote(node['id'], safe='')}"
+            node["configuration"] = self._request("GET", f"{node_path}/config")
+
+        with ThreadPoolExecutor(max_workers=self._workers) as pool:
+            # list() raises the first error of the fetches
+            list(pool.map(fetch_config, nodes))
+        return topology
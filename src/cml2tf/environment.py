@@ -0,0 +1,71 @@
+# (c) 2023-2024 Piotr Wojciechowski <piotr@it-playground.pl>
+# MIT License (see LICENSE)
+
+import os
+from functools import lru_cache
+from typing import Optional
+
+from jinja2 import Environment, FileSystemBytecodeCache, PackageLoader
+
+from cml2tf.hcl import hcl_heredoc, hcl_string
+
+
+def package_version() -> str:
+    """
+    Return the installed version of the cml2tf package.
+
+    :return: The version string, or 'unknown' when the package is not installed.
+    """
+
+    try:
+        from importlib.metadata import PackageNotFoundError, version
+    except ImportError:  # pragma: no cover
+        return "unknown"
+    try:
+        return version("cml2tf")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def default_template_cache_dir() -> str:
+    """
+    Return the default directory of the template bytecode cache.
+
+    The cache lives in the user cache directory, separately for every installed
+    version of the package.
+
+    :return: The path to the cache directory.
+    """
+
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "cml2tf", package_version())
+
+
+@lru_cache(maxsize=None)
+def get_environment(template_cache: Optional[str] = None) -> Environment:
+    """
+    Return the Jinja environment used to render the Terraform templates.
+
+    The environment is created once per process and cache directory and then
+    reused, so templates are compiled only once per process. When a cache
+    directory is given, the compiled templates are also stored on disk and
+    reused by later processes. The 'hcl' and 'heredoc' filters escape values
+    for quoted HCL strings and heredocs.
+
+    :param template_cache: The directory of the bytecode cache, or None to not
+        use an on-disk cache.
+    :return: The Jinja environment.
+    """
+
+    bytecode_cache = None
+    if template_cache:
+        os.makedirs(template_cache, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(template_cache)
+    environment = Environment(
+        loader=PackageLoader("cml2tf"), bytecode_cache=bytecode_cache
+    )
+    environment.filters["hcl"] = hcl_string
+    environment.filters["heredoc"] = hcl_heredoc
+    return environment
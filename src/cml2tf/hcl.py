@@ -0,0 +1,277 @@
+# (c) 2023-2024 Piotr Wojciechowski <piotr@it-playground.pl>
+# MIT License (see LICENSE)
+
+import re
+from argparse import Namespace
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+
+if TYPE_CHECKING:
+    from cml2tf.topology import CML2Topology, LinkRecord, NodeRecord
+    from cml2tf.topology.nodeconfig import NodeConfig
+
+EMITTERS = ("jinja", "direct")
+
+# Characters which have to be escaped in a quoted HCL string, and the
+# sequences which would otherwise start a template interpolation or directive
+_QUOTED_SPECIAL = re.compile(r'[\\"\n\r\t]|[$%]\{')
+_QUOTED_ESCAPES = str.maketrans(
+    {"\\": "\\\\", '"': '\\"', "\n": "\\n", "\r": "\\r", "\t": "\\t"}
+)
+
+MAIN_TF_HEADER = """terraform {
+  required_providers {
+    cml2 = {
+      source = "registry.terraform.io/ciscodevnet/cml2"
+      version = ">=0.8.0"
+    }
+  }
+}
+
+provider "cml2" {
+  address  = var.address
+  username = var.username
+  password = var.password
+}
+
+resource "cml2_lab" "this" {
+"""
+
+LIFECYCLE_HEADER = """resource "cml2_lifecycle" "lc" {
+  lab_id     = cml2_lab.this.id
+  # elements is still required up to version 0.7.0
+  elements   = []
+  # depends_on is the "native" replacement for elements
+  depends_on = ["""
+
+
+def hcl_string(value) -> str:
+    """
+    Escape a value for a quoted HCL string.
+
+    Backslashes, quotes and control characters are escaped, and '${' and '%{'
+    are doubled so Terraform does not treat them as template sequences.
+
+    :param value: The value, which is converted to a string first.
+    :return: The escaped string, without the surrounding quotes.
+    """
+
+    text = str(value)
+    if _QUOTED_SPECIAL.search(text) is None:
+        return text
+    text = text.translate(_QUOTED_ESCAPES)
+    return text.replace("${", "$${").replace("%{", "%%{")
+
+
+def hcl_heredoc(text: str) -> str:
+    """
+    Escape text for an HCL heredoc.
+
+    Heredocs are templates like quoted strings, but need no other escaping.
+
+    :param text: The text of the heredoc.
+    :return: The text with '${' and '%{' doubled.
+    """
+
+    if "{" not in text:
+        return text
+    return text.replace("${", "$${").replace("%{", "%%{")
+
+
+def _config_attribute(
+    attribute: str, config: "NodeConfig", in_file: bool, indent: int
+) -> str:
+    """
+    Emit the attribute holding the content of a node configuration.
+
+    :param attribute: The attribute name with its padding and equals sign.
+    :param config: The node configuration.
+    :param in_file: Reference the configuration file instead of the content.
+    :param indent: The indentation of heredoc content, the attribute is
+        indented two spaces less.
+    :return: The attribute, starting with a newline.
+    """
+
+    margin = " " * (indent - 2)
+    if in_file:
+        return f'\n{margin}{attribute} file("{hcl_string(config.filename())}")'
+    if config.oneline():
+        return f'\n{margin}{attribute} "{hcl_string(config.out())}"'
+    return (
+        f"\n{margin}{attribute} <<-EOT\n"
+        + hcl_heredoc(config.out(indent=indent))
+        + f"\n{margin}EOT"
+    )
+
+
+def _heredoc_chunks(attribute: str, config: "NodeConfig", indent: int) -> Iterator[str]:
+    """
+    Emit the heredoc attribute of a large node configuration in chunks.
+
+    The configuration is indented and escaped chunk by chunk, so it is never
+    copied as a whole. Chunks end at line boundaries, so no escaped sequence
+    is split.
+
+    :param attribute: The attribute name with its padding and equals sign.
+    :param config: The node configuration.
+    :param indent: The indentation of heredoc content.
+    :return: An iterator of the chunks of the attribute, starting with a
+        newline.
+    """
+
+    margin = " " * (indent - 2)
+    yield f"\n{margin}{attribute} <<-EOT\n"
+    for chunk in config.chunks(indent=indent):
+        yield hcl_heredoc(chunk)
+    yield f"\n{margin}EOT"
+
+
+def emit_node(
+    node: "NodeRecord", configs: bool, large_size: Optional[int] = None
+) -> Iterator[str]:
+    """
+    Emit the cml2_node resource of a node.
+
+    The resource is emitted as one chunk, unless it has a heredoc of a
+    configuration larger than large_size, which is emitted in chunks.
+
+    :param node: The node record.
+    :param configs: Reference configuration files instead of the content.
+    :param large_size: The size above which configurations are emitted in
+        chunks, None to never emit them in chunks.
+    :return: An iterator of the chunks of the resource block, like the
+        node_resource template macro.
+    """
+
+    parts = [
+        f'\nresource "cml2_node" "{node.node_name}" {{\n'
+        + "  lab_id         = cml2_lab.this.id\n"
+        + f'  label          = "{hcl_string(node.node_name)}"\n'
+        + f'  nodedefinition = "{hcl_string(node.node_definition)}"'
+    ]
+
+    def add_config(attribute: str, config: "NodeConfig", in_file: bool, indent: int):
+        if (
+            large_size is None
+            or in_file
+            or config.size() <= large_size
+            or config.oneline()
+        ):
+            parts.append(_config_attribute(attribute, config, in_file, indent))
+            return
+        yield "".join(parts)
+        parts.clear()
+        yield from _heredoc_chunks(attribute, config, indent)
+
+    if node.node_image_definition is not None:
+        parts.append(
+            f'\n  imagedefinition = "{hcl_string(node.node_image_definition)}"'
+        )
+    node_config = node.node_configuration
+    if not node_config.empty():
+        if node_config.multi():
+            parts.append("\n  configurations = [")
+            for config in node_config.configs():
+                parts.append(f'\n    {{\n      name    = "{hcl_string(config.name())}"')
+                yield from add_config(
+                    "content =", config, configs and not config.empty(), 8
+                )
+                parts.append("\n    },")
+            parts.append("\n  ]")
+        else:
+            yield from add_config("configuration  =", node_config, configs, 4)
+    parts.append(
+        f"\n  x              = {node.node_x}\n  y              = {node.node_y}"
+    )
+    if len(node.node_tags) > 0:
+        tags = ",".join(f'"{hcl_string(tag)}"' for tag in node.node_tags)
+        parts.append(f"\n  tags           = [{tags}]")
+    parts.append("\n}\n")
+    yield "".join(parts)
+
+
+def emit_link(link: "LinkRecord") -> str:
+    """
+    Emit the cml2_link resource of a link.
+
+    :param link: The link record.
+    :return: The resource block, like the link_resource template macro.
+    """
+
+    return (
+        f'\nresource "cml2_link" "{link.link_name}" {{\n'
+        + "  lab_id         = cml2_lab.this.id\n"
+        + f"  node_a         = cml2_node.{link.node_a}.id\n"
+        + f"  slot_a         = {link.slot_a}\n"
+        + f"  node_b         = cml2_node.{link.node_b}.id\n"
+        + f"  slot_b         = {link.slot_b}\n"
+        + "}\n"
+    )
+
+
+def emit_main_tf(
+    topology: "CML2Topology",
+    flags: Namespace,
+    lab_nodes: Optional[Iterable["NodeRecord"]] = None,
+    lab_links: Optional[Iterable["LinkRecord"]] = None,
+    large_size: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Emit main.tf as a stream of text chunks, without the template engine.
+
+    The output is byte-identical to the main.tf.j2 template, one chunk is
+    emitted per resource, except for large configurations, see emit_node().
+
+    :param topology: The topology to emit.
+    :param flags: provided command line flags
+    :param lab_nodes: The nodes to emit (by default all nodes), which can be
+        an iterator reading them while main.tf is emitted.
+    :param lab_links: The links to emit (by default all links).
+    :param large_size: The size above which configurations are emitted in
+        chunks, None to never emit them in chunks.
+    :return: An iterator of the main.tf chunks.
+    """
+
+    configs = getattr(flags, "configs", False)
+    lab = [MAIN_TF_HEADER, f'  title = "{hcl_string(topology.get_lab_info_title())}"']
+    for text in (topology.get_lab_info_description(), topology.get_lab_info_notes()):
+        if text is not None:
+            lab.append(f'\n  description = "{hcl_string(text)}"')
+    lab.append("\n}\n\n")
+    yield "".join(lab)
+
+    for node in topology.get_lab_nodes() if lab_nodes is None else lab_nodes:
+        yield from emit_node(node, configs, large_size)
+    yield "\n\n"
+    for link in topology.get_lab_links() if lab_links is None else lab_links:
+        yield emit_link(link)
+    yield "\n\n"
+
+    lifecycle = [LIFECYCLE_HEADER]
+    for link in topology.get_lab_links():
+        lifecycle.append(f"\n    cml2_link.{link.link_name},")
+    lifecycle.append('\n  ]\n  state = "STARTED"\n}')
+    yield "".join(lifecycle)
+
+
+def emit_shard(
+    lab_nodes: Iterable["NodeRecord"],
+    lab_links: Iterable["LinkRecord"],
+    flags: Namespace,
+    large_size: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Emit a shard as a stream of text chunks, without the template engine.
+
+    :param lab_nodes: The nodes of the shard.
+    :param lab_links: The links of the shard.
+    :param flags: provided command line flags
+    :param large_size: The size above which configurations are emitted in
+        chunks, None to never emit them in chunks.
+    :return: An iterator of the shard chunks, like the shard.tf.j2 template.
+    """
+
+    configs = getattr(flags, "configs", False)
+    for node in lab_nodes:
+        yield from emit_node(node, configs, large_size)
+    for link in lab_links:
+        yield emit_link(link)
@@ -1,22 +1,46 @@
 # (c) 2023-2024 Piotr Wojciechowski <piotr@it-playground.pl>
 # MIT License (see LICENSE)
 
+import json
 import os
 import sys
 from argparse import ArgumentParser, Namespace
+from typing import TYPE_CHECKING, BinaryIO, Iterable, List, Optional, Union
 
-import yaml
-from jinja2 import Environment, PackageLoader
+from cml2tf.api import YAML_PARSERS
+from cml2tf.hcl import EMITTERS
+from cml2tf.shards import DEFAULT_SHARD_SIZE, SHARD_MODES
 
-from cml2tf.topology import CML2Topology
+# Heavy imports (yaml, jinja2, the topology model, ...) are done where they
+# are needed, so that 'cml2tf -h' and argument errors return quickly.
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from jinja2 import Environment
+    from jinja2.environment import TemplateStream
+
+    from cml2tf.configstore import ConfigStore
+    from cml2tf.manifest import Manifest
+    from cml2tf.metrics import Metrics, NullMetrics
+    from cml2tf.staging import StagedDirectory
+    from cml2tf.topology import CML2Topology
 
 # TODO: Improve exceptions handling
 
 
+# Number of template output chunks joined before they are written to disk
+STREAM_BUFFER_SIZE = 64
+
+# Templates the Terraform files are rendered from
+TERRAFORM_TEMPLATES = ("main.tf.j2", "resources.tf.j2", "shard.tf.j2")
+
+
 def cml_to_terraform_convert(
     cml2topology: dict,
     project_name: str,
     flags: Namespace,
+    environment: Optional["Environment"] = None,
+    metrics: Optional["NullMetrics"] = None,
 ) -> None:
     """
     Convert a CML2 topology to Terraform configuration files.
@@ -24,47 +48,769 @@ def cml_to_terraform_convert(
     This function takes a CML2 topology and a project name, then generates
     Terraform configuration files for the given topology. It creates a new
     Terraform project directory, renders 'variables.tf' and 'main.tf' templates
-    with the topology data, and saves them to the project directory.
+    with the topology data, and saves them to the project directory. With the
+    configs flag set, the node configurations are written to their own files
+    in the project directory while 'main.tf' is rendered.
+
+    A manifest with the content hashes of all resources and files is kept in
+    the project directory. When converting into an existing project, 'main.tf'
+    is only rendered again if a resource changed and configuration files are
+    only rewritten if their content changed.
 
     :param cml2topology: The CML2 topology data as a dictionary.
     :param project_name: The name of the Terraform project to be created.
     :param flags: provided command line flags
+    :param environment: The Jinja environment to render the templates with
+        (by default the shared environment of the process).
+    :param metrics: The collector of timings and counters, if requested.
     """
 
+    from concurrent.futures import ThreadPoolExecutor
+
+    from cml2tf.configstore import ConfigStore
+    from cml2tf.environment import get_environment
+    from cml2tf.manifest import Manifest, encoded_size, resource_digests
+    from cml2tf.metrics import NULL_METRICS
+    from cml2tf.shards import Shard, plan_shards
+    from cml2tf.staging import StagedDirectory
+    from cml2tf.topology import CML2Topology
+
+    metrics = metrics or NULL_METRICS
+    large_size = large_config_size(flags)
+
+    # Check the whole topology before anything is rendered or written
+    validate_topology_or_exit(cml2topology, metrics)
+
     # Create topology object based on the topology YAML
-    topology = CML2Topology(cml2topology)
+    with metrics.phase("model"):
+        topology = CML2Topology(cml2topology)
+    if metrics.enabled:
+        metrics.count("nodes", len(topology.get_lab_nodes()))
+        metrics.count("links", len(topology.get_lab_links()))
+        metrics.count(
+            "config_bytes",
+            sum(
+                encoded_size(config.out())
+                for node in topology.get_lab_nodes()
+                for config in node.node_configuration.configs()
+            ),
+        )
 
     # Create directory for a new Terraform project
     create_directory(project_name, flags.force)
 
     # Render variables.tf from template
-    environment = Environment(loader=PackageLoader("cml2tf"))
+    if environment is None:
+        environment = get_environment(getattr(flags, "template_cache", None))
+    # Stage all output next to the project directory and swap it in at once
+    try:
+        with StagedDirectory(project_name) as staging:
+            render_variables_tf(environment, staging, flags, metrics)
+
+            shard_mode = getattr(flags, "shard", None)
+            with metrics.phase("hash"):
+                settings = conversion_settings(environment, flags)
+                previous = Manifest.load(project_name)
+                manifest = Manifest(resource_digests(cml2topology, settings))
+                changed = manifest.changed_resources(previous)
+            skipped = 0
+
+            # Write node configurations in the background while main.tf is rendered
+            with ThreadPoolExecutor() as pool, metrics.phase("write"):
+                config_writes, config_files = [], []
+                store = ConfigStore()
+                if settings["configs"]:
+                    for node in topology.get_lab_nodes():
+                        for config in configs_to_write(
+                            node, store, manifest, previous, project_name
+                        ):
+                            config_writes.append(
+                                pool.submit(config.fileout, staging.path, large_size)
+                            )
+                            config_files.append(staging.file(config.filename()))
+                    skipped += len(store.files) - len(config_files)
+
+                # The hash of a Terraform file is derived from the hashes of the
+                # resources it is rendered from, so it is only rendered when one of
+                # them changed. With sharding, every shard is rendered on its own.
+                nodes, links = topology.get_lab_nodes(), topology.get_lab_links()
+                lifecycle = [link.link_name for link in links]
+                if shard_mode:
+                    shards = plan_shards(
+                        nodes, links, shard_mode, settings["shard_size"]
+                    )
+                    terraform_files = [Shard("main.tf", [], [])] + shards
+                else:
+                    terraform_files = [Shard("main.tf", nodes, links)]
+                for filename, shard_nodes, shard_links in terraform_files:
+                    manifest.files[filename] = terraform_file_digest(
+                        manifest,
+                        filename,
+                        [node.node_id for node in shard_nodes],
+                        [link.link_name for link in shard_links],
+                        lifecycle,
+                        [node_config_files(node) for node in shard_nodes]
+                        if settings["configs"]
+                        else None,
+                    )
+                    if previous.unchanged(
+                        project_name, filename, manifest.files[filename]
+                    ):
+                        skipped += 1
+                        continue
+
+                    # Render the file from template straight to the staged directory
+                    if filename == "main.tf":
+                        content = stream_main_tf(
+                            environment, topology, flags, shard_nodes, shard_links
+                        )
+                    else:
+                        content = stream_shard(
+                            environment, flags, shard_nodes, shard_links
+                        )
+                    path = staging.write(filename, metrics.timed(content, "render"))
+                    metrics.file_written(path)
+
+                wait_for_config_writes(config_writes)
+                if store.references:
+                    print(store.summary())
+                for path in config_files:
+                    metrics.file_written(path)
+
+                commit_output(staging, previous, manifest, metrics)
+    except OSError as error:
+        print(f"Error: Unable to save Terraform project '{project_name}'. {error}")
+        exit(1)
+    print(
+        f"{len(changed)} of {len(manifest.resources)} resources changed, "
+        + f"{skipped} of {len(manifest.files)} unchanged files skipped."
+    )
+
 
-    # change into output directory
-    os.chdir(project_name)
+def cml_to_terraform_stream(
+    yaml_file: str,
+    project_name: str,
+    flags: Namespace,
+    environment: Optional["Environment"] = None,
+    metrics: Optional["NullMetrics"] = None,
+) -> None:
+    """
+    Convert a CML2 topology file to Terraform without loading it at once.
+
+    The topology file is read as a stream of YAML events, twice: first its
+    skeleton, which is the lab information, the links and the node fields
+    needed to resolve them, then the nodes one at a time. Every node is
+    rendered into 'main.tf' and its configuration files are written before
+    the next node is read, so memory use grows with the largest node instead
+    of the whole lab. Sharding is not supported and 'main.tf' is always
+    rendered, unchanged configuration files are skipped like in
+    cml_to_terraform_convert().
+
+    :param yaml_file: The path to the YAML file containing the CML2 topology.
+    :param project_name: The name of the Terraform project to be created.
+    :param flags: provided command line flags
+    :param environment: The Jinja environment to render the templates with
+        (by default the shared environment of the process).
+    :param metrics: The collector of timings and counters, if requested.
+    """
+
+    from cml2tf.configstore import ConfigStore
+    from cml2tf.environment import get_environment
+    from cml2tf.manifest import (
+        Manifest,
+        encoded_size,
+        resource_digest,
+        resource_digests,
+    )
+    from cml2tf.metrics import NULL_METRICS
+    from cml2tf.reader import iter_nodes, scan_topology
+    from cml2tf.staging import StagedDirectory
+    from cml2tf.topology import CML2Topology
+
+    metrics = metrics or NULL_METRICS
+    large_size = large_config_size(flags)
+    loader = get_yaml_loader(getattr(flags, "parser", "auto"))
+
+    # Read the lab, the links and what is needed to resolve them
+    try:
+        with metrics.phase("read"):
+            skeleton = scan_topology(yaml_file, loader)
+    except OSError as error:
+        print(f"Error reading topology file: {error}")
+        exit(1)
+    validate_topology_or_exit(skeleton, metrics)
+    with metrics.phase("model"):
+        topology = CML2Topology(skeleton)
+    links = topology.get_lab_links()
+    metrics.count("nodes", len(topology.get_lab_nodes()))
+    metrics.count("links", len(links))
+
+    create_directory(project_name, flags.force)
+    if environment is None:
+        environment = get_environment(getattr(flags, "template_cache", None))
+    try:
+        with StagedDirectory(project_name) as staging:
+            render_variables_tf(environment, staging, flags, metrics)
+
+            with metrics.phase("hash"):
+                settings = conversion_settings(environment, flags)
+                previous = Manifest.load(project_name)
+                manifest = Manifest(
+                    resource_digests({**skeleton, "nodes": []}, settings)
+                )
+            store = ConfigStore()
+            node_ids, config_files, written = [], [], []
+
+            def lab_nodes():
+                nodes = iter_nodes(yaml_file, loader)
+                while True:
+                    with metrics.phase("read"):
+                        node = next(nodes, None)
+                    if node is None:
+                        return
+                    with metrics.phase("hash"):
+                        node_ids.append(node.get("id"))
+                        manifest.resources[f"node:{node.get('id')}"] = resource_digest(
+                            node
+                        )
+                    record = CML2Topology.node_record(node)
+                    configs = record.node_configuration.configs()
+                    if metrics.enabled:
+                        metrics.count(
+                            "config_bytes",
+                            sum(encoded_size(config.out()) for config in configs),
+                        )
+                    if settings["configs"]:
+                        with metrics.phase("write"):
+                            for config in configs_to_write(
+                                record, store, manifest, previous, project_name
+                            ):
+                                config.fileout(staging.path, large_size)
+                                written.append(staging.file(config.filename()))
+                        config_files.append(node_config_files(record))
+                    yield record
+
+            with metrics.phase("write"):
+                # The nodes are read while main.tf is rendered
+                content = stream_main_tf(
+                    environment, topology, flags, lab_nodes(), links
+                )
+                path = staging.write("main.tf", metrics.timed(content, "render"))
+                metrics.file_written(path)
+                if written:
+                    print(f"{len(written)} configuration files saved successfully.")
+                if store.references:
+                    print(store.summary())
+                for path in written:
+                    metrics.file_written(path)
+
+                lifecycle = [link.link_name for link in links]
+                manifest.files["main.tf"] = terraform_file_digest(
+                    manifest,
+                    "main.tf",
+                    node_ids,
+                    lifecycle,
+                    lifecycle,
+                    config_files if settings["configs"] else None,
+                )
+                commit_output(staging, previous, manifest, metrics)
+    except OSError as error:
+        print(f"Error: Unable to save Terraform project '{project_name}'. {error}")
+        exit(1)
+    changed = manifest.changed_resources(previous)
+    skipped = len(store.files) - len(written)
+    print(
+        f"{len(changed)} of {len(manifest.resources)} resources changed, "
+        + f"{skipped} of {len(manifest.files)} unchanged files skipped."
+    )
+
+
+def cml_to_terraform_archive(
+    cml2topology: dict,
+    archive: Union[str, BinaryIO],
+    flags: Namespace,
+    metrics: Optional["NullMetrics"] = None,
+) -> None:
+    """
+    Convert a CML2 topology to a tar archive of the Terraform project files.
+
+    The files are converted in memory, see cml2tf.api.convert(), and written
+    straight into the archive, so no project directory is created. Archives
+    at paths ending in .gz or .tgz, or with the gzip flag set, are compressed.
+    There is no manifest, so every conversion renders all files.
+
+    :param cml2topology: The CML2 topology data as a dictionary.
+    :param archive: The path of the archive, or the binary file object to
+        write it to, like stdout.
+    :param flags: provided command line flags
+    :param metrics: The collector of timings and counters, if requested.
+    :return: None
+    """
+
+    from cml2tf.api import ConversionError, ConvertOptions, convert
+    from cml2tf.archive import is_gzip_path, save_archive, write_archive
+    from cml2tf.metrics import NULL_METRICS
+    from cml2tf.validate import count_errors
+
+    metrics = metrics or NULL_METRICS
+    options = ConvertOptions(
+        configs=flags.configs,
+        shard=getattr(flags, "shard", None),
+        shard_size=getattr(flags, "shard_size", DEFAULT_SHARD_SIZE),
+        parser=getattr(flags, "parser", "auto"),
+        template_cache=getattr(flags, "template_cache", None),
+        emitter=getattr(flags, "emitter", "jinja"),
+    )
+    try:
+        with metrics.phase("render"):
+            files = convert(cml2topology, options)
+    except ConversionError as error:
+        for message in error.errors:
+            print(f"Error: {message}")
+        if error.errors:
+            print(
+                f"Error: The topology has {count_errors(error.errors)}, "
+                + "nothing was converted."
+            )
+        else:
+            print(f"Error: {error}")
+        exit(1)
+    metrics.count("nodes", len(cml2topology.get("nodes") or []))
+    metrics.count("links", len(cml2topology.get("links") or []))
+
+    compress = getattr(flags, "gzip", False)
+    try:
+        with metrics.phase("write"):
+            if isinstance(archive, str):
+                compress = compress or is_gzip_path(archive)
+                save_archive(files, archive, compress)
+                metrics.file_written(archive)
+            else:
+                write_archive(files, archive, compress)
+                archive.flush()
+    except OSError as error:
+        print(f"Error: Unable to save Terraform archive. {error}")
+        exit(1)
+    target = f"'{archive}'" if isinstance(archive, str) else "stdout"
+    print(f"{len(files)} files saved to archive {target}.")
+
+
+def convert_topology_file(
+    yaml_file: str,
+    project_name: str,
+    flags: Namespace,
+    metrics: Optional["NullMetrics"] = None,
+) -> None:
+    """
+    Read a CML2 topology file and convert it to Terraform.
 
-    # If force option is set then do not render variables.tf if file exists
-    if flags.force and os.path.exists("variables.tf"):
-        pass
-    else:
-        variables_template = environment.get_template("variables.tf.j2")
+    With the stream flag set the topology is streamed by
+    cml_to_terraform_stream(), otherwise it is loaded at once and converted by
+    cml_to_terraform_convert().
+
+    :param yaml_file: The path to the YAML file containing the CML2 topology.
+    :param project_name: The name of the Terraform project to be created.
+    :param flags: provided command line flags
+    :param metrics: The collector of timings and counters, if requested.
+    :return: None
+    """
+
+    from cml2tf.metrics import NULL_METRICS
+
+    if getattr(flags, "stream", False):
+        cml_to_terraform_stream(yaml_file, project_name, flags, metrics=metrics)
+        return
+
+    metrics = metrics or NULL_METRICS
+    with metrics.phase("read"):
+        cml2_topology = read_cml2_topology(yaml_file, getattr(flags, "parser", "auto"))
+    cml_to_terraform_convert(cml2_topology, project_name, flags, metrics=metrics)
+
+
+def convert_to_archive(
+    flags: Namespace,
+    yaml_file: Optional[str] = None,
+    metrics: Optional["Metrics"] = None,
+) -> None:
+    """
+    Convert a lab into the tar archive given by the archive flag.
+
+    The lab is read from the YAML file or, without one, from the controller.
+    With the archive '-' the archive is written to stdout and all messages
+    are printed to stderr instead, so it can be piped to the next tool. An
+    existing archive file is only replaced if the force flag is set.
+
+    :param flags: provided command line flags
+    :param yaml_file: The path to the YAML file containing the CML2 topology.
+    :param metrics: The collector of timings and counters, if requested.
+    :return: None
+    """
+
+    from contextlib import nullcontext, redirect_stdout
+
+    from cml2tf.metrics import NULL_METRICS
+
+    archive, messages = flags.archive, nullcontext()
+    if archive == "-":
+        archive, messages = sys.stdout.buffer, redirect_stdout(sys.stderr)
+    elif os.path.exists(archive) and not flags.force:
+        print(f"Error: Archive '{archive}' already exists. Please remove it first")
+        exit(1)
+    with messages:
+        if yaml_file is None:
+            convert_controller_labs(flags, metrics, archive)
+        else:
+            with (metrics or NULL_METRICS).phase("read"):
+                cml2_topology = read_cml2_topology(
+                    yaml_file, getattr(flags, "parser", "auto")
+                )
+            cml_to_terraform_archive(cml2_topology, archive, flags, metrics)
+        report_metrics(metrics, flags)
+        print("Converted")
+
+
+def large_config_size(flags: Namespace) -> int:
+    """
+    Return the size above which configurations are passed through in chunks.
+
+    :param flags: provided command line flags
+    :return: The size in characters.
+    """
+
+    from cml2tf.topology.nodeconfig import LARGE_CONFIG_SIZE
+
+    size = getattr(flags, "large_config_size", None)
+    return LARGE_CONFIG_SIZE if size is None else size
+
+
+def validate_topology_or_exit(cml2topology: dict, metrics: "NullMetrics") -> None:
+    """
+    Validate a CML2 topology and exit if it has integrity errors.
+
+    Every error found is printed, followed by a summary line.
+
+    :param cml2topology: The CML2 topology data as a dictionary.
+    :param metrics: The collector of timings and counters.
+    :return: None
+    """
+
+    from cml2tf.validate import count_errors, validate_topology
+
+    with metrics.phase("validate"):
+        errors = validate_topology(cml2topology)
+    if errors:
+        for error in errors:
+            print(f"Error: {error}")
+        print(f"Error: The topology has {count_errors(errors)}, nothing was converted.")
+        exit(1)
+
+
+def render_variables_tf(
+    environment: "Environment",
+    staging: "StagedDirectory",
+    flags: Namespace,
+    metrics: "NullMetrics",
+) -> None:
+    """
+    Render variables.tf into the staged project directory.
+
+    If the force flag is set and variables.tf exists in the project directory,
+    it is not rendered again, so changes made to it are kept.
+
+    :param environment: The Jinja environment to load the template from.
+    :param staging: The staged project directory.
+    :param flags: provided command line flags
+    :param metrics: The collector of timings and counters.
+    :return: None
+    """
+
+    if flags.force and os.path.exists(os.path.join(staging.directory, "variables.tf")):
+        return
+    variables_template = environment.get_template("variables.tf.j2")
+    with metrics.phase("render"):
         variables_tf_content = variables_template.render()
-        save_file_to_disk("variables.tf", variables_tf_content)
+    with metrics.phase("write"):
+        path = staging.write("variables.tf", variables_tf_content)
+    metrics.file_written(path)
+
+
+def conversion_settings(environment: "Environment", flags: Namespace) -> dict:
+    """
+    Collect the settings which affect the generated files.
+
+    The settings are hashed into the manifest, so a change of the command line
+    flags or the templates renders all files again.
+
+    :param environment: The Jinja environment the templates are loaded from.
+    :param flags: provided command line flags
+    :return: A dictionary of the settings.
+    """
+
+    from cml2tf.manifest import digest
+
+    return {
+        "configs": getattr(flags, "configs", False),
+        "shard": getattr(flags, "shard", None),
+        "shard_size": getattr(flags, "shard_size", DEFAULT_SHARD_SIZE),
+        "templates": {
+            name: digest(environment.loader.get_source(environment, name)[0])
+            for name in TERRAFORM_TEMPLATES
+        },
+    }
+
+
+def configs_to_write(
+    node,
+    store: "ConfigStore",
+    manifest: "Manifest",
+    previous: "Manifest",
+    project_name: str,
+) -> list:
+    """
+    Select the configuration files of a node which have to be written.
+
+    Every configuration of the node is added to the store, so identical
+    configurations of several nodes are written only once. The stored files
+    are recorded in the manifest and files which already have the right
+    content in the project directory are not selected.
+
+    :param node: The node record.
+    :param store: The store of the configurations of the lab.
+    :param manifest: The manifest of the conversion.
+    :param previous: The manifest of the previous conversion.
+    :param project_name: The name of the Terraform project.
+    :return: The node configurations to write.
+    """
+
+    configs = []
+    for config in node.node_configuration.configs():
+        if config.empty() or not store.add(config):
+            continue
+        filename = config.filename()
+        manifest.files[filename] = store.files[filename]
+        if not previous.unchanged(project_name, filename, manifest.files[filename]):
+            configs.append(config)
+    return configs
+
+
+def node_config_files(node) -> Optional[List[str]]:
+    """
+    Return the configuration files referenced by a node.
+
+    :param node: The node record.
+    :return: The file names, or None if the node has no configuration.
+    """
+
+    if node.node_configuration.empty():
+        return None
+    return [config.filename() for config in node.node_configuration.configs()]
+
+
+def terraform_file_digest(
+    manifest: "Manifest",
+    filename: str,
+    node_ids: List[str],
+    link_names: List[str],
+    lifecycle: List[str],
+    config_files: Optional[list] = None,
+) -> str:
+    """
+    Compute the content hash of a Terraform file.
 
-    # Render main.tf from template
-    main_template = environment.get_template("main.tf.j2")
-    main_tf_content = main_template.render(
+    The hash of a Terraform file is derived from the hashes of the resources
+    it is rendered from, so the file is only rendered when one of them
+    changed. As nodes may reference the shared configuration file of another
+    node, the referenced configuration files are part of the hash.
+
+    :param manifest: The manifest with the hashes of the resources.
+    :param filename: The name of the Terraform file.
+    :param node_ids: The IDs of the nodes rendered into the file.
+    :param link_names: The names of the links rendered into the file.
+    :param lifecycle: The names of all links, main.tf starts the lab after them.
+    :param config_files: The configuration files of every node, if the
+        configurations are stored in files.
+    :return: The hexadecimal SHA-256 digest of the file.
+    """
+
+    from cml2tf.manifest import digest
+
+    inputs = [manifest.resources["settings"], filename]
+    if filename == "main.tf":
+        inputs += [manifest.resources["lab"], lifecycle]
+    inputs += [manifest.resources[f"node:{node_id}"] for node_id in node_ids]
+    inputs += [manifest.resources[f"link:{link_name}"] for link_name in link_names]
+    if config_files is not None:
+        inputs += [files for files in config_files if files is not None]
+    return digest(json.dumps(inputs))
+
+
+def commit_output(
+    staging: "StagedDirectory",
+    previous: "Manifest",
+    manifest: "Manifest",
+    metrics: "NullMetrics",
+) -> None:
+    """
+    Save the manifest and swap the staged project directory into place.
+
+    Files of the previous conversion which are no longer generated, like
+    shards of a lab that got smaller or configurations of removed nodes, are
+    left behind. All other files of the project directory are kept.
+
+    :param staging: The staged project directory.
+    :param previous: The manifest of the previous conversion.
+    :param manifest: The manifest of this conversion.
+    :param metrics: The collector of timings and counters.
+    :return: None
+    :raises OSError: If the project directory cannot be replaced.
+    """
+
+    from cml2tf.manifest import MANIFEST_FILE
+
+    manifest.record_fingerprints(staging.path, previous)
+    path = staging.write(MANIFEST_FILE, manifest.dumps())
+    metrics.file_written(path)
+
+    removed = staging.commit(drop=previous.files.keys() - manifest.files.keys())
+    for filename in removed:
+        print(f"File '{filename}' removed.")
+    print(f"{len(staging.files)} files saved to '{staging.directory}'.")
+
+
+def wait_for_config_writes(config_writes: List["Future"]) -> None:
+    """
+    Wait for the node configuration files to be written.
+
+    This function waits until all configuration files submitted to the writer
+    pool are saved. If any of them cannot be written, it prints an error
+    message and exits.
+
+    :param config_writes: The futures of the submitted configuration writes.
+    :return: None
+    """
+
+    for future in config_writes:
+        try:
+            future.result()
+        except OSError as error:
+            print(f"Error: Unable to save configuration file. {error}")
+            exit(1)
+    if config_writes:
+        print(f"{len(config_writes)} configuration files saved successfully.")
+
+
+def stream_main_tf(
+    environment: "Environment",
+    topology: "CML2Topology",
+    flags: Namespace,
+    lab_nodes: Optional[Iterable] = None,
+    lab_links: Optional[list] = None,
+) -> Iterable[str]:
+    """
+    Render main.tf from the template as a stream of text chunks.
+
+    The returned stream renders the template lazily while it is iterated, so
+    the whole main.tf never has to be held in memory at once. By default all
+    nodes and links of the topology are rendered into main.tf; when they are
+    rendered into shards instead, main.tf only gets the given ones. With the
+    direct emitter selected, the same output is built without the template,
+    and large configurations are indented for their heredocs in chunks.
+
+    :param environment: The Jinja environment to load the template from.
+    :param topology: The topology to render.
+    :param flags: provided command line flags
+    :param lab_nodes: The nodes to render (by default all nodes), which can
+        be an iterator reading them while main.tf is rendered.
+    :param lab_links: The links to render (by default all links).
+    :return: The stream of rendered main.tf chunks.
+    """
+
+    if getattr(flags, "emitter", "jinja") == "direct":
+        from cml2tf.hcl import emit_main_tf
+
+        return emit_main_tf(
+            topology, flags, lab_nodes, lab_links, large_config_size(flags)
+        )
+    return stream_template(
+        environment,
+        "main.tf.j2",
         lab_title=topology.get_lab_info_title(),
         lab_description=topology.get_lab_info_description(),
         lab_notes=topology.get_lab_info_notes(),
-        lab_nodes=topology.get_lab_nodes(),
-        lab_links=topology.get_lab_links(),
+        lab_nodes=topology.get_lab_nodes() if lab_nodes is None else lab_nodes,
+        lab_links=topology.get_lab_links() if lab_links is None else lab_links,
+        lifecycle_links=topology.get_lab_links(),
+        flags=flags,
+    )
+
+
+def stream_shard(
+    environment: "Environment",
+    flags: Namespace,
+    lab_nodes: Iterable,
+    lab_links: list,
+) -> Iterable[str]:
+    """
+    Render a shard from the template as a stream of text chunks.
+
+    :param environment: The Jinja environment to load the template from.
+    :param flags: provided command line flags
+    :param lab_nodes: The nodes of the shard.
+    :param lab_links: The links of the shard.
+    :return: The stream of rendered shard chunks.
+    """
+
+    if getattr(flags, "emitter", "jinja") == "direct":
+        from cml2tf.hcl import emit_shard
+
+        return emit_shard(lab_nodes, lab_links, flags, large_config_size(flags))
+    return stream_template(
+        environment,
+        "shard.tf.j2",
+        lab_nodes=lab_nodes,
+        lab_links=lab_links,
         flags=flags,
     )
-    save_file_to_disk("main.tf", main_tf_content)
 
 
-def read_cml2_topology(yaml_file: str) -> dict:
+def stream_template(
+    environment: "Environment", template_name: str, **context
+) -> "TemplateStream":
+    """
+    Render a template as a stream of text chunks.
+
+    :param environment: The Jinja environment to load the template from.
+    :param template_name: The name of the template.
+    :param context: The variables passed to the template.
+    :return: The stream of rendered chunks.
+    """
+
+    stream = environment.get_template(template_name).stream(**context)
+    stream.enable_buffering(STREAM_BUFFER_SIZE)
+    return stream
+
+
+def get_yaml_loader(parser: str = "auto") -> type:
+    """
+    Select the YAML loader class used to parse topology files.
+
+    See cml2tf.api.yaml_loader(). If libyaml is requested but not available,
+    it prints an error message and exits.
+
+    :param parser: One of 'auto', 'libyaml' or 'python'.
+    :return: The loader class to pass to yaml.load().
+    """
+
+    from cml2tf.api import ConversionError, yaml_loader
+
+    try:
+        return yaml_loader(parser)
+    except ConversionError as error:
+        print(f"Error: {error}")
+        exit(1)
+
+
+def read_cml2_topology(yaml_file: str, parser: str = "auto") -> dict:
     """
     Read and parse a CML2 topology from a YAML file.
 
@@ -72,24 +818,103 @@ def read_cml2_topology(yaml_file: str) -> dict:
     contents, and parses it into a Python dictionary.
 
     :param yaml_file: The path to the YAML file containing the CML2 topology.
+    :param parser: The YAML parser to use, see get_yaml_loader().
     :return: A dictionary representing the parsed CML2 topology.
     """
 
+    import yaml
+
+    loader = get_yaml_loader(parser)
     try:
         with open(yaml_file) as file:
-            topology = yaml.safe_load(file)
+            topology = yaml.load(file, Loader=loader)
             return topology
     except OSError as error:
         print(f"Error reading topology file: {error}")
         exit(1)
 
 
-def save_file_to_disk(filename: str, content: str) -> None:
+def convert_controller_labs(
+    flags: Namespace,
+    metrics: Optional["NullMetrics"] = None,
+    archive: Union[str, BinaryIO, None] = None,
+) -> None:
+    """
+    Read labs from a CML2 controller and convert them to Terraform.
+
+    This function connects to the controller given by the command line flags,
+    reads the requested labs (or all labs) and converts each of them. A single
+    lab is converted into the output directory, by default named after the
+    lab ID; several labs are converted into subdirectories named after their
+    lab IDs. If a lab cannot be read, it prints an error message and exits.
+
+    :param flags: provided command line flags
+    :param metrics: The collector of timings and counters, if requested.
+    :param archive: The path or binary file object to write a single lab to
+        as a tar archive instead, see cml_to_terraform_archive().
+    :return: None
+    """
+
+    from cml2tf.controller import CMLController, ControllerError
+    from cml2tf.metrics import NULL_METRICS
+
+    metrics = metrics or NULL_METRICS
+
+    try:
+        with CMLController(
+            flags.controller,
+            flags.username,
+            flags.password,
+            verify=not flags.insecure,
+            workers=flags.fetch_workers,
+        ) as controller:
+            lab_ids = controller.lab_ids() if "all" in flags.lab else flags.lab
+            for lab_id in lab_ids:
+                with metrics.phase("read"):
+                    cml2_topology = controller.lab_topology(lab_id)
+                if archive is not None:
+                    cml_to_terraform_archive(cml2_topology, archive, flags, metrics)
+                    continue
+                if len(lab_ids) == 1:
+                    outdir = flags.outdir or lab_id
+                else:
+                    outdir = os.path.join(flags.outdir or ".", lab_id)
+                cml_to_terraform_convert(cml2_topology, outdir, flags, metrics=metrics)
+    except ControllerError as error:
+        print(f"Error reading topology from controller: {error}")
+        exit(1)
+
+
+def report_metrics(metrics: Optional["Metrics"], flags: Namespace) -> None:
+    """
+    Report the timings and counters collected during a conversion.
+
+    With the timings flag, a table of the phases and counters is printed, and
+    with the memory profile flag the top allocation sites of every phase as
+    well. With a metrics JSON path, the metrics are saved to that file.
+
+    :param metrics: The collected metrics, or None if none were requested.
+    :param flags: provided command line flags
+    :return: None
+    """
+
+    if metrics is None:
+        return
+    metrics.close()
+    if flags.timings or getattr(flags, "memory_profile", None):
+        print(metrics.report())
+    if flags.metrics_json:
+        save_file_to_disk(flags.metrics_json, metrics.dumps())
+
+
+def save_file_to_disk(filename: str, content: Union[str, Iterable[str]]) -> None:
     """
     Save given content to a file on disk.
 
     This function writes the provided content to a file specified by
-    'filename'. If the file cannot be written, it catches the IOError and
+    'filename'. The content is either a string or an iterable of strings, like
+    a rendered template stream, which is written chunk by chunk as it is
+    produced. If the file cannot be written, it catches the IOError and
     returns an error message.
 
     :param filename: The name of the file to save the content to.
@@ -99,7 +924,10 @@ def save_file_to_disk(filename: str, content: str) -> None:
 
     try:
         with open(filename, "w") as file:
-            file.write(content)
+            if isinstance(content, str):
+                file.write(content)
+            else:
+                file.writelines(content)
         print(f"File '{filename}' saved successfully.")
     except OSError as error:
         print(f"Error: Unable to save file '{filename}'. {error}")
@@ -122,6 +950,26 @@ def strip_extension(filename: str) -> str:
     return root
 
 
+def lab_outdir(yaml_file: str, outdir: Optional[str], batch: bool) -> str:
+    """
+    Return the output directory of a lab.
+
+    Without an output directory the lab is converted next to its YAML file. In
+    batch mode every lab gets its own subdirectory of the output directory.
+
+    :param yaml_file: The path to the YAML file containing the CML2 topology.
+    :param outdir: The output directory given on the command line, if any.
+    :param batch: True if several labs are converted.
+    :return: The output directory of the lab.
+    """
+
+    if not outdir:
+        return strip_extension(yaml_file)
+    if batch:
+        return os.path.join(outdir, os.path.basename(strip_extension(yaml_file)))
+    return outdir
+
+
 def create_directory(directory_name: str, force=False) -> None:
     """
     Create a directory with the given name.
@@ -158,8 +1006,18 @@ def create_directory(directory_name: str, force=False) -> None:
 
 
 def main():
+    if sys.argv[1:2] == ["serve"]:
+        from cml2tf.server import serve_main
+
+        serve_main(sys.argv[2:])
+        return
+
     parser = ArgumentParser()
-    parser.epilog = f"Usage example: {parser.prog} -i topology.yaml"
+    parser.epilog = (
+        f"Usage example: {parser.prog} -i topology.yaml, "
+        + f"batch usage example: {parser.prog} -j 4 -i labs/ -o terraform, "
+        + f"conversion server: {parser.prog} serve --help"
+    )
 
     args_input = parser.add_argument_group("Input options")
     args_output = parser.add_argument_group("Output options")
@@ -168,7 +1026,66 @@ def main():
         "-i",
         "--input",
         type=str,
-        help="File with input lab topology in YAML exported from CML2",
+        nargs="+",
+        action="extend",
+        help="File with input lab topology in YAML exported from CML2. "
+        + "Several files, directories or glob patterns convert labs in batch",
+    )
+    args_input.add_argument(
+        "--parser",
+        choices=YAML_PARSERS,
+        default="auto",
+        help="YAML parser to use (default: libyaml when available, "
+        + "otherwise pure Python)",
+    )
+    args_input.add_argument(
+        "--stream",
+        default=False,
+        action="store_true",
+        help="Read the topology as a stream, one node at a time, to convert "
+        + "very large labs with little memory",
+    )
+
+    args_input.add_argument(
+        "--controller",
+        type=str,
+        metavar="URL",
+        help="Read lab topologies directly from the CML2 controller at URL "
+        + "instead of an exported YAML file",
+    )
+    args_input.add_argument(
+        "--lab",
+        type=str,
+        nargs="+",
+        action="extend",
+        metavar="LAB_ID",
+        help="ID of the lab to read from the controller, 'all' reads all labs",
+    )
+    args_input.add_argument(
+        "--username",
+        type=str,
+        default=os.environ.get("CML2_USERNAME"),
+        help="Controller username (by default $CML2_USERNAME)",
+    )
+    args_input.add_argument(
+        "--password",
+        type=str,
+        default=os.environ.get("CML2_PASSWORD"),
+        help="Controller password (by default $CML2_PASSWORD)",
+    )
+    args_input.add_argument(
+        "--insecure",
+        default=False,
+        action="store_true",
+        help="Do not verify the TLS certificate of the controller",
+    )
+    args_input.add_argument(
+        "--fetch-workers",
+        type=int,
+        default=8,
+        metavar="N",
+        help="Number of node configurations fetched concurrently from the "
+        + "controller (default: 8)",
     )
 
     args_output.add_argument(
@@ -176,7 +1093,23 @@ def main():
         "--outdir",
         type=str,
         help="Output directory name where Terraform files will be created "
-        + "(by default input topology filename)",
+        + "(by default input topology filename). In batch mode every lab is "
+        + "created in its own subdirectory",
+    )
+    args_output.add_argument(
+        "--archive",
+        type=str,
+        metavar="PATH",
+        help="Write the Terraform files into a tar archive at PATH instead of "
+        + "a directory, '-' writes it to stdout. Archives ending in .gz or "
+        + ".tgz are compressed",
+    )
+    args_output.add_argument(
+        "-z",
+        "--gzip",
+        default=False,
+        action="store_true",
+        help="Compress the archive with gzip",
     )
     args_output.add_argument(
         "-c",
@@ -193,22 +1126,189 @@ def main():
         dest="force",
         help="Overwrite files if destination folder exists",
     )
+    args_output.add_argument(
+        "--shard",
+        choices=SHARD_MODES,
+        default=None,
+        help="Render nodes and links into several files instead of main.tf, "
+        + "split by count (see --shard-size) or by the first node tag",
+    )
+    args_output.add_argument(
+        "--shard-size",
+        type=int,
+        default=DEFAULT_SHARD_SIZE,
+        metavar="N",
+        help="Maximum number of nodes or links per file when sharding "
+        + f"(default: {DEFAULT_SHARD_SIZE})",
+    )
+    args_output.add_argument(
+        "--emitter",
+        choices=EMITTERS,
+        default="jinja",
+        help="Build the Terraform files from the templates, or directly with "
+        + "string building, which is faster and gives the same output "
+        + "(default: jinja)",
+    )
+    args_output.add_argument(
+        "--large-config-size",
+        type=int,
+        default=None,
+        metavar="BYTES",
+        help="Pass configurations larger than BYTES through in chunks instead of "
+        + "copying them as a whole. Applies to configuration files with both "
+        + "emitters, to heredocs in main.tf only with --emitter direct "
+        + "(default: 1 MiB)",
+    )
+    args_output.add_argument(
+        "--template-cache",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="DIR",
+        help="Cache compiled templates on disk (by default in the user cache "
+        + "directory)",
+    )
+    args_output.add_argument(
+        "--timings",
+        default=False,
+        action="store_true",
+        help="Print wall time and peak memory of every conversion phase",
+    )
+    args_output.add_argument(
+        "--memory-profile",
+        type=int,
+        nargs="?",
+        const=10,
+        default=None,
+        metavar="N",
+        help="Print the N allocation sites which gained the most memory in "
+        + "every conversion phase (default: 10). Slows the conversion down",
+    )
+    args_output.add_argument(
+        "--metrics-json",
+        type=str,
+        metavar="PATH",
+        help="Save timings and counters of the conversion as JSON to PATH",
+    )
+    args_output.add_argument(
+        "--watch",
+        default=False,
+        action="store_true",
+        help="Keep running and convert the input labs again whenever their content changes",
+    )
+    args_output.add_argument(
+        "--debounce",
+        type=float,
+        default=0.5,
+        metavar="SECONDS",
+        help="Wait until the watched files stopped changing for SECONDS before converting (default: 0.5)",
+    )
+    args_output.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes in batch mode (by default number of CPUs)",
+    )
 
     if len(sys.argv) < 2:
         parser.print_help()
         sys.exit(0)
 
     p = parser.parse_args()
-    if not p.input:
+    if p.controller and p.input:
+        parser.error("Use either an input file or a controller, not both")
+    if p.controller and not p.lab:
+        parser.error("Missing lab ID to read from the controller")
+    if p.controller and not (p.username and p.password):
+        parser.error("Missing controller username or password")
+    if p.fetch_workers < 1:
+        parser.error("Number of fetch workers must be at least 1")
+    if p.watch and p.controller:
+        parser.error("Watch mode cannot be used with a controller")
+    if p.stream and p.controller:
+        parser.error("Streaming cannot be used with a controller")
+    if p.stream and p.shard:
+        parser.error("Streaming cannot be used with sharding")
+    if p.archive and p.outdir:
+        parser.error("Use either an output directory or an archive, not both")
+    if p.gzip and not p.archive:
+        parser.error("Compression requires an archive")
+    if p.archive and p.watch:
+        parser.error("Watch mode cannot be used with an archive")
+    if p.archive and p.stream:
+        parser.error("Streaming cannot be used with an archive")
+    if p.archive and p.controller and (len(p.lab) != 1 or "all" in p.lab):
+        parser.error("An archive holds a single lab")
+    if p.debounce < 0:
+        parser.error("Debounce time must not be negative")
+    if not p.input and not p.controller:
         parser.error("Missing input lab topology file")
+    if p.shard_size < 1:
+        parser.error("Shard size must be at least 1")
+    if p.large_config_size is not None and p.large_config_size < 0:
+        parser.error("Large configuration size must not be negative")
+    if p.memory_profile is not None and p.memory_profile < 1:
+        parser.error("Number of profiled allocation sites must be at least 1")
+    if p.jobs is not None and p.jobs < 1:
+        parser.error("Number of jobs must be at least 1")
+    if p.template_cache == "":
+        from cml2tf.environment import default_template_cache_dir
+
+        p.template_cache = default_template_cache_dir()
+
+    metrics = None
+    if p.timings or p.metrics_json or p.memory_profile:
+        from cml2tf.metrics import Metrics
+
+        metrics = Metrics(profile=p.memory_profile or 0)
+
+    if p.controller and p.archive:
+        convert_to_archive(p, metrics=metrics)
+        return
+    if p.controller:
+        convert_controller_labs(p, metrics)
+        report_metrics(metrics, p)
+        print("Converted")
+        return
+
+    from cml2tf.batch import batch_convert, expand_inputs, is_pattern, print_summary
+
+    labs = expand_inputs(p.input)
+    batch = len(labs) != 1 or os.path.isdir(p.input[0]) or is_pattern(p.input[0])
+    if p.archive:
+        if batch:
+            parser.error("An archive holds a single lab")
+        convert_to_archive(p, labs[0], metrics)
+        return
+    if p.watch:
+        from cml2tf.watch import LabWatcher
+
+        if metrics:
+            parser.error("Timings and metrics are not supported in watch mode")
+        watcher = LabWatcher(p.input, p, batch, p.debounce)
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            print("Stopped watching")
+        return
 
-    # Open and read the topology YAML file
-    cml2_topology = read_cml2_topology(p.input)
-    # TODO: Add support for reading configuration directly from CML
+    if batch:
+        if not labs:
+            parser.error("No lab topology files found")
+        if metrics:
+            parser.error("Timings and metrics are not supported in batch mode")
+        outdirs = [lab_outdir(lab, p.outdir, batch) for lab in labs]
+        if len(set(outdirs)) != len(outdirs):
+            parser.error("Several labs would be converted into the same directory")
+        results = batch_convert(labs, outdirs, p, p.jobs)
+        print_summary(results)
+        sys.exit(0 if all(result.ok for result in results) else 1)
 
-    # Convert YAML topology into Terraform
-    outdir = strip_extension(p.input) if not p.outdir else p.outdir
-    cml_to_terraform_convert(cml2_topology, outdir, p)
+    # Read the topology YAML file and convert it into Terraform
+    outdir = lab_outdir(labs[0], p.outdir, batch)
+    convert_topology_file(labs[0], outdir, p, metrics)
+    report_metrics(metrics, p)
 
     print("Converted")
 
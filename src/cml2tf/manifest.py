@@ -0,0 +1,215 @@
+# (c) 2023-2024 Piotr Wojciechowski <piotr@it-playground.pl>
+# MIT License (see LICENSE)
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+MANIFEST_FILE = ".cml2tf-manifest.json"
+MANIFEST_VERSION = 2
+# Size in characters of the chunks long strings are hashed in
+CHUNK_SIZE = 1 << 20
+
+
+def digest(content: str) -> str:
+    """
+    Compute the content hash of a string.
+
+    Long strings are encoded and hashed in chunks, so they are never copied
+    as a whole.
+
+    :param content: The content to hash.
+    :return: The hexadecimal SHA-256 digest of the UTF-8 encoded content.
+    """
+
+    if len(content) <= CHUNK_SIZE:
+        return hashlib.sha256(content.encode()).hexdigest()
+    hasher = hashlib.sha256()
+    for start in range(0, len(content), CHUNK_SIZE):
+        hasher.update(content[start : start + CHUNK_SIZE].encode())
+    return hasher.hexdigest()
+
+
+def encoded_size(content: str) -> int:
+    """
+    Compute the size of a string encoded as UTF-8, without encoding it at once.
+
+    :param content: The string.
+    :return: The number of bytes of the UTF-8 encoded string.
+    """
+
+    if content.isascii():
+        return len(content)
+    return sum(
+        len(content[start : start + CHUNK_SIZE].encode())
+        for start in range(0, len(content), CHUNK_SIZE)
+    )
+
+
+def fingerprint(path: str) -> Optional[List[int]]:
+    """
+    Take a cheap fingerprint of a file, its size and modification time.
+
+    :param path: The path of the file.
+    :return: The size in bytes and the modification time in nanoseconds, or
+        None if the file does not exist.
+    """
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def resource_digest(data) -> str:
+    """
+    Compute the content hash of a resource from its topology data.
+
+    :param data: The data of the resource, like a node or link dictionary.
+    :return: The hexadecimal SHA-256 digest of the data.
+    """
+
+    return digest(json.dumps(data, sort_keys=True, default=str))
+
+
+def resource_digests(cml2topology: dict, settings: dict) -> Dict[str, str]:
+    """
+    Compute the content hashes of all resources of a CML2 topology.
+
+    Every node and link is hashed from its data in the topology export, which
+    includes the node configurations. The lab information and the settings
+    that affect the generated files, like the template source and command line
+    flags, are hashed as resources of their own.
+
+    :param cml2topology: The CML2 topology data as a dictionary.
+    :param settings: The settings which affect the generated files.
+    :return: A dictionary mapping resource keys to their content hash.
+    """
+
+    resources = {
+        "settings": resource_digest(settings),
+        "lab": resource_digest(cml2topology.get("lab")),
+    }
+    for node in cml2topology.get("nodes") or []:
+        resources[f"node:{node.get('id')}"] = resource_digest(node)
+    for link in cml2topology.get("links") or []:
+        resources[f"link:{link.get('id')}"] = resource_digest(link)
+    return resources
+
+
+class Manifest:
+    """The content hashes of the resources and files of a generated project.
+
+    The manifest is stored in the output directory. On the next conversion into
+    the same directory it tells which resources of the topology changed and
+    which files already have the right content, so they are not rewritten.
+    Every file is recorded with the fingerprint it had when it was written, so
+    a file changed on disk since then is written again.
+    """
+
+    def __init__(
+        self,
+        resources: Optional[Dict[str, str]] = None,
+        files: Optional[Dict[str, str]] = None,
+        fingerprints: Optional[Dict[str, List[int]]] = None,
+    ) -> None:
+        self.resources = resources or {}
+        self.files = files or {}
+        self.fingerprints = fingerprints or {}
+
+    @classmethod
+    def load(cls, directory: str) -> "Manifest":
+        """
+        Load the manifest stored in a directory.
+
+        A missing, unreadable or outdated manifest results in an empty manifest,
+        which makes every resource and file count as changed.
+
+        :param directory: The output directory.
+        :return: The manifest.
+        """
+
+        try:
+            with open(os.path.join(directory, MANIFEST_FILE)) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return cls()
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return cls()
+        return cls(data.get("resources"), data.get("files"), data.get("fingerprints"))
+
+    def dumps(self) -> str:
+        """
+        Serialize the manifest.
+
+        :return: The manifest as a JSON document.
+        """
+
+        return json.dumps(
+            {
+                "version": MANIFEST_VERSION,
+                "resources": self.resources,
+                "files": self.files,
+                "fingerprints": self.fingerprints,
+            },
+            indent=1,
+            sort_keys=True,
+        )
+
+    def changed_resources(self, previous: "Manifest") -> List[str]:
+        """
+        List the resources that differ from a previous manifest.
+
+        Resources which were added, removed or whose content changed all count
+        as changed.
+
+        :param previous: The manifest of the previous conversion.
+        :return: The keys of the changed resources.
+        """
+
+        keys = self.resources.keys() | previous.resources.keys()
+        return sorted(
+            key
+            for key in keys
+            if self.resources.get(key) != previous.resources.get(key)
+        )
+
+    def record_fingerprints(self, directory: str, previous: "Manifest") -> None:
+        """
+        Record the fingerprints of the files of the manifest.
+
+        Files written into the directory are fingerprinted, files which were
+        not written again keep the fingerprint of the previous manifest.
+
+        :param directory: The directory the files were written to.
+        :param previous: The manifest of the previous conversion.
+        :return: None
+        """
+
+        for filename in self.files:
+            self.fingerprints[filename] = fingerprint(
+                os.path.join(directory, filename)
+            ) or previous.fingerprints.get(filename)
+
+    def unchanged(self, directory: str, filename: str, content_digest: str) -> bool:
+        """
+        Check whether a file already exists with the given content.
+
+        The file on disk is compared by its fingerprint, so a file edited or
+        replaced since it was written does not count as unchanged.
+
+        :param directory: The output directory.
+        :param filename: The name of the file within the output directory.
+        :param content_digest: The content hash of the file to be written.
+        :return: True if the manifest records the same hash and the file on
+            disk still has the recorded fingerprint.
+        """
+
+        if self.files.get(filename) != content_digest:
+            return False
+        recorded = self.fingerprints.get(filename)
+        return recorded is not None and recorded == fingerprint(
+            os.path.join(directory, filename)
+        )
@@ -0,0 +1,293 @@
+# (c) 2023-2024 Piotr Wojciechowski <piotr@it-playground.pl>
+# MIT License (see LICENSE)
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Allocations of the profiler itself are left out of the allocation sites
+_PROFILER_FILES = {tracemalloc.__file__, __file__}
+
+
+def site_name(frame: tracemalloc.Frame) -> str:
+    """
+    Format an allocation site, relative to the module search path.
+
+    :param frame: The frame of the allocation.
+    :return: The site, like 'yaml/composer.py:88'.
+    """
+
+    filename = frame.filename
+    for entry in sorted(filter(None, sys.path), key=len, reverse=True):
+        if filename.startswith(entry + os.sep):
+            filename = filename[len(entry) + 1 :]
+            break
+    return f"{filename}:{frame.lineno}"
+
+
+class NullMetrics:
+    """Metrics collector used when no metrics are requested.
+
+    Every method does nothing, so the instrumented code costs no more than a
+    method call when metrics are off.
+    """
+
+    enabled = False
+
+    _context = nullcontext()
+
+    def phase(self, name: str):
+        return self._context
+
+    def timed(self, chunks: Iterable[str], name: str) -> Iterable[str]:
+        return chunks
+
+    def count(self, name: str, value: int = 1) -> None:
+        pass
+
+    def file_written(self, filename: str) -> None:
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+class Metrics(NullMetrics):
+    """Collect wall time and peak memory per conversion phase, and counters.
+
+    Phases can be nested and entered several times. The time of a nested phase
+    is not counted in the phase around it, so the phase times add up to the
+    total. Peak memory is traced with tracemalloc, which slows the conversion
+    down, but only while metrics are collected.
+
+    With profile set to N, the memory allocated and still held at the end of
+    a phase is attributed to its allocation sites, and the N sites which
+    gained the most are reported for every phase. A snapshot of the traced
+    memory is taken whenever the phase changes, except while a stream is
+    timed: every chunk is a phase change, so the whole stream is profiled
+    and timed as one phase, including the work of the consumer between its
+    chunks.
+    """
+
+    enabled = True
+
+    def __init__(self, profile: int = 0) -> None:
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.profile = profile
+        self.sites: Dict[str, Dict[tracemalloc.Frame, List[int]]] = {}
+        self._statistics: Optional[Dict[tracemalloc.Frame, Tuple[int, int]]] = None
+        self._streams = 0
+        self._stack: List[List] = []
+        self._started = time.perf_counter()
+        self._tracing = not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+        self._take_profile()
+
+    def close(self) -> None:
+        """
+        Stop tracing memory allocations.
+
+        :return: None
+        """
+
+        if self._tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._tracing = False
+
+    def _peak(self) -> int:
+        _, peak = tracemalloc.get_traced_memory()
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        return peak
+
+    def _record_peak(self, name: str, peak: int) -> None:
+        phase = self.phases[name]
+        phase["peak_bytes"] = max(phase["peak_bytes"], peak)
+
+    def _take_profile(self) -> None:
+        # Attribute what was allocated or freed since the last snapshot to the
+        # current phase. Only the statistics of a snapshot are kept.
+        if not self.profile or self._streams:
+            return
+        statistics = {
+            stat.traceback[0]: (stat.size, stat.count)
+            for stat in tracemalloc.take_snapshot().statistics("lineno")
+            if stat.traceback[0].filename not in _PROFILER_FILES
+        }
+        previous, self._statistics = self._statistics, statistics
+        if previous is not None and self._stack:
+            sites = self.sites.setdefault(self._stack[-1][0], {})
+            for frame in statistics.keys() | previous.keys():
+                size, count = statistics.get(frame, (0, 0))
+                previous_size, previous_count = previous.get(frame, (0, 0))
+                if size != previous_size or count != previous_count:
+                    site = sites.setdefault(frame, [0, 0])
+                    site[0] += size - previous_size
+                    site[1] += count - previous_count
+        # The snapshot is not part of the memory used by the phases
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Measure a phase of the conversion.
+
+        :param name: The name of the phase.
+        :return: A context manager measuring the code run inside it.
+        """
+
+        self.phases.setdefault(name, {"seconds": 0.0, "peak_bytes": 0})
+        if self._stack:
+            self._record_peak(self._stack[-1][0], self._peak())
+        else:
+            self._peak()
+        self._take_profile()
+        # name, start time, time spent in nested phases
+        frame = [name, time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - frame[1]
+            self._record_peak(name, self._peak())
+            self._take_profile()
+            self._stack.pop()
+            self.phases[name]["seconds"] += elapsed - frame[2]
+            if self._stack:
+                self._stack[-1][2] += elapsed
+
+    def timed(self, chunks: Iterable[str], name: str) -> Iterator[str]:
+        """
+        Measure the time spent producing the chunks of a stream as a phase.
+
+        :param chunks: The stream, like a rendered template.
+        :param name: The name of the phase.
+        :return: The chunks of the stream.
+        """
+
+        if self.profile:
+            with self.phase(name):
+                self._streams += 1
+                try:
+                    yield from chunks
+                finally:
+                    self._streams -= 1
+            return
+
+        iterator = iter(chunks)
+        while True:
+            with self.phase(name):
+                chunk = next(iterator, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    def count(self, name: str, value: int = 1) -> None:
+        """
+        Add to a counter.
+
+        :param name: The name of the counter.
+        :param value: The value to add.
+        :return: None
+        """
+
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def file_written(self, filename: str) -> None:
+        """
+        Count a written file and its size.
+
+        :param filename: The name of the written file.
+        :return: None
+        """
+
+        self.count("files_written")
+        self.count("bytes_written", os.path.getsize(filename))
+
+    def top_sites(self, name: str) -> List[Tuple[str, int, int]]:
+        """
+        Return the allocation sites which gained the most memory in a phase.
+
+        :param name: The name of the phase.
+        :return: Up to N sites, see the profile, with the bytes and blocks
+            they gained, the largest first.
+        """
+
+        sites = sorted(
+            (
+                (size, count, frame)
+                for frame, (size, count) in self.sites.get(name, {}).items()
+                if size > 0
+            ),
+            key=lambda site: site[0],
+            reverse=True,
+        )
+        return [
+            (site_name(frame), size, count)
+            for size, count, frame in sites[: self.profile]
+        ]
+
+    def as_dict(self) -> dict:
+        """
+        Return the collected metrics.
+
+        :return: A dictionary with the total wall time, the phases and
+            counters, and the top allocation sites of every phase if profiled.
+        """
+
+        data = {
+            "seconds": time.perf_counter() - self._started,
+            "phases": self.phases,
+            "counters": self.counters,
+        }
+        if self.profile:
+            data["sites"] = {
+                name: [
+                    {"site": site, "bytes": size, "blocks": count}
+                    for site, size, count in self.top_sites(name)
+                ]
+                for name in self.phases
+            }
+        return data
+
+    def dumps(self) -> str:
+        """
+        Serialize the collected metrics.
+
+        :return: The metrics as a JSON document.
+        """
+
+        return json.dumps(self.as_dict(), indent=1)
+
+    def report(self) -> str:
+        """
+        Format the collected metrics as a table.
+
+        :return: The report.
+        """
+
+        data = self.as_dict()
+        lines = [f"{'phase':<10} {'seconds':>9} {'peak MiB':>9}"]
+        for name, phase in data["phases"].items():
+            lines.append(
+                f"{name:<10} {phase['seconds']:>9.3f} "
+                + f"{phase['peak_bytes'] / 2**20:>9.1f}"
+            )
+        lines.append(f"{'total':<10} {data['seconds']:>9.3f}")
+        for name, value in data["counters"].items():
+            lines.append(f"{name:<14} {value:>12}")
+        for name, sites in data.get("sites", {}).items():
+            lines.append(f"top allocation sites of phase {name}:")
+            for site in sites:
+                lines.append(
+                    f"  {site['bytes'] / 1024:>10.1f} KiB {site['blocks']:>8} blocks  "
+                    + site["site"]
+                )
+        return "\n".join(lines)
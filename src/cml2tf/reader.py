@@ -0,0 +1,258 @@
+# (c) 2023-2024 Piotr Wojciechowski <piotr@it-playground.pl>
+# MIT License (see LICENSE)
+
+from typing import Dict, Iterator, Tuple
+
+import yaml
+from yaml.events import (
+    AliasEvent,
+    MappingEndEvent,
+    MappingStartEvent,
+    ScalarEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+)
+from yaml.nodes import MappingNode, Node, ScalarNode, SequenceNode
+
+# The node and interface fields needed to resolve and validate the links
+NODE_METADATA = ("id", "label")
+INTERFACE_METADATA = ("id", "slot", "type")
+
+
+class TopologyReader:
+    """Read a CML2 topology export as a stream of YAML events.
+
+    Unlike yaml.load(), which builds the whole document at once, the reader
+    only builds the parts of the document it is asked for and skips over the
+    rest. Events are composed into YAML nodes here rather than by the loader,
+    as the libyaml based loaders do not expose their composer.
+    """
+
+    def __init__(self, yaml_file: str, loader: type = yaml.SafeLoader) -> None:
+        self._file = open(yaml_file)
+        self._loader = loader(self._file)
+        self._anchors: Dict[str, Node] = {}
+
+    def close(self) -> None:
+        """
+        Close the topology file.
+
+        :return: None
+        """
+
+        self._loader.dispose()
+        self._file.close()
+
+    def __enter__(self) -> "TopologyReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def sections(self) -> Iterator[str]:
+        """
+        Iterate over the top level keys of the topology.
+
+        The value of every key must be consumed with read(), skip() or
+        items() before the iteration continues.
+
+        :return: An iterator of the top level keys.
+        """
+
+        loader = self._loader
+        loader.get_event()
+        if not loader.check_event(yaml.DocumentStartEvent):
+            return
+        loader.get_event()
+        if not loader.check_event(MappingStartEvent):
+            raise ValueError("The topology is not a YAML mapping")
+        loader.get_event()
+        while not loader.check_event(MappingEndEvent):
+            yield self.read()
+
+    def items(self) -> Iterator[None]:
+        """
+        Iterate over the items of the sequence that comes next.
+
+        Every item must be consumed with read(), skip() or keys() before the
+        iteration continues.
+
+        :return: An iterator stopping at the end of the sequence.
+        """
+
+        loader = self._loader
+        if not loader.check_event(SequenceStartEvent):
+            self.skip()
+            return
+        loader.get_event()
+        while not loader.check_event(SequenceEndEvent):
+            yield
+        loader.get_event()
+
+    def keys(self) -> Iterator[str]:
+        """
+        Iterate over the keys of the mapping that comes next.
+
+        The value of every key must be consumed with read() or skip() before
+        the iteration continues.
+
+        :return: An iterator of the keys of the mapping.
+        """
+
+        loader = self._loader
+        if not loader.check_event(MappingStartEvent):
+            self.skip()
+            return
+        loader.get_event()
+        while not loader.check_event(MappingEndEvent):
+            yield self.read()
+        loader.get_event()
+
+    def read(self):
+        """
+        Read the value that comes next.
+
+        :return: The value as constructed by the loader.
+        """
+
+        return self._loader.construct_document(self._compose())
+
+    def skip(self) -> None:
+        """
+        Skip over the value that comes next without building it.
+
+        :return: None
+        """
+
+        loader = self._loader
+        depth = 0
+        while True:
+            event = loader.get_event()
+            if isinstance(event, (MappingStartEvent, SequenceStartEvent)):
+                depth += 1
+            elif isinstance(event, (MappingEndEvent, SequenceEndEvent)):
+                depth -= 1
+            if depth == 0:
+                return
+
+    def _compose(self) -> Node:
+        """
+        Compose the value that comes next into a YAML node.
+
+        :return: The YAML node.
+        """
+
+        loader = self._loader
+        event = loader.get_event()
+        if isinstance(event, AliasEvent):
+            if event.anchor not in self._anchors:
+                raise ValueError(f"Unknown YAML alias '{event.anchor}'")
+            return self._anchors[event.anchor]
+
+        tag = event.tag
+        if isinstance(event, ScalarEvent):
+            if tag is None or tag == "!":
+                tag = loader.resolve(ScalarNode, event.value, event.implicit)
+            node = ScalarNode(
+                tag, event.value, event.start_mark, event.end_mark, style=event.style
+            )
+        elif isinstance(event, SequenceStartEvent):
+            if tag is None or tag == "!":
+                tag = loader.resolve(SequenceNode, None, event.implicit)
+            node = SequenceNode(tag, [], event.start_mark, None, event.flow_style)
+            while not loader.check_event(SequenceEndEvent):
+                node.value.append(self._compose())
+            node.end_mark = loader.get_event().end_mark
+        elif isinstance(event, MappingStartEvent):
+            if tag is None or tag == "!":
+                tag = loader.resolve(MappingNode, None, event.implicit)
+            node = MappingNode(tag, [], event.start_mark, None, event.flow_style)
+            while not loader.check_event(MappingEndEvent):
+                key = self._compose()
+                node.value.append((key, self._compose()))
+            node.end_mark = loader.get_event().end_mark
+        else:
+            raise ValueError(f"Unexpected YAML event {event}")
+        if event.anchor is not None:
+            self._anchors[event.anchor] = node
+        return node
+
+
+def scan_topology(yaml_file: str, loader: type = yaml.SafeLoader) -> dict:
+    """
+    Read the skeleton of a CML2 topology.
+
+    The lab information and links are read in full. Of every node and its
+    interfaces only the fields needed to resolve the links are read, the node
+    configurations and other fields are skipped without being built.
+
+    :param yaml_file: The path to the YAML file containing the CML2 topology.
+    :param loader: The YAML loader class to parse the file with.
+    :return: A dictionary shaped like the parsed topology, with node metadata.
+    """
+
+    topology = {}
+    with TopologyReader(yaml_file, loader) as reader:
+        for section in reader.sections():
+            if section == "nodes":
+                topology["nodes"] = nodes = []
+                for _ in reader.items():
+                    node = {}
+                    for key in reader.keys():
+                        if key in NODE_METADATA:
+                            node[key] = reader.read()
+                        elif key == "interfaces":
+                            node[key] = [
+                                _read_fields(reader, INTERFACE_METADATA)
+                                for _ in reader.items()
+                            ]
+                        else:
+                            reader.skip()
+                    nodes.append(node)
+            elif section == "links":
+                topology["links"] = [reader.read() for _ in reader.items()]
+            elif section == "lab":
+                topology["lab"] = reader.read()
+            else:
+                reader.skip()
+    return topology
+
+
+def _read_fields(reader: TopologyReader, fields: Tuple[str, ...]) -> dict:
+    """
+    Read the given fields of the mapping that comes next.
+
+    :param reader: The topology reader.
+    :param fields: The keys of the fields to read, others are skipped.
+    :return: A dictionary with the fields that were found.
+    """
+
+    data = {}
+    for key in reader.keys():
+        if key in fields:
+            data[key] = reader.read()
+        else:
+            reader.skip()
+    return data
+
+
+def iter_nodes(yaml_file: str, loader: type = yaml.SafeLoader) -> Iterator[dict]:
+    """
+    Read the nodes of a CML2 topology one at a time.
+
+    Only one node is held in memory at a time, reading stops after the last
+    node.
+
+    :param yaml_file: The path to the YAML file containing the CML2 topology.
+    :param loader: The YAML loader class to parse the file with.
+    :return: An iterator of the nodes as dictionaries.
+    """
+
+    with TopologyReader(yaml_file, loader) as reader:
+        for section in reader.sections():
+            if section != "nodes":
+                reader.skip()
+                continue
+            for _ in reader.items():
+                yield reader.read()
+            return
@@ -0,0 +1,347 @@
+# (c) 2023-2024 Piotr Wojciechowski <piotr@it-playground.pl>
+# MIT License (see LICENSE)
+
+import hashlib
+import io
+import json
+import threading
+from argparse import ArgumentParser
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, Hashable, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from cml2tf.api import ConversionError, ConvertOptions, convert
+from cml2tf.archive import write_archive
+from cml2tf.shards import DEFAULT_SHARD_SIZE
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_CACHE_SIZE = 64
+# Largest topology export accepted, in bytes
+MAX_REQUEST_SIZE = 256 << 20
+# Seconds an idle keep-alive connection holds on to its worker
+KEEPALIVE_TIMEOUT = 5
+
+
+class ResultCache:
+    """Size-bounded LRU cache of conversion results.
+
+    Results are the files of a converted lab, and their size is the size of
+    the content of all files. When the cache grows over its size, the least
+    recently used results are evicted. A result larger than the whole cache
+    is not cached at all.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, Dict[str, str]] = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Dict[str, str]]:
+        """
+        Look up a result and mark it as recently used.
+
+        :param key: The key of the result.
+        :return: The files of the result, or None if it is not cached.
+        """
+
+        with self._lock:
+            files = self._entries.get(key)
+            if files is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return files
+
+    def put(self, key: Hashable, files: Dict[str, str]) -> None:
+        """
+        Store a result, evicting the least recently used ones to make room.
+
+        :param key: The key of the result.
+        :param files: The files of the result.
+        :return: None
+        """
+
+        size = sum(len(content) for content in files.values())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            while self.bytes + size > self.max_bytes:
+                evicted, _ = self._entries.popitem(last=False)
+                self.bytes -= self._sizes.pop(evicted)
+            self._entries[key] = files
+            self._sizes[key] = size
+            self.bytes += size
+
+    def stats(self) -> dict:
+        """
+        Describe the use of the cache.
+
+        :return: The number of entries, their size, the hits and misses.
+        """
+
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def warm_environment(template_cache: Optional[str] = None) -> None:
+    """
+    Create the template environment and compile all templates up front.
+
+    :param template_cache: The directory of the bytecode cache, or None.
+    :return: None
+    """
+
+    from cml2tf.environment import get_environment
+
+    environment = get_environment(template_cache)
+    for name in environment.list_templates():
+        environment.get_template(name)
+
+
+def request_options(query: str, template_cache: Optional[str] = None) -> ConvertOptions:
+    """
+    Build the options of a conversion from the query string of a request.
+
+    :param query: The query string, like 'configs=1&shard=count&shard_size=100'.
+    :param template_cache: The directory of the bytecode cache, or None.
+    :return: The options of the conversion.
+    :raises ValueError: If a parameter has an invalid value.
+    """
+
+    params = {name: values[-1] for name, values in parse_qs(query).items()}
+    try:
+        shard_size = int(params.get("shard_size", DEFAULT_SHARD_SIZE))
+    except ValueError:
+        raise ValueError("Shard size must be a number") from None
+    return ConvertOptions(
+        configs=params.get("configs", "").lower() in ("1", "true", "yes"),
+        shard=params.get("shard") or None,
+        shard_size=shard_size,
+        parser=params.get("parser", "auto"),
+        template_cache=template_cache,
+        emitter=params.get("emitter", "jinja"),
+    )
+
+
+def tar_archive(files: Dict[str, str]) -> bytes:
+    """
+    Pack the files of a Terraform project into an uncompressed tar archive.
+
+    :param files: A mapping of file names to their content.
+    :return: The tar archive.
+    """
+
+    buffer = io.BytesIO()
+    write_archive(files, buffer)
+    return buffer.getvalue()
+
+
+class ConversionServer(HTTPServer):
+    """Local HTTP server converting CML2 lab exports to Terraform.
+
+    Requests are handled by a fixed pool of worker threads, which all share
+    one template environment compiled when the server starts. Results are
+    cached by the hash of the export and the conversion options, so the same
+    lab is converted only once while it stays in the cache.
+    """
+
+    def __init__(
+        self,
+        address: tuple = (DEFAULT_HOST, DEFAULT_PORT),
+        workers: Optional[int] = None,
+        cache_size: int = DEFAULT_CACHE_SIZE << 20,
+        template_cache: Optional[str] = None,
+    ) -> None:
+        warm_environment(template_cache)
+        super().__init__(address, ConversionHandler)
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="cml2tf-serve")
+        self.cache = ResultCache(cache_size)
+        self.template_cache = template_cache
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def process_request(self, request, client_address) -> None:
+        self.executor.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    """Handle the requests of the conversion server.
+
+    POST /convert with a YAML lab export as the body returns the files of the
+    Terraform project, as JSON or, with format=tar or an Accept header of
+    application/x-tar, as a tar archive. GET /health returns the cache use.
+    """
+
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_TIMEOUT
+    server: ConversionServer
+
+    def reply(
+        self,
+        status: int,
+        body: bytes,
+        content_type: str = "application/json",
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def reply_json(self, status: int, data: dict, **kwargs) -> None:
+        self.reply(status, json.dumps(data).encode(), **kwargs)
+
+    def do_GET(self) -> None:
+        if urlsplit(self.path).path != "/health":
+            return self.reply_json(404, {"error": "Not found"})
+        self.reply_json(200, {"status": "ok", "cache": self.server.cache.stats()})
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        if url.path != "/convert":
+            return self.reply_json(404, {"error": "Not found"})
+        length = self.headers.get("Content-Length")
+        if length is None or not length.isdigit():
+            return self.reply_json(411, {"error": "Content-Length required"})
+        if int(length) > MAX_REQUEST_SIZE:
+            self.close_connection = True
+            return self.reply_json(413, {"error": "Topology export too large"})
+        body = self.rfile.read(int(length))
+
+        try:
+            options = request_options(url.query, self.server.template_cache)
+        except ValueError as error:
+            return self.reply_json(400, {"error": str(error)})
+        params = parse_qs(url.query)
+        tar = params.get("format", [""])[-1] == "tar" or "application/x-tar" in (
+            self.headers.get("Accept") or ""
+        )
+
+        key = (hashlib.sha256(body).hexdigest(), options)
+        files = self.server.cache.get(key)
+        cache_status = "hit"
+        if files is None:
+            cache_status = "miss"
+            try:
+                files = convert(body, options)
+            except ValueError as error:
+                return self.reply_json(400, {"error": str(error)})
+            except ConversionError as error:
+                return self.reply_json(
+                    422, {"error": str(error), "errors": error.errors}
+                )
+            self.server.cache.put(key, files)
+
+        headers = {"X-Cache": cache_status}
+        if tar:
+            self.reply(200, tar_archive(files), "application/x-tar", headers)
+        else:
+            self.reply_json(200, {"files": files}, headers=headers)
+
+
+def serve_main(argv: List[str]) -> None:
+    """
+    Run the conversion server until it is interrupted.
+
+    :param argv: The command line arguments after 'serve'.
+    :return: None
+    """
+
+    parser = ArgumentParser(prog="cml2tf serve")
+    parser.epilog = (
+        "Usage example: cml2tf serve --port 8080, then "
+        + "curl --data-binary @topology.yaml 'http://127.0.0.1:8080/convert?configs=1'"
+    )
+    parser.add_argument(
+        "--host",
+        default=DEFAULT_HOST,
+        help=f"Address to listen on (default: {DEFAULT_HOST})",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help=f"Port to listen on (default: {DEFAULT_PORT})",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Number of requests handled concurrently (by default based on the number of CPUs)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_CACHE_SIZE,
+        metavar="MIB",
+        help="Size of the cache of conversion results in MiB, 0 disables it "
+        + f"(default: {DEFAULT_CACHE_SIZE})",
+    )
+    parser.add_argument(
+        "--template-cache",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="DIR",
+        help="Cache compiled templates on disk (by default in the user cache directory)",
+    )
+
+    p = parser.parse_args(argv)
+    if p.workers is not None and p.workers < 1:
+        parser.error("Number of workers must be at least 1")
+    if p.cache_size < 0:
+        parser.error("Cache size must not be negative")
+    if p.template_cache == "":
+        from cml2tf.environment import default_template_cache_dir
+
+        p.template_cache = default_template_cache_dir()
+
+    try:
+        server = ConversionServer(
+            (p.host, p.port), p.workers, p.cache_size << 20, p.template_cache
+        )
+    except OSError as error:
+        print(f"Error: Unable to listen on {p.host}:{p.port}. {error}")
+        exit(1)
+    print(f"Serving on {server.url}, press Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopped serving")
+    finally:
+        server.server_close()
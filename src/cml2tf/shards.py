@@ -0,0 +1,73 @@
+# (c) 2023-2024 Piotr Wojciechowski <piotr@it-playground.pl>
+# MIT License (see LICENSE)
+
+import re
+from typing import Dict, List, NamedTuple
+
+SHARD_MODES = ("count", "tag")
+DEFAULT_SHARD_SIZE = 500
+
+
+class Shard(NamedTuple):
+    filename: str
+    nodes: list
+    links: list
+
+
+def shard_by_count(prefix: str, items: list, size: int) -> Dict[str, list]:
+    """
+    Split resources into numbered shards of at most 'size' resources.
+
+    :param prefix: The filename prefix of the shards, like 'nodes'.
+    :param items: The resources to split.
+    :param size: The maximum number of resources per shard.
+    :return: A dictionary mapping shard filenames to their resources.
+    """
+
+    return {
+        f"{prefix}_{index:03d}.tf": items[start : start + size]
+        for index, start in enumerate(range(0, len(items), size))
+    }
+
+
+def shard_by_tag(prefix: str, nodes: list) -> Dict[str, list]:
+    """
+    Split nodes into shards by their first tag.
+
+    Nodes without tags go to the 'untagged' shard. Characters which are not
+    safe in filenames are replaced in the tag.
+
+    :param prefix: The filename prefix of the shards, like 'nodes'.
+    :param nodes: The nodes to split.
+    :return: A dictionary mapping shard filenames to their nodes.
+    """
+
+    shards: Dict[str, list] = {}
+    for node in nodes:
+        tags = node.node_tags or ["untagged"]
+        tag = re.sub(r"[^A-Za-z0-9_-]", "_", str(tags[0]))
+        shards.setdefault(f"{prefix}_{tag}.tf", []).append(node)
+    return shards
+
+
+def plan_shards(nodes: list, links: list, mode: str, size: int) -> List[Shard]:
+    """
+    Split the nodes and links of a lab into shards rendered to separate files.
+
+    Nodes are split by count or by tag, links are always split by count.
+
+    :param nodes: The nodes of the lab.
+    :param links: The links of the lab.
+    :param mode: One of 'count' or 'tag'.
+    :param size: The maximum number of resources per shard split by count.
+    :return: The shards, node shards first.
+    """
+
+    if mode == "tag":
+        node_shards = shard_by_tag("nodes", nodes)
+    else:
+        node_shards = shard_by_count("nodes", nodes, size)
+    link_shards = shard_by_count("links", links, size)
+    return [Shard(filename, shard, []) for filename, shard in node_shards.items()] + [
+        Shard(filename, [], shard) for filename, shard in link_shards.items()
+    ]
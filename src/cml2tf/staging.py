@@ -0,0 +1,108 @@
+# (c) 2023-2024 Piotr Wojciechowski <piotr@it-playground.pl>
+# MIT License (see LICENSE)
+
+import os
+import shutil
+import tempfile
+from typing import Iterable, List, Union
+
+# Size of the write buffer of staged files
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+class StagedDirectory:
+    """Stage the files of a directory and move them into place on commit.
+
+    Files are written into a temporary sibling of the directory, on the same
+    file system, so each one replaces its counterpart in the directory with a
+    rename. Only the written files are touched: the directory itself and
+    everything else in it, like the Terraform state or files of the user,
+    stay where they are. A conversion which fails halfway leaves the
+    directory untouched, and the staged directory is removed.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = os.path.realpath(directory)
+        parent, name = os.path.split(self.directory)
+        os.makedirs(parent, exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix=f".{name}.", suffix=".staged", dir=parent)
+        self.files: List[str] = []
+
+    def __enter__(self) -> "StagedDirectory":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is not None:
+            self.discard()
+
+    def file(self, filename: str) -> str:
+        """
+        Return the path of a file in the staged directory.
+
+        :param filename: The name of the file.
+        :return: The path of the file.
+        """
+
+        return os.path.join(self.path, filename)
+
+    def write(self, filename: str, content: Union[str, Iterable[str]]) -> str:
+        """
+        Write a file into the staged directory.
+
+        The content is either a string or an iterable of strings, like a
+        rendered template stream, which is collected in a large buffer and
+        written in bulk.
+
+        :param filename: The name of the file.
+        :param content: The content of the file.
+        :return: The path of the file.
+        :raises OSError: If the file cannot be written.
+        """
+
+        path = self.file(filename)
+        with open(path, "w", buffering=WRITE_BUFFER_SIZE) as file:
+            if isinstance(content, str):
+                file.write(content)
+            else:
+                file.writelines(content)
+        self.files.append(filename)
+        return path
+
+    def commit(self, drop: Iterable[str] = ()) -> List[str]:
+        """
+        Move the staged files into the directory and remove the dropped ones.
+
+        Files written directly into the staged directory, like configuration
+        files, are moved first, then the files written with write() in the
+        order they were written, so the last one written, like a manifest,
+        is replaced last.
+
+        :param drop: The names of files of the directory to remove.
+        :return: The names of the dropped files that existed.
+        :raises OSError: If a file cannot be moved or removed.
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+        written = set(self.files)
+        staged = [name for name in os.listdir(self.path) if name not in written]
+        for filename in staged + self.files:
+            os.replace(self.file(filename), os.path.join(self.directory, filename))
+        os.rmdir(self.path)
+
+        dropped = []
+        for filename in sorted(set(drop) - written):
+            try:
+                os.unlink(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                continue
+            dropped.append(filename)
+        return dropped
+
+    def discard(self) -> None:
+        """
+        Remove the staged directory and everything written into it.
+
+        :return: None
+        """
+
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -4,6 +4,7 @@
 from typing import Optional
 
 from .nodeconfig import NodeConfig
+from .records import LinkRecord, NodeRecord
 
 
 class CML2Topology:
@@ -11,8 +12,11 @@ class CML2Topology:
         self.topology = cml2_topology
         self.nodes = []
         self.links = []
+        self._nodes_by_id = {}
+        self._slots_by_interface = {}
 
         self._read_lab_nodes()
+        self._index_lab_nodes()
         self._read_lab_links()
 
     def _read_lab_nodes(self) -> None:
@@ -21,7 +25,7 @@ class CML2Topology:
 
         This internal method extracts information about each node from the topology data, if available.
         It processes each node's details such as its name, ID, definition, position, interfaces, and other
-        configurations, and stores them in a list.
+        configurations, and stores them in a list of compact node records.
 
         :return: None
         """
@@ -29,27 +33,56 @@ class CML2Topology:
         # TODO: Add support for initial config
         # TODO: Add support for provider version 0.7.0 new features and fields
 
-        self.nodes = [
-            {
-                "node_name": node.get("label"),
-                "node_id": node.get("id"),
-                "node_definition": node.get("node_definition"),
-                "node_x": node.get("x"),
-                "node_y": node.get("y"),
-                "node_interfaces": node.get("interfaces"),
-                "node_boot_disk_size": node.get("boot_disk_size"),
-                "node_image_definition": node.get("image_definition"),
-                "node_ram": node.get("ram"),
-                "node_cpus": node.get("cpus"),
-                "node_cpu_limit": node.get("cpu_limit"),
-                "node_data_volume": node.get("data_volume"),
-                "node_configuration": NodeConfig(
-                    node.get("label"), node.get("configuration", "")
-                ),
-                "node_tags": node.get("tags"),
-            }
-            for node in self.topology.get("nodes", [])
-        ]
+        self.nodes = [self.node_record(node) for node in self.topology.get("nodes", [])]
+
+    @staticmethod
+    def node_record(node: dict) -> NodeRecord:
+        """
+        Build the record of a single node from its topology data.
+
+        This method is used to read the nodes of a topology, and on its own to build the records of nodes
+        read one at a time from a topology that is streamed instead of loaded at once.
+
+        :param node: The node data as a dictionary.
+        :return: The node record.
+        """
+
+        return NodeRecord(
+            node_name=node.get("label"),
+            node_id=node.get("id"),
+            node_definition=node.get("node_definition"),
+            node_x=node.get("x"),
+            node_y=node.get("y"),
+            node_interfaces=node.get("interfaces"),
+            node_boot_disk_size=node.get("boot_disk_size"),
+            node_image_definition=node.get("image_definition"),
+            node_ram=node.get("ram"),
+            node_cpus=node.get("cpus"),
+            node_cpu_limit=node.get("cpu_limit"),
+            node_data_volume=node.get("data_volume"),
+            node_configuration=NodeConfig(
+                node.get("label"), node.get("configuration", "")
+            ),
+            node_tags=node.get("tags"),
+        )
+
+    def _index_lab_nodes(self) -> None:
+        """
+        Build lookup indexes over the nodes read from the topology data.
+
+        This internal method maps every node ID to its node and every (node ID, interface ID) pair to the
+        interface slot, so that resolving the endpoints of a link is a dictionary lookup instead of a scan
+        over all nodes and their interfaces.
+
+        :return: None
+        """
+
+        self._nodes_by_id = {node.node_id: node for node in self.nodes}
+        self._slots_by_interface = {
+            (node.node_id, interface.get("id")): interface.get("slot")
+            for node in self.nodes
+            for interface in node.node_interfaces or []
+        }
 
     def _read_lab_links(self) -> None:
         """
@@ -57,23 +90,23 @@ class CML2Topology:
 
         This internal method extracts information about each link from the topology data, if available.
         It processes each link's details, including the connected nodes and their interfaces, and stores
-        them in a list.
+        them in a list of compact link records.
 
         :return: None
         """
 
         self.links = [
-            {
-                "link_name": link.get("id"),
-                "node_a": self.get_node_name_by_id(link.get("n1")),
-                "node_b": self.get_node_name_by_id(link.get("n2")),
-                "slot_a": self.get_node_interface_slot_by_id(
+            LinkRecord(
+                link_name=link.get("id"),
+                node_a=self.get_node_name_by_id(link.get("n1")),
+                node_b=self.get_node_name_by_id(link.get("n2")),
+                slot_a=self.get_node_interface_slot_by_id(
                     link.get("n1"), link.get("i1")
                 ),
-                "slot_b": self.get_node_interface_slot_by_id(
+                slot_b=self.get_node_interface_slot_by_id(
                     link.get("n2"), link.get("i2")
                 ),
-            }
+            )
             for link in self.topology.get("links", [])
         ]
 
@@ -127,9 +160,9 @@ class CML2Topology:
         Retrieve the list of nodes in the lab.
 
         This method returns a list of all nodes stored in the topology. Each node is represented as a
-        dictionary containing its details.
+        NodeRecord containing its details, use as_dict() on it for a dictionary.
 
-        :return: A list of dictionaries, each representing a node in the lab.
+        :return: A list of node records, each representing a node in the lab.
         """
 
         return self.nodes
@@ -139,9 +172,10 @@ class CML2Topology:
         Retrieve the list of links in the lab.
 
         This method returns a list of all links stored in the topology. Each link is represented as a
-        dictionary containing details about the connected nodes and their interfaces.
+        LinkRecord containing details about the connected nodes and their interfaces, use as_dict() on
+        it for a dictionary.
 
-        :return: A list of dictionaries, each representing a link in the lab.
+        :return: A list of link records, each representing a link in the lab.
         """
 
         return self.links
@@ -154,10 +188,10 @@ class CML2Topology:
         :return: The node_name corresponding to the node_id.
         :raises ValueError: If the node_id is not found in the list.
         """
-        for node in self.nodes:
-            if node.get("node_id") == node_id:
-                return node.get("node_name")
-        raise ValueError(f"Node with ID '{node_id}' not found.")
+        node = self._nodes_by_id.get(node_id)
+        if node is None:
+            raise ValueError(f"Node with ID '{node_id}' not found.")
+        return node.node_name
 
     def get_node_interface_slot_by_id(
         self, node_id: str, interface_id: str
@@ -168,11 +202,11 @@ class CML2Topology:
         :param node_id: The node_id to query.
         :param interface_id: The interface_id to query.
         :return: The slot corresponding to the interface_id on node_id.
-        :raises ValueError: If the node_id is not found in the list.
-        """
-        for node in self.nodes:
-            if node.get("node_id") == node_id:
-                for interface in node.get("node_interfaces", []):
-                    if interface.get("id") == interface_id:
-                        return interface.get("slot")
-        raise ValueError(f"Node with ID '{node_id}' not found.")
+        :raises ValueError: If the interface_id is not found on node_id.
+        """
+        try:
+            return self._slots_by_interface[(node_id, interface_id)]
+        except KeyError:
+            raise ValueError(
+                f"Interface with ID '{interface_id}' on node with ID '{node_id}' not found."
+            ) from None
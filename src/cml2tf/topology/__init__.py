@@ -2,5 +2,6 @@
 # MIT License (see LICENSE)
 
 from .CML2Topology import CML2Topology
+from .records import LinkRecord, NodeRecord
 
-__ALL__ = [CML2Topology]
+__ALL__ = [CML2Topology, LinkRecord, NodeRecord]
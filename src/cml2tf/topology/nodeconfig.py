@@ -1,4 +1,11 @@
-from typing import Dict, List, Union
+import os
+from functools import cached_property
+from typing import Dict, Iterator, List, Optional, Union
+
+# Configurations larger than this, in characters, are passed through in chunks
+LARGE_CONFIG_SIZE = 1 << 20
+# Size of the chunks large configurations are written and indented in
+CHUNK_SIZE = 1 << 20
 
 
 class NodeConfig:
@@ -6,65 +13,133 @@ class NodeConfig:
     files per node. This class handles the two variants:
         - a simple string (pre 2.7 behavior)
         - a list of objects, key is "name", value is "content"
-    This class can then serialize the content either into the proper HCL for
-    multi-line configs (to be done as the provider does not support it, yet)
-    or into a string representation.
+    A node with several named configurations is serialized as a list of them,
+    each one is available as a NodeConfig of its own from configs().
+    The selected configuration and the views derived from it are computed
+    lazily, once, as the template asks for several of them per node. Indented
+    copies for heredocs are not kept, see out().
     """
 
     def __init__(self, label: str, config: Union[str, List[Dict[str, str]]]) -> None:
         self._config = config
         self._label = label
+        self._stored: Optional[str] = None
+
+    @cached_property
+    def _text(self) -> str:
+        """the configuration string selected from the node configuration. For
+        the 2.7.0 / list configuration object, this is the first configuration
+        from the list, the others are available from configs().
+        """
+        if isinstance(self._config, list):
+            if len(self._config) == 0:
+                return ""
+            return self._config[0]["content"]
+        elif isinstance(self._config, str):
+            return self._config
+        raise ValueError("unhandled config type", type(self._config))
+
+    @cached_property
+    def _configs(self) -> List["NodeConfig"]:
+        "the named configurations of a node with several of them."
+        return [NodeConfig(self._label, [item]) for item in self._config]
+
+    @cached_property
+    def _line_count(self) -> int:
+        "the number of lines of the configuration."
+        return self._text.count("\n") + 1
+
+    def multi(self) -> bool:
+        "returns True when the node has more than one named configuration."
+        return isinstance(self._config, list) and len(self._config) > 1
+
+    def configs(self) -> List["NodeConfig"]:
+        """returns every configuration of the node as a NodeConfig of its own.
+        A node with a single configuration returns itself.
+        """
+        if self.multi():
+            return self._configs
+        return [self]
+
+    def name(self) -> Optional[str]:
+        "returns the name of the configuration, None for a plain string."
+        if isinstance(self._config, list) and len(self._config) > 0:
+            return self._config[0]["name"]
+        return None
 
     def empty(self) -> bool:
-        "returns True when the configuration is empty."
-        return len(self.out()) == 0
+        "returns True when the configuration (all of them, if several) is empty."
+        if self.multi():
+            return all(config.empty() for config in self._configs)
+        return len(self._text) == 0
 
     def oneline(self) -> bool:
         "returns True when the configuration has exactly one line."
-        return len(self.out().split("\n")) == 1
+        return self._line_count == 1
+
+    def size(self) -> int:
+        "returns the length of the configuration in characters."
+        return len(self._text)
 
     def out(self, indent=0) -> str:
         """simply return the configuration string, indented to fit into the HCL
-        here-doc. For the 2.7.0 / list configuration object, it returns only
-        the first configuration from the list. To be changed when the CML2 TF
-        provider supports multi-line configs.
+        here-doc. The indented string is built on every call and not cached,
+        as the copy would be held as long as the node, for every indent width.
         """
-        if isinstance(self._config, list):
-            if len(self._config) == 0:
-                return ""
-            config = self._config[0]["content"]
-            # TODO: need to process multi-configs when TF provider supports them!
-            # for item in self._config:
-            #     if item["name"] == "default":
-            #         return item["content"]
-        elif isinstance(self._config, str):
-            config = self._config
-        else:
-            raise ValueError("unhandled config type", type(self._config))
-        lines = [" " * indent + line for line in config.split("\n")]
-        return "\n".join(lines)
-
-    def fileout(self) -> str:
-        """return the filename of the file that has been created and where the
-        configuration for the node is stored.
+        if indent == 0:
+            return self._text
+        prefix = " " * indent
+        return prefix + self._text.replace("\n", "\n" + prefix)
+
+    def chunks(self, indent=0) -> Iterator[str]:
+        """yield the configuration string like out() does, in chunks of whole
+        lines of about CHUNK_SIZE characters. Only one chunk is copied at a
+        time, so a large configuration is never copied as a whole.
+        """
+        text = self._text
+        newline = "\n" + " " * indent
+        start, length = 0, len(text)
+        if indent:
+            yield " " * indent
+        while start < length:
+            end = text.find("\n", start + CHUNK_SIZE)
+            end = length if end < 0 else end
+            chunk = text[start:end]
+            yield chunk.replace("\n", newline) if indent else chunk
+            start = end
+
+    def filename(self) -> str:
+        """return the name of the file where the configuration for the node is
+        stored by fileout(), or the file it shares with identical
+        configurations of other nodes (see store()). Nothing is written.
         """
-        filename = ""
+        if self._stored is not None:
+            return self._stored
         if isinstance(self._config, list):
             # this should never be called for an empty file
             assert len(self._config) > 0
             name = self._config[0]["name"]
-            config = self._config[0]["content"]
-            # TODO: need to process multi-configs when TF provider supports them!
-            # for item in self._config:
-            #     if item["name"] == "default":
-            #         return item["content"]
-            filename = f"{self._label}-{name}.cfg"
+            return f"{self._label}-{name}.cfg"
         elif isinstance(self._config, str):
-            config = self._config
-            filename = f"{self._label}.cfg"
-        else:
-            raise ValueError("unhandled config type", type(self._config))
+            return f"{self._label}.cfg"
+        raise ValueError("unhandled config type", type(self._config))
 
-        with open(filename, "w") as fh:
-            fh.write(config)
+    def store(self, filename: str) -> None:
+        """reference the given file instead of a file of our own, as it holds
+        the identical configuration of another node.
+        """
+        self._stored = filename
+
+    def fileout(self, directory: str = ".", large_size: int = LARGE_CONFIG_SIZE) -> str:
+        """write the configuration for the node into its file in the given
+        directory and return the filename of the file that has been created.
+        A configuration larger than large_size is passed through in chunks, so
+        it is never encoded as a whole.
+        """
+        filename = self.filename()
+        with open(os.path.join(directory, filename), "w") as fh:
+            if len(self._text) > large_size:
+                fh.writelines(self.chunks())
+            else:
+                fh.write(self._text)
         return filename
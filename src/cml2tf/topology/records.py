@@ -0,0 +1,123 @@
+# (c) 2023-2024 Piotr Wojciechowski <piotr@it-playground.pl>
+# MIT License (see LICENSE)
+
+from collections.abc import Mapping
+from typing import Any, Iterator, Optional
+
+from .nodeconfig import NodeConfig
+
+
+class Record(Mapping):
+    """Compact record of a topology element.
+
+    Records keep their fields in __slots__ instead of a per-object dictionary,
+    which takes considerably less memory for large labs. The fields are read as
+    attributes; for backward compatibility a record is also a read-only mapping
+    of its fields, like the dictionaries used before, and as_dict() returns
+    such a dictionary.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __len__(self) -> int:
+        return len(self.__slots__)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__slots__
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def as_dict(self) -> dict:
+        "returns the record as a dictionary."
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class NodeRecord(Record):
+    __slots__ = (
+        "node_name",
+        "node_id",
+        "node_definition",
+        "node_x",
+        "node_y",
+        "node_interfaces",
+        "node_boot_disk_size",
+        "node_image_definition",
+        "node_ram",
+        "node_cpus",
+        "node_cpu_limit",
+        "node_data_volume",
+        "node_configuration",
+        "node_tags",
+    )
+
+    def __init__(
+        self,
+        node_name: Optional[str],
+        node_id: Optional[str],
+        node_definition: Optional[str],
+        node_x: Any,
+        node_y: Any,
+        node_interfaces: Optional[list],
+        node_boot_disk_size: Any,
+        node_image_definition: Optional[str],
+        node_ram: Any,
+        node_cpus: Any,
+        node_cpu_limit: Any,
+        node_data_volume: Any,
+        node_configuration: NodeConfig,
+        node_tags: Optional[list],
+    ) -> None:
+        self.node_name = node_name
+        self.node_id = node_id
+        self.node_definition = node_definition
+        self.node_x = node_x
+        self.node_y = node_y
+        self.node_interfaces = node_interfaces
+        self.node_boot_disk_size = node_boot_disk_size
+        self.node_image_definition = node_image_definition
+        self.node_ram = node_ram
+        self.node_cpus = node_cpus
+        self.node_cpu_limit = node_cpu_limit
+        self.node_data_volume = node_data_volume
+        self.node_configuration = node_configuration
+        self.node_tags = node_tags
+
+
+class LinkRecord(Record):
+    __slots__ = ("link_name", "node_a", "node_b", "slot_a", "slot_b")
+
+    def __init__(
+        self,
+        link_name: Optional[str],
+        node_a: Optional[str],
+        node_b: Optional[str],
+        slot_a: Any,
+        slot_b: Any,
+    ) -> None:
+        self.link_name = link_name
+        self.node_a = node_a
+        self.node_b = node_b
+        self.slot_a = slot_a
+        self.slot_b = slot_b
@@ -0,0 +1,139 @@
+# (c) 2023-2024 Piotr Wojciechowski <piotr@it-playground.pl>
+# MIT License (see LICENSE)
+
+import re
+from typing import Dict, List, Set, Tuple
+
+# Terraform identifiers start with a letter or underscore, followed by
+# letters, digits, underscores and hyphens
+IDENTIFIER = re.compile(r"[^\W\d][\w-]*\Z")
+
+
+class TopologyError(ValueError):
+    """Raised when a topology has integrity errors, carrying all of them."""
+
+    def __init__(self, errors: List[str]) -> None:
+        self.errors = errors
+        super().__init__(
+            f"The topology has {count_errors(errors)}: " + "; ".join(errors)
+        )
+
+
+def count_errors(errors: List[str]) -> str:
+    """
+    Describe the number of errors, like '1 error' or '3 errors'.
+
+    :param errors: The error messages.
+    :return: The number of errors with the noun in the right form.
+    """
+
+    return f"{len(errors)} error{'' if len(errors) == 1 else 's'}"
+
+
+def is_identifier(name) -> bool:
+    """
+    Check whether a name can be used as the name of a Terraform resource.
+
+    :param name: The name to check.
+    :return: True if the name is a valid Terraform identifier.
+    """
+
+    return isinstance(name, str) and IDENTIFIER.match(name) is not None
+
+
+def validate_topology(topology: dict) -> List[str]:
+    """
+    Check the integrity of a CML2 topology and report every error found.
+
+    Node IDs, labels and interfaces are indexed in a single pass over the
+    nodes, which the links are then checked against in a single pass, so
+    validation takes linear time and runs before anything is rendered. Node
+    labels and link IDs become the names of Terraform resources, so they must
+    be unique, valid identifiers. Links must reference existing nodes and
+    interfaces with a slot. Interfaces without a slot are only expected for
+    loopbacks.
+
+    :param topology: The CML2 topology data as a dictionary, either complete
+        or a skeleton as read by scan_topology().
+    :return: The error messages, empty if the topology is valid.
+    """
+
+    errors = []
+    node_ids: Set[str] = set()
+    labels: Dict[str, str] = {}
+    slots: Dict[Tuple[str, str], object] = {}
+
+    for index, node in enumerate(topology.get("nodes") or []):
+        node_id, label = node.get("id"), node.get("label")
+        if node_id is None:
+            errors.append(f"Node #{index} has no ID")
+            node_id = f"#{index}"
+        elif node_id in node_ids:
+            errors.append(f"Node ID '{node_id}' is used by more than one node")
+        node_ids.add(node_id)
+
+        if not is_identifier(label):
+            errors.append(
+                f"Node '{node_id}' label {label!r} is not a valid Terraform identifier"
+            )
+        elif label in labels:
+            errors.append(
+                f"Node '{node_id}' label '{label}' is already used by node "
+                + f"'{labels[label]}'"
+            )
+        else:
+            labels[label] = node_id
+
+        for interface in node.get("interfaces") or []:
+            interface_id, slot = interface.get("id"), interface.get("slot")
+            if (node_id, interface_id) in slots:
+                errors.append(
+                    f"Interface ID '{interface_id}' is used more than once on node "
+                    + f"'{node_id}'"
+                )
+            elif slot is None and interface.get("type", "physical") != "loopback":
+                errors.append(
+                    f"Interface '{interface_id}' on node '{node_id}' has no slot"
+                )
+            slots[node_id, interface_id] = slot
+
+    link_ids: Set[str] = set()
+    for index, link in enumerate(topology.get("links") or []):
+        link_id = link.get("id")
+        if not is_identifier(link_id):
+            errors.append(
+                f"Link #{index} ID {link_id!r} is not a valid Terraform identifier"
+            )
+        elif link_id in link_ids:
+            errors.append(f"Link ID '{link_id}' is used by more than one link")
+        link_ids.add(link_id)
+
+        for node_key, interface_key in (("n1", "i1"), ("n2", "i2")):
+            node_id, interface_id = link.get(node_key), link.get(interface_key)
+            if node_id not in node_ids:
+                errors.append(f"Link '{link_id}' references missing node '{node_id}'")
+            elif (node_id, interface_id) not in slots:
+                errors.append(
+                    f"Link '{link_id}' references missing interface "
+                    + f"'{interface_id}' on node '{node_id}'"
+                )
+            elif slots[node_id, interface_id] is None:
+                errors.append(
+                    f"Link '{link_id}' connects interface '{interface_id}' on node "
+                    + f"'{node_id}' which has no slot"
+                )
+    return errors
+
+
+def check_topology(topology: dict) -> None:
+    """
+    Validate a CML2 topology, see validate_topology().
+
+    :param topology: The CML2 topology data as a dictionary.
+    :return: None
+    :raises TopologyError: If the topology has integrity errors.
+    """
+
+    errors = validate_topology(topology)
+    if errors:
+        raise TopologyError(errors)
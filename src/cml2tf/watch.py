@@ -0,0 +1,147 @@
+# (c) 2023-2024 Piotr Wojciechowski <piotr@it-playground.pl>
+# MIT License (see LICENSE)
+
+import hashlib
+import os
+import threading
+import time
+from argparse import Namespace
+from typing import Dict, List, Optional, Set, Tuple
+
+from cml2tf.batch import BatchResult, convert_lab, expand_inputs
+
+POLL_INTERVAL = 0.2
+DEFAULT_DEBOUNCE = 0.5
+
+
+def stat_inputs(inputs: List[str]) -> Dict[str, Tuple[int, int]]:
+    """
+    Take a snapshot of the topology files matched by the input arguments.
+
+    The inputs are expanded again on every call, so labs added to a watched
+    directory are picked up and removed labs are dropped.
+
+    :param inputs: The input arguments as given on the command line.
+    :return: The modification time and size of every topology file.
+    """
+
+    snapshot = {}
+    for lab in expand_inputs(inputs):
+        try:
+            stat = os.stat(lab)
+        except OSError:
+            continue
+        snapshot[lab] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+def file_digest(filename: str) -> Optional[str]:
+    """
+    Compute the digest of a file's content.
+
+    :param filename: The path to the file.
+    :return: The hex SHA-256 digest, or None if the file cannot be read.
+    """
+
+    try:
+        with open(filename, "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class LabWatcher:
+    """
+    Re-convert labs whenever their exported topology changes.
+
+    The topology files are polled and a burst of writes is debounced: labs are
+    only converted once their files stopped changing for the debounce period.
+    A lab is converted again only if the content of its file changed, so
+    touching a file or re-exporting an identical lab does nothing, and a lab
+    that failed to convert is retried once it is exported again. All
+    conversions run in this process and reuse its template environment, and
+    their output and errors are printed as they happen.
+    """
+
+    def __init__(
+        self,
+        inputs: List[str],
+        flags: Namespace,
+        batch: bool = False,
+        debounce: float = DEFAULT_DEBOUNCE,
+        interval: float = POLL_INTERVAL,
+    ):
+        self.inputs = inputs
+        self.flags = flags
+        self.batch = batch
+        self.debounce = debounce
+        self.interval = interval
+        self.digests: Dict[str, str] = {}
+        self.converted: Set[str] = set()
+        self.stopped = threading.Event()
+
+    def convert_changed(self, labs: List[str]) -> List[BatchResult]:
+        """
+        Convert the labs whose content changed since their last conversion.
+
+        :param labs: The paths to the YAML files containing the CML2 topologies.
+        :return: The result of every conversion that was run.
+        """
+
+        from cml2tf.main import lab_outdir
+
+        results = []
+        for lab in labs:
+            digest = file_digest(lab)
+            if digest is None or self.digests.get(lab) == digest:
+                continue
+            # Directories of labs converted before are ours to overwrite
+            flags = self.flags
+            if lab in self.converted:
+                flags = Namespace(**{**vars(flags), "force": True})
+            start = time.perf_counter()
+            outdir = lab_outdir(lab, flags.outdir, self.batch)
+            result = convert_lab(lab, outdir, flags, capture=False)
+            elapsed = (time.perf_counter() - start) * 1000
+            self.digests[lab] = digest
+            if result.ok:
+                self.converted.add(lab)
+                print(f"Converted {lab} -> {result.outdir} in {elapsed:.0f} ms")
+            else:
+                print(f"FAILED  {lab}: {result.message}")
+            results.append(result)
+        return results
+
+    def run(self) -> None:
+        """
+        Convert all labs and then watch them until stop() is called.
+
+        :return: None
+        """
+
+        previous = stat_inputs(self.inputs)
+        self.convert_changed(sorted(previous))
+        print("Watching for changes, press Ctrl+C to stop")
+
+        changed_at = None
+        while not self.stopped.wait(self.interval):
+            current = stat_inputs(self.inputs)
+            if current != previous:
+                previous = current
+                changed_at = time.monotonic()
+                continue
+            if changed_at is None or time.monotonic() - changed_at < self.debounce:
+                continue
+            changed_at = None
+            for lab in set(self.digests) - set(current):
+                del self.digests[lab]
+            self.convert_changed(sorted(current))
+
+    def stop(self) -> None:
+        """
+        Stop watching the labs.
+
+        :return: None
+        """
+
+        self.stopped.set()
@@ -0,0 +1,66 @@
+"""Compare the throughput of the Jinja templates and the direct HCL emitter.
+
+Run with: PYTHONPATH=src python -m tests.benchmarks.bench_emitter
+"""
+
+import time
+from argparse import ArgumentParser, Namespace
+
+from cml2tf.environment import get_environment
+from cml2tf.main import stream_main_tf
+from cml2tf.topology import CML2Topology
+
+from tests.synthetic import synthetic_topology
+
+
+def render_time(topology: CML2Topology, flags: Namespace, repeat: int) -> float:
+    """
+    Measure the best time to render main.tf.
+
+    :param topology: The topology to render.
+    :param flags: The flags selecting the emitter.
+    :param repeat: The number of measurements.
+    :return: The best time in seconds.
+    """
+
+    environment = get_environment()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in stream_main_tf(environment, topology, flags):
+            pass
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=5000)
+    parser.add_argument("--config-lines", type=int, default=20)
+    parser.add_argument("--multi-config", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    topology = CML2Topology(
+        synthetic_topology(
+            args.nodes,
+            args.config_lines,
+            links_per_node=2,
+            multi_config=args.multi_config,
+        )
+    )
+    print(f"{args.nodes} nodes, {len(topology.links)} links")
+    for configs in (False, True):
+        jinja, direct = (
+            render_time(
+                topology, Namespace(configs=configs, emitter=emitter), args.repeat
+            )
+            for emitter in ("jinja", "direct")
+        )
+        label = "configs in files" if configs else "configs inline"
+        print(f"{label:>16}: jinja {args.nodes / jinja:8.0f} nodes/s, ", end="")
+        print(f"direct {args.nodes / direct:8.0f} nodes/s ({jinja / direct:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
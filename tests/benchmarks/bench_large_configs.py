@@ -0,0 +1,89 @@
+"""Compare writing and rendering large node configurations whole and in chunks.
+
+Run with: PYTHONPATH=src python -m tests.benchmarks.bench_large_configs
+"""
+
+import os
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser, Namespace
+
+from cml2tf.environment import get_environment
+from cml2tf.main import stream_main_tf
+from cml2tf.topology import CML2Topology
+
+from tests.synthetic import synthetic_topology
+
+
+def measure(run, repeat: int):
+    """
+    Measure the best wall time and the peak traced memory of a function.
+
+    :param run: The function to measure.
+    :param repeat: The number of timed runs.
+    :return: The best time in seconds and the peak memory in bytes.
+    """
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def print_results(title: str, results: dict) -> None:
+    print(f"{title}:")
+    for label, (seconds, peak) in results.items():
+        print(f"  {label:>6}: {seconds * 1000:7.1f} ms, peak {peak / 2**20:6.1f} MiB")
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--config-lines", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    topology = CML2Topology(synthetic_topology(args.nodes, args.config_lines))
+    configs = [node.node_configuration for node in topology.get_lab_nodes()]
+    size = sum(config.size() for config in configs)
+    print(f"{args.nodes} nodes, {size / 2**20:.0f} MiB of configurations")
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = {}
+        for label, large_size in (("whole", size), ("chunks", 0)):
+            results[label] = measure(
+                lambda large_size=large_size: [
+                    config.fileout(directory, large_size) for config in configs
+                ],
+                args.repeat,
+            )
+        print_results("write .cfg files", results)
+
+        results = {}
+        main_tf = os.path.join(directory, "main.tf")
+        for label, emitter, large_size in (
+            ("jinja", "jinja", None),
+            ("whole", "direct", size),
+            ("chunks", "direct", 0),
+        ):
+            flags = Namespace(
+                configs=False, emitter=emitter, large_config_size=large_size
+            )
+
+            def render(flags=flags):
+                with open(main_tf, "w") as file:
+                    file.writelines(stream_main_tf(get_environment(), topology, flags))
+
+            results[label] = measure(render, args.repeat)
+        print_results("render heredocs", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Measure the peak memory per node of every conversion phase.
+
+With --record, the budget of the memory regression test in
+tests/test_memory_budget.py is recorded from the measurements, for the
+running Python version, as allocations differ between versions. With
+--check, the measurements are compared against that budget, and the exit
+status is 1 if a phase is over budget or no budget is recorded. The test
+runs the check in a subprocess, which no tracer like the one of coverage
+follows, so the allocations of a tracer are not measured along.
+
+Run with: PYTHONPATH=src python -m tests.benchmarks.bench_memory
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+from argparse import ArgumentParser, Namespace
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Dict
+
+from cml2tf.main import convert_topology_file
+from cml2tf.metrics import Metrics
+
+from tests.synthetic import write_synthetic_export
+
+BUDGET_FILE = Path(__file__).parents[1] / "testdata" / "memory_budget.json"
+
+# Headroom over the measured peaks, for differences between platforms and runs
+BUDGET_MARGIN = 1.25
+
+
+def python_version() -> str:
+    """
+    Return the Python version budgets are recorded for.
+
+    :return: The major and minor version, like '3.11'.
+    """
+
+    return f"{sys.version_info.major}.{sys.version_info.minor}"
+
+
+def measure_conversion(
+    directory: str, nodes: int, config_lines: int, parser: str, profile: int = 0
+) -> Metrics:
+    """
+    Convert a synthetic lab with its configurations in files and measure it.
+
+    A small lab is converted first, so importing the modules and compiling
+    the templates is not measured.
+
+    :param directory: The directory to write the lab and the project to.
+    :param nodes: The number of nodes of the lab.
+    :param config_lines: The number of configuration lines of every node.
+    :param parser: The YAML parser to read the lab with.
+    :param profile: The number of allocation sites to profile per phase.
+    :return: The metrics of the conversion.
+    """
+
+    flags = Namespace(force=True, configs=True, parser=parser)
+    lab = os.path.join(directory, "lab.yaml")
+    with redirect_stdout(io.StringIO()):
+        write_synthetic_export(lab, 2, config_lines=config_lines)
+        convert_topology_file(lab, os.path.join(directory, "out"), flags)
+        write_synthetic_export(lab, nodes, config_lines=config_lines)
+        metrics = Metrics(profile)
+        convert_topology_file(lab, os.path.join(directory, "out"), flags, metrics)
+    metrics.close()
+    return metrics
+
+
+def bytes_per_node(metrics: Metrics, nodes: int) -> Dict[str, int]:
+    """
+    Divide the peak memory of every phase by the number of nodes.
+
+    :param metrics: The metrics of the conversion.
+    :param nodes: The number of nodes of the lab.
+    :return: The peak bytes per node of every phase.
+    """
+
+    return {
+        name: round(phase["peak_bytes"] / nodes)
+        for name, phase in metrics.phases.items()
+    }
+
+
+def over_budget(measured: Dict[str, int], limits: Dict[str, int]) -> Dict[str, str]:
+    """
+    Find the phases whose peak memory per node is above the budget.
+
+    :param measured: The peak bytes per node of every phase.
+    :param limits: The budget of every phase.
+    :return: A description of every phase over budget, or missing from either.
+    """
+
+    return {
+        name: f"{measured.get(name, '-')} > {limits.get(name, '-')}"
+        for name in measured.keys() | limits.keys()
+        if name not in measured or name not in limits or measured[name] > limits[name]
+    }
+
+
+def main():
+    budget = json.loads(BUDGET_FILE.read_text())
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=budget["nodes"])
+    parser.add_argument("--config-lines", type=int, default=budget["config_lines"])
+    parser.add_argument("--parser", choices=("libyaml", "python"), action="append")
+    parser.add_argument("--profile", type=int, default=0, metavar="N")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--record", action="store_true")
+    mode.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+
+    if args.check and python_version() not in budget["bytes_per_node"]:
+        sys.exit(
+            f"No budget recorded for Python {python_version()}, record one with "
+            + "'python -m tests.benchmarks.bench_memory --record'"
+        )
+    budgets = budget["bytes_per_node"].setdefault(python_version(), {})
+    measured = {}
+    for yaml_parser in args.parser or ("libyaml", "python"):
+        with tempfile.TemporaryDirectory() as directory:
+            metrics = measure_conversion(
+                directory, args.nodes, args.config_lines, yaml_parser, args.profile
+            )
+        measured[yaml_parser] = bytes_per_node(metrics, args.nodes)
+        limits = budgets.get(yaml_parser, {})
+        print(f"{yaml_parser}, {args.nodes} nodes, Python {python_version()}:")
+        print(f"  {'phase':<10} {'bytes/node':>10} {'budget':>10}")
+        for name, value in measured[yaml_parser].items():
+            print(f"  {name:<10} {value:>10} {limits.get(name, '-'):>10}")
+        if args.profile:
+            print(metrics.report())
+
+    if args.check:
+        over = {
+            yaml_parser: over_budget(phases, budgets.get(yaml_parser, {}))
+            for yaml_parser, phases in measured.items()
+        }
+        over = {yaml_parser: phases for yaml_parser, phases in over.items() if phases}
+        if over:
+            sys.exit(
+                f"Peak memory per node above the budget: {over}. Find the "
+                + "allocations with --profile 10, record an intended change "
+                + "with --record."
+            )
+
+    if args.record:
+        budget.update(nodes=args.nodes, config_lines=args.config_lines)
+        for yaml_parser, phases in measured.items():
+            budgets[yaml_parser] = {
+                name: round(value * BUDGET_MARGIN) for name, value in phases.items()
+            }
+        BUDGET_FILE.write_text(json.dumps(budget, indent=2) + "\n")
+        print(f"Budget recorded in {BUDGET_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Compare the memory of slotted node and link records with dictionaries.
+
+Run with: PYTHONPATH=src python -m tests.benchmarks.bench_records
+"""
+
+import gc
+import tracemalloc
+from argparse import ArgumentParser
+
+from cml2tf.topology import CML2Topology
+
+from tests.synthetic import synthetic_topology
+
+
+def traced(build) -> int:
+    """
+    Measure the memory held by the result of a function.
+
+    :param build: The function building the objects to measure.
+    :return: The number of bytes allocated and still held after the call.
+    """
+
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=50000)
+    args = parser.parse_args()
+
+    topology = CML2Topology(synthetic_topology(args.nodes))
+    records = topology.nodes + topology.links
+
+    # the field values are shared, only the containers are measured
+    as_records = traced(lambda: [type(r)(*(r[k] for k in r.keys())) for r in records])
+    as_dicts = traced(lambda: [r.as_dict() for r in records])
+    print(f"{args.nodes} nodes, {len(topology.links)} links")
+    print(f" records: {as_records / 2**20:6.1f} MiB")
+    print(f"   dicts: {as_dicts / 2**20:6.1f} MiB ({as_dicts / as_records:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
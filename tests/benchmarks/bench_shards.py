@@ -0,0 +1,53 @@
+"""Compare rendering into a single main.tf with rendering into shards.
+
+Times a full conversion and a re-conversion after one node changed, where
+only the shard holding that node is rendered and written again.
+Run with: PYTHONPATH=src python -m tests.benchmarks.bench_shards
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+import time
+from argparse import ArgumentParser, Namespace
+
+from cml2tf.main import cml_to_terraform_convert
+
+from tests.synthetic import synthetic_topology
+
+
+def convert(topology: dict, outdir: str, flags: Namespace) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        cml_to_terraform_convert(topology, outdir, flags)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=20000)
+    parser.add_argument("--config-lines", type=int, default=20)
+    parser.add_argument("--shard-size", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{args.nodes} nodes, {args.config_lines} configuration lines per node")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for shard in (None, "count"):
+            topology = synthetic_topology(args.nodes, args.config_lines)
+            flags = Namespace(
+                force=True, configs=False, shard=shard, shard_size=args.shard_size
+            )
+            outdir = os.path.join(tmpdir, shard or "single")
+            full = convert(topology, outdir, flags)
+            topology["nodes"][args.nodes // 2]["x"] += 1
+            incremental = convert(topology, outdir, flags)
+            files = len([name for name in os.listdir(outdir) if name.endswith(".tf")])
+            print(
+                f"{shard or 'single':>7}: full {full:.2f}s, "
+                + f"one node changed {incremental:.2f}s ({files} .tf files)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Time and memory-profile every conversion stage at several lab sizes.
+
+The stages are reading the YAML export (read_cml2_topology), building the
+model (CML2Topology), rendering main.tf and writing the output files. Every
+stage is run once for its wall time and once more under tracemalloc for its
+peak memory, so the profiling does not distort the timings.
+
+Results are written as JSON with --output. With --baseline, they are
+compared against an earlier result file and the benchmark fails when a
+stage got slower or needs more memory than the baseline plus --tolerance.
+Run with: PYTHONPATH=src python -m tests.benchmarks.bench_stages
+"""
+
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser, Namespace
+from typing import Callable, Dict
+
+from cml2tf.environment import get_environment
+from cml2tf.main import read_cml2_topology, save_file_to_disk, stream_main_tf
+from cml2tf.topology import CML2Topology
+
+from tests.synthetic import write_synthetic_export
+
+STAGES = ("read", "model", "render", "write")
+
+
+def measure(stage: Callable[[], object]) -> Dict[str, float]:
+    """
+    Run a stage twice, measuring its wall time and its peak memory.
+
+    :param stage: The function running the stage.
+    :return: The wall time in seconds and the peak memory in bytes.
+    """
+
+    gc.collect()
+    start = time.perf_counter()
+    stage()
+    seconds = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    stage()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": seconds, "peak_bytes": peak}
+
+
+def run_size(node_count: int, args: Namespace, tmpdir: str) -> Dict[str, dict]:
+    """
+    Benchmark all stages for a lab of the given size.
+
+    :param node_count: The number of nodes of the lab.
+    :param args: The command line arguments of the benchmark.
+    :param tmpdir: A directory for the export and the output files.
+    :return: The measurements of every stage.
+    """
+
+    export = os.path.join(tmpdir, f"lab-{node_count}.yaml")
+    write_synthetic_export(
+        export,
+        node_count,
+        config_lines=args.config_lines,
+        links_per_node=args.links_per_node,
+        multi_config=args.multi_config,
+    )
+    outdir = os.path.join(tmpdir, f"lab-{node_count}")
+    os.makedirs(outdir)
+    flags = Namespace(configs=True)
+    environment = get_environment()
+
+    results = {"read": measure(lambda: read_cml2_topology(export))}
+    cml2_topology = read_cml2_topology(export)
+    results["model"] = measure(lambda: CML2Topology(cml2_topology))
+    topology = CML2Topology(cml2_topology)
+    results["render"] = measure(
+        lambda: sum(1 for _ in stream_main_tf(environment, topology, flags))
+    )
+    chunks = list(stream_main_tf(environment, topology, flags))
+
+    def write():
+        with contextlib.redirect_stdout(io.StringIO()):
+            save_file_to_disk(os.path.join(outdir, "main.tf"), chunks)
+        for node in topology.get_lab_nodes():
+            if not node.node_configuration.empty():
+                node.node_configuration.fileout(outdir)
+
+    results["write"] = measure(write)
+    results["export_bytes"] = os.path.getsize(export)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    """
+    Compare results against a baseline and print every regression.
+
+    :param results: The results of this run.
+    :param baseline: The results of the baseline run.
+    :param tolerance: The allowed relative increase, like 0.25 for 25%.
+    :return: True if no stage regressed.
+    """
+
+    ok = True
+    for size, stages in results["sizes"].items():
+        for stage in STAGES:
+            before = baseline["sizes"].get(size, {}).get(stage)
+            if before is None:
+                continue
+            for metric in ("seconds", "peak_bytes"):
+                limit = before[metric] * (1 + tolerance)
+                if stages[stage][metric] > limit:
+                    print(
+                        f"REGRESSION {size} nodes {stage} {metric}: "
+                        + f"{stages[stage][metric]:.4g} > {before[metric]:.4g}"
+                    )
+                    ok = False
+    return ok
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10, 1000, 10000, 100000]
+    )
+    parser.add_argument("--config-lines", type=int, default=20)
+    parser.add_argument("--links-per-node", type=int, default=1)
+    parser.add_argument("--multi-config", type=float, default=0.1)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            "config_lines": args.config_lines,
+            "links_per_node": args.links_per_node,
+            "multi_config": args.multi_config,
+        },
+        "sizes": {},
+    }
+    print(f"{'nodes':>7} {'stage':>6} {'seconds':>9} {'peak MiB':>9}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for size in args.sizes:
+            stages = run_size(size, args, tmpdir)
+            results["sizes"][str(size)] = stages
+            for stage in STAGES:
+                print(
+                    f"{size:>7} {stage:>6} {stages[stage]['seconds']:>9.3f} "
+                    + f"{stages[stage]['peak_bytes'] / 2**20:>9.1f}"
+                )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=1)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get("parameters") != results["parameters"]:
+            print("Baseline was recorded with different parameters")
+            sys.exit(2)
+        if not compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
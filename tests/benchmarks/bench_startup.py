@@ -0,0 +1,86 @@
+"""Track the startup cost of cml2tf for --help and a minimal conversion.
+
+Every measurement runs in a fresh interpreter with -X importtime, which
+reports the cumulative import time of cml2tf.main and of the heaviest
+modules. With --budget-ms the benchmark fails when the best wall time of
+a scenario goes above the budget.
+Run with: PYTHONPATH=src python -m tests.benchmarks.bench_startup
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+TESTDATA = Path(__file__).parent.parent / "testdata"
+
+RUN_CML2TF = "import sys; from cml2tf.main import main; main()"
+
+
+def run(argv: List[str]) -> Tuple[float, Dict[str, int]]:
+    """
+    Run cml2tf in a fresh interpreter.
+
+    :param argv: The command line arguments of cml2tf.
+    :return: The wall time and the cumulative import time of every top-level
+        import in microseconds.
+    """
+
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", RUN_CML2TF, *argv],
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+
+    imports = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # only count top-level imports, nested ones are part of their parent
+        if name.startswith(" ") and not name.startswith("  "):
+            imports[name.strip()] = int(cumulative)
+    return wall, imports
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmpdir:
+        scenarios = {
+            "--help": ["--help"],
+            "convert": [
+                "-f",
+                "-i",
+                str(TESTDATA / "mini.yaml"),
+                "-o",
+                os.path.join(tmpdir, "mini"),
+            ],
+        }
+        for scenario, argv in scenarios.items():
+            runs = [run(argv) for _ in range(args.repeat)]
+            wall, imports = min(runs, key=lambda result: result[0])
+            print(f"{scenario}: {wall * 1000:.1f}ms wall")
+            heaviest = sorted(imports.items(), key=lambda item: -item[1])
+            for name, cumulative in heaviest[: args.top]:
+                print(f"  {cumulative / 1000:8.1f}ms  {name}")
+            if args.budget_ms is not None and wall * 1000 > args.budget_ms:
+                print(f"  over budget of {args.budget_ms:.1f}ms")
+                failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Compare template compilation without and with the on-disk bytecode cache.
+
+Every measurement runs in a fresh interpreter, like a new cml2tf process.
+Run with: PYTHONPATH=src python -m tests.benchmarks.bench_templates
+"""
+
+import subprocess
+import sys
+import tempfile
+from argparse import ArgumentParser
+
+LOAD_TEMPLATES = """
+import sys, time
+from cml2tf.environment import get_environment
+start = time.perf_counter()
+environment = get_environment(sys.argv[1] or None)
+environment.get_template("main.tf.j2")
+environment.get_template("variables.tf.j2")
+print(time.perf_counter() - start)
+"""
+
+
+def load_templates(cache_dir: str) -> float:
+    output = subprocess.check_output(
+        [sys.executable, "-c", LOAD_TEMPLATES, cache_dir], text=True
+    )
+    return float(output)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        no_cache = min(load_templates("") for _ in range(args.repeat))
+        cold = load_templates(cache_dir)
+        warm = min(load_templates(cache_dir) for _ in range(args.repeat))
+
+    print(f"no cache: {no_cache * 1000:.1f}ms")
+    print(f"    cold: {cold * 1000:.1f}ms")
+    print(f"    warm: {warm * 1000:.1f}ms ({no_cache / warm:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Compare the libyaml and pure-Python YAML parsers on a large export.
+
+Run with: PYTHONPATH=src python -m tests.benchmarks.bench_yaml
+"""
+
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import yaml
+from cml2tf.main import read_cml2_topology
+
+from tests.synthetic import write_synthetic_export
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=500)
+    parser.add_argument("--config-lines", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        export = os.path.join(tmpdir, "lab.yaml")
+        write_synthetic_export(export, args.nodes, config_lines=args.config_lines)
+        size = os.path.getsize(export)
+        print(f"export: {args.nodes} nodes, {size / 2**20:.1f} MiB")
+
+        parsers = ["python"]
+        if yaml.__with_libyaml__:
+            parsers.append("libyaml")
+        results = {}
+        for parser_name in parsers:
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                read_cml2_topology(export, parser_name)
+                best = min(best, time.perf_counter() - start)
+            results[parser_name] = best
+            print(f"{parser_name:>8}: {best:.3f}s ({size / 2**20 / best:.1f} MiB/s)")
+
+    if "libyaml" in results:
+        print(f" speedup: {results['python'] / results['libyaml']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
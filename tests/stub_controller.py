@@ -0,0 +1,91 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import unquote, urlsplit
+
+TOKEN = "stub-token"
+
+
+class StubController(ThreadingHTTPServer):
+    """A local stand-in for the REST API of a CML2 controller.
+
+    It serves the given labs, keeps track of the requests and client
+    connections, and can be told to fail requests to a path a number of times.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, labs: Dict[str, dict]) -> None:
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.labs = labs
+        self.requests: List[str] = []
+        self.connections = set()
+        self.failures: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status: int, data=None) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        credentials = json.loads(self.rfile.read(length))
+        self.server.requests.append(self.path)
+        if credentials != {"username": "cml2", "password": "cml2cml2"}:
+            return self.reply(403, {"description": "bad credentials"})
+        self.reply(200, TOKEN)
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        with server.lock:
+            server.requests.append(self.path)
+            server.connections.add(self.client_address)
+            if server.failures.get(url.path, 0) > 0:
+                server.failures[url.path] -= 1
+                return self.reply(503, {"description": "try again"})
+        if self.headers.get("Authorization") != f"Bearer {TOKEN}":
+            return self.reply(401, {"description": "unauthorized"})
+
+        parts = [unquote(part) for part in url.path.split("/")[3:]]
+        if parts == ["labs"]:
+            return self.reply(200, list(server.labs))
+        if len(parts) < 2 or parts[1] not in server.labs:
+            return self.reply(404, {"description": "not found"})
+        lab = server.labs[parts[1]]
+        if parts[2:] == ["topology"]:
+            topology = json.loads(json.dumps(lab))
+            if "exclude_configurations=true" in url.query:
+                for node in topology["nodes"]:
+                    node.pop("configuration", None)
+            return self.reply(200, topology)
+        if len(parts) == 5 and parts[2] == "nodes" and parts[4] == "config":
+            for node in lab["nodes"]:
+                if node["id"] == parts[3]:
+                    return self.reply(200, node.get("configuration", ""))
+        self.reply(404, {"description": "not found"})
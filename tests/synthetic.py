@@ -0,0 +1,159 @@
+"""Generate synthetic CML2 lab exports of configurable size.
+
+Run with: PYTHONPATH=src python -m tests.synthetic --nodes 1000 -o lab.yaml
+"""
+
+import random
+from argparse import ArgumentParser
+
+
+def synthetic_config(label: str, config_lines: int) -> str:
+    """
+    Build a device configuration of the given number of lines.
+
+    :param label: The label of the node the configuration belongs to.
+    :param config_lines: The number of lines in the configuration.
+    :return: The configuration text.
+    """
+
+    lines = [f"hostname {label}"]
+    lines.extend(
+        f"interface Loopback{index}\n ip address 10.{index // 256 % 256}.{index % 256}.1 255.255.255.255"
+        for index in range((config_lines - 1) // 2)
+    )
+    return "\n".join(lines)
+
+
+def synthetic_topology(
+    node_count: int,
+    config_lines: int = 1,
+    links_per_node: int = 1,
+    multi_config: float = 0.0,
+    seed: int = 0,
+) -> dict:
+    """
+    Build a synthetic CML2 topology with the given number of nodes.
+
+    The nodes are chained together, each one linked to its predecessor. Every
+    further link of a node goes to a randomly chosen earlier node. Interfaces
+    are created as links need them.
+
+    :param node_count: The number of nodes in the generated topology.
+    :param config_lines: The number of configuration lines of every node.
+    :param links_per_node: The number of links from every node to earlier nodes.
+    :param multi_config: The share of nodes with several configurations, like
+        exported by CML 2.7 and later.
+    :param seed: The seed of the random generator, for reproducible topologies.
+    :return: A dictionary shaped like a parsed CML2 topology export.
+    """
+
+    rng = random.Random(seed)
+    nodes = []
+    for index in range(node_count):
+        label = f"node-{index}"
+        config = synthetic_config(label, config_lines)
+        if rng.random() < multi_config:
+            configuration = [
+                {"name": "ios_config.txt", "content": config},
+                {"name": "day0.txt", "content": f"hostname {label}"},
+            ]
+        else:
+            configuration = config
+        nodes.append(
+            {
+                "label": label,
+                "id": f"n{index}",
+                "node_definition": "iosv",
+                "x": index % 100 * 100,
+                "y": index // 100 * 100,
+                "interfaces": [],
+                "boot_disk_size": None,
+                "image_definition": None,
+                "ram": None,
+                "cpus": None,
+                "cpu_limit": None,
+                "data_volume": None,
+                "configuration": configuration,
+                "tags": [f"row-{index // 100}"] if index % 2 else [],
+            }
+        )
+
+    def new_interface(node: dict) -> str:
+        slot = len(node["interfaces"])
+        interface = {"id": f"i{slot}", "label": f"Gi0/{slot}", "slot": slot}
+        node["interfaces"].append(interface)
+        return interface["id"]
+
+    links = []
+    for index in range(1, node_count):
+        peers = [index - 1]
+        peers += [rng.randrange(index) for _ in range(links_per_node - 1)]
+        for peer in peers:
+            links.append(
+                {
+                    "id": f"l{len(links)}",
+                    "n1": nodes[peer]["id"],
+                    "n2": nodes[index]["id"],
+                    "i1": new_interface(nodes[peer]),
+                    "i2": new_interface(nodes[index]),
+                }
+            )
+    return {
+        "lab": {"title": "synthetic", "description": "", "notes": ""},
+        "nodes": nodes,
+        "links": links,
+    }
+
+
+def write_synthetic_export(filename: str, node_count: int, **kwargs) -> None:
+    """
+    Write a synthetic topology as a YAML export file.
+
+    :param filename: The name of the file to write.
+    :param node_count: The number of nodes in the generated topology.
+    :param kwargs: Further arguments of synthetic_topology().
+    :return: None
+    """
+
+    import yaml
+
+    class Dumper(getattr(yaml, "CSafeDumper", yaml.SafeDumper)):
+        pass
+
+    def represent_str(dumper, data: str):
+        # multi-line configurations are exported as literal block scalars
+        style = "|" if "\n" in data else None
+        return dumper.represent_scalar("tag:yaml.org,2002:str", data, style=style)
+
+    Dumper.add_representer(str, represent_str)
+    with open(filename, "w") as file:
+        yaml.dump(
+            synthetic_topology(node_count, **kwargs),
+            file,
+            Dumper=Dumper,
+            sort_keys=False,
+        )
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=100)
+    parser.add_argument("--config-lines", type=int, default=1)
+    parser.add_argument("--links-per-node", type=int, default=1)
+    parser.add_argument("--multi-config", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", required=True)
+    args = parser.parse_args()
+
+    write_synthetic_export(
+        args.output,
+        args.nodes,
+        config_lines=args.config_lines,
+        links_per_node=args.links_per_node,
+        multi_config=args.multi_config,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
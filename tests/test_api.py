@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+import cml2tf.main
+import pytest
+import yaml
+from cml2tf.api import ConversionError, ConvertOptions, convert, convert_to_directory
+from cml2tf.manifest import MANIFEST_FILE
+
+from tests.synthetic import synthetic_topology
+
+
+@pytest.mark.parametrize(
+    "flags,options",
+    [
+        ([], ConvertOptions()),
+        (["-c"], ConvertOptions(configs=True)),
+        (["-c", "--shard", "tag"], ConvertOptions(configs=True, shard="tag")),
+    ],
+)
+def test_convert_matches_cli(request, tmp_path, capsys, flags, options):
+    topology_file = Path(request.path).parent / "testdata" / "topology.yaml"
+    outdir = tmp_path / "out"
+
+    with patch(
+        "sys.argv", ["prog", *flags, "-i", str(topology_file), "-o", str(outdir)]
+    ):
+        cml2tf.main.main()
+    capsys.readouterr()
+
+    files = convert(topology_file, options)
+    assert capsys.readouterr().out == ""
+    assert files == {
+        path.name: path.read_text()
+        for path in outdir.iterdir()
+        if path.name != MANIFEST_FILE
+    }
+
+
+def test_convert_dict(request):
+    topology_file = Path(request.path).parent / "testdata" / "mini.yaml"
+    topology = yaml.safe_load(topology_file.read_text())
+    assert convert(topology) == convert(str(topology_file))
+
+
+def test_convert_errors(tmp_path):
+    with pytest.raises(ConversionError, match="Unable to read"):
+        convert(tmp_path / "missing.yaml")
+    (tmp_path / "bad.yaml").write_text("lab: [")
+    with pytest.raises(ConversionError, match="Invalid topology"):
+        convert(tmp_path / "bad.yaml")
+    with pytest.raises(ConversionError, match="no lab information"):
+        convert({"nodes": []})
+    with pytest.raises(ValueError):
+        convert(synthetic_topology(1), ConvertOptions(shard="rack"))
+    with pytest.raises(ValueError):
+        convert(synthetic_topology(1), ConvertOptions(parser="fast"))
+
+
+def test_convert_is_reentrant():
+    topologies = [
+        synthetic_topology(20, config_lines=5, seed=seed) for seed in range(8)
+    ]
+    options = ConvertOptions(configs=True, shard="count", shard_size=7)
+    expected = [convert(topology, options) for topology in topologies]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda t: convert(t, options), topologies * 4))
+    assert results == expected * 4
+
+
+def test_convert_to_directory(tmp_path):
+    outdir = tmp_path / "out"
+    options = ConvertOptions(configs=True, shard="count", shard_size=1)
+
+    written = convert_to_directory(synthetic_topology(3), outdir, options)
+    assert "nodes_002.tf" in written
+    assert (outdir / MANIFEST_FILE).exists()
+    with pytest.raises(ConversionError, match="already exists"):
+        convert_to_directory(synthetic_topology(3), outdir, options)
+
+    (outdir / "variables.tf").write_text("# edited\n")
+    (outdir / "terraform.tfstate").write_text("{}")
+    written = convert_to_directory(synthetic_topology(2), outdir, options, force=True)
+    assert "variables.tf" not in written
+    assert (outdir / "variables.tf").read_text() == "# edited\n"
+    assert (outdir / "terraform.tfstate").exists()
+    assert not (outdir / "nodes_002.tf").exists()
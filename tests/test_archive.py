@@ -0,0 +1,152 @@
+import gzip
+import io
+import os
+import tarfile
+from pathlib import Path
+from unittest.mock import patch
+
+import cml2tf.main
+import pytest
+import yaml
+from cml2tf.archive import is_gzip_path, save_archive, write_archive
+
+from tests.synthetic import synthetic_topology
+
+FILES = {"variables.tf": "variable {}\n", "main.tf": "resource é\n", "r1.cfg": ""}
+
+
+def read_archive(data: bytes) -> dict:
+    with tarfile.open(fileobj=io.BytesIO(data)) as archive:
+        return {
+            member.name: archive.extractfile(member).read().decode()
+            for member in archive.getmembers()
+        }
+
+
+def test_is_gzip_path():
+    assert is_gzip_path("lab.tar.gz") and is_gzip_path("LAB.TGZ")
+    assert not is_gzip_path("lab.tar") and not is_gzip_path("lab.gz.tar")
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_write_archive(compress):
+    buffers = [io.BytesIO(), io.BytesIO()]
+    for buffer in buffers:
+        write_archive(FILES, buffer, compress)
+    data = buffers[0].getvalue()
+    assert (data[:2] == b"\x1f\x8b") == compress
+    assert read_archive(data) == FILES
+    assert data == buffers[1].getvalue()
+
+
+def test_write_archive_gzip_header_is_fixed(monkeypatch):
+    buffers = []
+    for now in (1700000000, 1700000001):
+        monkeypatch.setattr("time.time", lambda now=now: now)
+        buffers.append(io.BytesIO())
+        buffers[-1].name = "lab.tgz"
+        write_archive(FILES, buffers[-1], compress=True)
+    data = buffers[0].getvalue()
+    assert data == buffers[1].getvalue()
+    # no modification time (bytes 4 to 8) and no file name flag (0x08)
+    assert data[4:8] == b"\0\0\0\0" and not data[3] & 0x08
+
+
+def test_save_archive_is_atomic(tmp_path, monkeypatch):
+    path = tmp_path / "lab.tar"
+    path.write_bytes(b"old")
+
+    def fail(files, fileobj, compress=False):
+        fileobj.write(b"partial")
+        raise OSError("disk full")
+
+    monkeypatch.setattr("cml2tf.archive.write_archive", fail)
+    with pytest.raises(OSError, match="disk full"):
+        save_archive(FILES, str(path))
+    assert os.listdir(tmp_path) == ["lab.tar"]
+    assert path.read_bytes() == b"old"
+
+    monkeypatch.undo()
+    save_archive(FILES, str(path))
+    assert read_archive(path.read_bytes()) == FILES
+    assert os.listdir(tmp_path) == ["lab.tar"]
+
+
+@pytest.mark.parametrize("archive", ["lab.tar", "lab.tgz", "-"])
+def test_main_archive(request, tmp_path, capsysbinary, archive):
+    topology_file = Path(request.path).parent / "testdata" / "topology.yaml"
+    outdir = tmp_path / "out"
+    with patch("sys.argv", ["prog", "-c", "-i", str(topology_file), "-o", str(outdir)]):
+        cml2tf.main.main()
+    capsysbinary.readouterr()
+
+    os.chdir(tmp_path)
+    with patch(
+        "sys.argv", ["prog", "-c", "-i", str(topology_file), "--archive", archive]
+    ):
+        cml2tf.main.main()
+    output = capsysbinary.readouterr()
+    if archive == "-":
+        data, messages = output.out, output.err
+    else:
+        data, messages = (tmp_path / archive).read_bytes(), output.out
+        assert (data[:2] == b"\x1f\x8b") == archive.endswith(".tgz")
+        assert sorted(os.listdir(tmp_path)) == [archive, "out"]
+    assert messages.decode().splitlines()[-2:] == [
+        f"8 files saved to archive {'stdout' if archive == '-' else repr(archive)}.",
+        "Converted",
+    ]
+
+    files = read_archive(data)
+    assert files == {
+        path.name: path.read_text()
+        for path in outdir.iterdir()
+        if path.name != ".cml2tf-manifest.json"
+    }
+
+
+def test_main_archive_gzip_stdout(request, capsysbinary):
+    topology_file = Path(request.path).parent / "testdata" / "mini.yaml"
+    with patch("sys.argv", ["prog", "-z", "-i", str(topology_file), "--archive", "-"]):
+        cml2tf.main.main()
+    data = gzip.decompress(capsysbinary.readouterr().out)
+    assert set(read_archive(data)) == {"variables.tf", "main.tf"}
+
+
+def test_main_archive_errors(request, tmp_path, capsys):
+    testdata = Path(request.path).parent / "testdata"
+    archive = tmp_path / "lab.tar"
+    archive.write_bytes(b"old")
+
+    argv = ["prog", "-i", str(testdata / "mini.yaml"), "--archive", str(archive)]
+    with patch("sys.argv", argv), pytest.raises(SystemExit, match="1"):
+        cml2tf.main.main()
+    assert capsys.readouterr().out.splitlines() == [
+        f"Error: Archive '{archive}' already exists. Please remove it first"
+    ]
+    with patch("sys.argv", argv + ["-f"]):
+        cml2tf.main.main()
+    assert "main.tf" in read_archive(archive.read_bytes())
+    capsys.readouterr()
+
+    topology = synthetic_topology(5)
+    topology["links"][2]["n1"] = "n9"
+    lab = tmp_path / "invalid.yaml"
+    lab.write_text(yaml.safe_dump(topology))
+    argv = ["prog", "-f", "-i", str(lab), "--archive", str(archive)]
+    with patch("sys.argv", argv), pytest.raises(SystemExit, match="1"):
+        cml2tf.main.main()
+    assert capsys.readouterr().out.splitlines() == [
+        "Error: Link 'l2' references missing node 'n9'",
+        "Error: The topology has 1 error, nothing was converted.",
+    ]
+    assert "main.tf" in read_archive(archive.read_bytes())
+
+    for argv in (
+        ["-i", str(testdata), "--archive", "-"],
+        ["-i", str(lab), "--archive", "-", "-o", str(tmp_path)],
+        ["-i", str(lab), "-z"],
+        ["-i", str(lab), "--archive", "-", "--stream"],
+    ):
+        with patch("sys.argv", ["prog"] + argv), pytest.raises(SystemExit, match="2"):
+            cml2tf.main.main()
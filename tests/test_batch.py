@@ -0,0 +1,71 @@
+import shutil
+from pathlib import Path
+from unittest.mock import patch
+
+import cml2tf.main
+import pytest
+from cml2tf.batch import expand_inputs
+
+
+@pytest.fixture
+def labs(request, tmp_path):
+    testdata = Path(request.path).parent / "testdata"
+    labs = tmp_path / "labs"
+    labs.mkdir()
+    shutil.copy(testdata / "mini.yaml", labs / "mini.yaml")
+    shutil.copy(testdata / "topology.yaml", labs / "topology.yml")
+    # dangling link reference
+    broken = (testdata / "mini.yaml").read_text().replace("n1: n1", "n1: n9")
+    (labs / "broken.yaml").write_text(broken)
+    (labs / "notes.txt").write_text("not a topology")
+    return labs
+
+
+def test_expand_inputs(labs):
+    expected = [str(labs / name) for name in ("broken.yaml", "mini.yaml")]
+    assert expand_inputs([str(labs)]) == expected + [str(labs / "topology.yml")]
+    assert expand_inputs([str(labs / "*.yaml")]) == expected
+    assert expand_inputs(["a.yaml", "b.yaml"]) == ["a.yaml", "b.yaml"]
+    assert expand_inputs([str(labs / "*.json")]) == []
+
+
+def test_batch_convert(labs, tmp_path, capsys):
+    outdir = tmp_path / "out"
+    with patch(
+        "sys.argv",
+        [
+            "prog",
+            "-j",
+            "2",
+            "-i",
+            str(labs),
+            str(labs / "missing.yaml"),
+            "-o",
+            str(outdir),
+        ],
+    ):
+        with pytest.raises(SystemExit, match="1"):
+            cml2tf.main.main()
+
+    assert sorted(path.name for path in outdir.iterdir()) == ["mini", "topology"]
+    assert (outdir / "mini" / "main.tf").exists()
+    assert (outdir / "topology" / "main.tf").exists()
+
+    summary = capsys.readouterr().out
+    assert f"OK      {labs / 'mini.yaml'}" in summary
+    assert (
+        f"FAILED  {labs / 'broken.yaml'}: Error: The topology has 1 error," in summary
+    )
+    assert f"FAILED  {labs / 'missing.yaml'}: Error reading topology file" in summary
+    assert "Converted 2 of 4 labs" in summary
+
+
+def test_batch_convert_same_outdir(labs, tmp_path):
+    (labs / "sub").mkdir()
+    shutil.copy(labs / "mini.yaml", labs / "sub" / "mini.yaml")
+    with patch(
+        "sys.argv",
+        ["prog", "-i", str(labs / "mini.yaml"), str(labs / "sub"), "-o", str(tmp_path)],
+    ):
+        with pytest.raises(SystemExit, match="2"):
+            cml2tf.main.main()
@@ -1,6 +1,8 @@
 import pytest
 from cml2tf.topology import CML2Topology
 
+from tests.synthetic import synthetic_topology
+
 
 # Define a fixture for common setup
 @pytest.fixture
@@ -97,17 +99,72 @@ def test_get_node_name_by_id(topology_data):
     cml2_topology = CML2Topology(topology_data)
     assert cml2_topology.get_node_name_by_id("n1") == "Node 1"
 
-    cml2_topology.nodes = []
     with pytest.raises(ValueError):
-        cml2_topology.get_node_name_by_id("n1")
+        cml2_topology.get_node_name_by_id("n3")
 
 
 def test_get_node_interface_slot_by_id(topology_data):
     cml2_topology = CML2Topology(topology_data)
     assert cml2_topology.get_node_interface_slot_by_id("n1", "i1") == "0"
 
-    node = cml2_topology.nodes[0]
-    assert node["node_id"] == "n1"
-    node["node_interfaces"] = []
     with pytest.raises(ValueError):
-        cml2_topology.get_node_interface_slot_by_id("n1", "i1")
+        cml2_topology.get_node_interface_slot_by_id("n1", "i2")
+
+    with pytest.raises(ValueError):
+        cml2_topology.get_node_interface_slot_by_id("n3", "i1")
+
+
+def test_read_lab_links_dangling_reference(topology_data):
+    topology_data["links"][0]["n2"] = "n3"
+    with pytest.raises(ValueError):
+        CML2Topology(topology_data)
+
+
+def test_read_lab_links_looks_up_nodes_by_id(monkeypatch):
+    topology_data = synthetic_topology(1000)
+    scans = []
+
+    class ScannedList(list):
+        def __iter__(self):
+            scans.append(len(self))
+            return super().__iter__()
+
+    index_lab_nodes = CML2Topology._index_lab_nodes
+
+    def index_then_count_scans(self):
+        index_lab_nodes(self)
+        self.nodes = ScannedList(self.nodes)
+
+    monkeypatch.setattr(CML2Topology, "_index_lab_nodes", index_then_count_scans)
+    lookups = []
+
+    def counted(lookup):
+        def counted_lookup(self, *args):
+            lookups.append(lookup.__name__)
+            return lookup(self, *args)
+
+        return counted_lookup
+
+    for name in ("get_node_name_by_id", "get_node_interface_slot_by_id"):
+        monkeypatch.setattr(CML2Topology, name, counted(getattr(CML2Topology, name)))
+    CML2Topology(topology_data)
+
+    # one lookup per link endpoint, none of them scans the nodes
+    links = len(topology_data["links"])
+    assert lookups.count("get_node_name_by_id") == 2 * links
+    assert lookups.count("get_node_interface_slot_by_id") == 2 * links
+    assert scans == []
+
+
+def test_records_dict_form(topology_data):
+    cml2_topology = CML2Topology(topology_data)
+    node = cml2_topology.nodes[0].as_dict()
+    assert node["node_name"] == "Node 1"
+    assert node["node_interfaces"] == [{"id": "i1", "slot": "0"}]
+    assert cml2_topology.links[0].as_dict() == {
+        "link_name": "l1",
+        "node_a": "Node 1",
+        "node_b": "Node 2",
+        "slot_a": "0",
+        "slot_b": "0",
+    }
@@ -0,0 +1,25 @@
+from cml2tf.configstore import ConfigStore
+from cml2tf.topology.nodeconfig import NodeConfig
+
+
+def test_config_store_dedup():
+    store = ConfigStore()
+    first = NodeConfig("r1", "hostname router")
+    clone = NodeConfig("r2", "hostname router")
+    other = NodeConfig("r3", "hostname other")
+
+    assert store.add(first)
+    assert not store.add(clone)
+    assert store.add(other)
+    assert clone.filename() == "r1.cfg"
+    assert sorted(store.files) == ["r1.cfg", "r3.cfg"]
+    assert store.ratio() == 1.5
+    assert store.summary() == (
+        "3 configurations stored in 2 files (dedup ratio 1.5x, 15 bytes saved)."
+    )
+
+
+def test_config_store_empty():
+    store = ConfigStore()
+    assert store.ratio() == 1.0
+    assert store.files == {}
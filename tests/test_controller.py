@@ -0,0 +1,106 @@
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import cml2tf.main
+import pytest
+from cml2tf.controller import CMLController, ControllerError
+from cml2tf.main import read_cml2_topology
+from cml2tf.topology import CML2Topology
+
+from tests.stub_controller import StubController
+from tests.synthetic import synthetic_topology
+
+
+@pytest.fixture
+def labs(request):
+    testdata = Path(request.path).parent / "testdata"
+    return {
+        "mini": read_cml2_topology(testdata / "mini.yaml"),
+        "synthetic": synthetic_topology(40, config_lines=5),
+    }
+
+
+@pytest.fixture
+def stub(labs):
+    with StubController(labs) as stub:
+        yield stub
+
+
+def controller(stub, **kwargs):
+    return CMLController(stub.url, "cml2", "cml2cml2", backoff=0, **kwargs)
+
+
+def test_lab_ids(stub):
+    with controller(stub) as cml:
+        assert cml.lab_ids() == ["mini", "synthetic"]
+
+
+def test_lab_topology(stub, labs):
+    with controller(stub) as cml:
+        topology = cml.lab_topology("mini")
+    assert topology == labs["mini"]
+    assert CML2Topology(topology).get_lab_info_title() == "mini"
+
+
+def test_lab_topology_pools_connections(stub, labs):
+    with controller(stub, workers=4) as cml:
+        topology = cml.lab_topology("synthetic")
+    assert topology == labs["synthetic"]
+    # authenticate, topology and one request per node configuration
+    assert len(stub.requests) == 2 + 40
+    assert len(stub.connections) <= 4
+
+
+def test_retry_with_backoff(stub, labs):
+    stub.failures["/api/v0/labs/mini/nodes/n2/config"] = 2
+    with controller(stub, retries=2) as cml:
+        assert cml.lab_topology("mini") == labs["mini"]
+
+    stub.failures["/api/v0/labs/mini/nodes/n2/config"] = 3
+    with controller(stub, retries=2) as cml:
+        with pytest.raises(ControllerError, match="HTTP 503"):
+            cml.lab_topology("mini")
+
+
+def test_errors(stub):
+    with CMLController(stub.url, "cml2", "wrong", backoff=0) as cml:
+        with pytest.raises(ControllerError, match="HTTP 403"):
+            cml.lab_ids()
+    with controller(stub) as cml:
+        with pytest.raises(ControllerError, match="HTTP 404"):
+            cml.lab_topology("missing")
+    with pytest.raises(ControllerError, match="Invalid controller URL"):
+        CMLController("ftp://controller", "cml2", "cml2cml2")
+
+
+def test_connection_refused():
+    with CMLController(
+        "http://127.0.0.1:1", "cml2", "cml2cml2", retries=1, backoff=0
+    ) as cml:
+        with pytest.raises(ControllerError, match="ConnectionRefusedError"):
+            cml.lab_ids()
+
+
+def test_main_controller(stub, tmp_path):
+    argv = ["prog", "--controller", stub.url, "--lab", "all", "-o", str(tmp_path)]
+    credentials = {"CML2_USERNAME": "cml2", "CML2_PASSWORD": "cml2cml2"}
+    with patch("sys.argv", argv), patch.dict(os.environ, credentials):
+        cml2tf.main.main()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["mini", "synthetic"]
+    assert (tmp_path / "mini" / "main.tf").exists()
+
+
+@pytest.mark.parametrize(
+    "args,code",
+    [
+        (["--lab", "missing", "--username", "cml2", "--password", "cml2cml2"], "1"),
+        (["--lab", "mini", "--username", "cml2"], "2"),
+        (["--username", "cml2", "--password", "cml2cml2"], "2"),
+    ],
+)
+def test_main_controller_errors(stub, tmp_path, args, code):
+    argv = ["prog", "--controller", stub.url, "-o", str(tmp_path / "out"), *args]
+    with patch("sys.argv", argv), patch.dict(os.environ, {"CML2_PASSWORD": ""}):
+        with pytest.raises(SystemExit, match=code):
+            cml2tf.main.main()
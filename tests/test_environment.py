@@ -0,0 +1,23 @@
+import os
+
+from cml2tf.environment import default_template_cache_dir, get_environment
+
+
+def test_get_environment_is_shared():
+    assert get_environment() is get_environment()
+    template = get_environment().get_template("main.tf.j2")
+    assert get_environment().get_template("main.tf.j2") is template
+
+
+def test_get_environment_bytecode_cache(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    environment = get_environment(cache_dir)
+    assert environment is not get_environment()
+    environment.get_template("main.tf.j2")
+    environment.get_template("variables.tf.j2")
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_default_template_cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert default_template_cache_dir().startswith(str(tmp_path / "cml2tf"))
@@ -0,0 +1,120 @@
+from argparse import Namespace
+from pathlib import Path
+from unittest.mock import patch
+
+import cml2tf.main
+import pytest
+from cml2tf.environment import get_environment
+from cml2tf.hcl import emit_main_tf, emit_shard, hcl_heredoc, hcl_string
+from cml2tf.manifest import MANIFEST_FILE
+from cml2tf.topology import CML2Topology
+
+from tests.synthetic import synthetic_topology
+
+
+def test_hcl_string():
+    assert hcl_string("iosv-0") == "iosv-0"
+    assert hcl_string(None) == "None"
+    assert hcl_string('say "hi"\\') == 'say \\"hi\\"\\\\'
+    assert hcl_string("a\nb\tc\r") == "a\\nb\\tc\\r"
+    assert hcl_string("${var.x} %{if} {}") == "$${var.x} %%{if} {}"
+
+
+def test_hcl_heredoc():
+    assert hcl_heredoc('line "1"\nline {2}') == 'line "1"\nline {2}'
+    assert hcl_heredoc("echo ${HOME}\n%{ for }") == "echo $${HOME}\n%%{ for }"
+
+
+@pytest.mark.parametrize(
+    "toponame,configs,golden",
+    [
+        ("mini.yaml", False, "mini.tf"),
+        ("topology.yaml", False, "topology.tf"),
+        ("topology.yaml", True, "topology-configs.tf"),
+    ],
+)
+@pytest.mark.parametrize("emitter", ["jinja", "direct"])
+def test_main_tf_golden(request, toponame, configs, golden, emitter):
+    testdata = Path(request.path).parent / "testdata"
+    topology = CML2Topology(cml2tf.main.read_cml2_topology(testdata / toponame))
+    flags = Namespace(configs=configs, emitter=emitter)
+
+    main_tf = "".join(cml2tf.main.stream_main_tf(get_environment(), topology, flags))
+    assert main_tf == (testdata / "golden" / golden).read_text()
+
+
+def special_topology() -> dict:
+    topology = synthetic_topology(
+        30, config_lines=7, links_per_node=2, multi_config=0.3
+    )
+    topology["lab"].update(
+        title='Lab "one" ${x}', description="first\nsecond", notes="100%{done}"
+    )
+    nodes = topology["nodes"]
+    nodes[1]["configuration"] = 'banner motd "${USER}"'
+    nodes[2]["configuration"] = "interface Gi0/0\n description %{uplink} \\ ${x}"
+    nodes[3]["configuration"] = [
+        {"name": "ios_config.txt", "content": ""},
+        {"name": "day0.txt", "content": ""},
+    ]
+    nodes[4]["configuration"] = [
+        {"name": "ios_config.txt", "content": "hostname a"},
+        {"name": "empty.txt", "content": ""},
+    ]
+    nodes[5].update(image_definition="iosv-159-3", tags=['rack "1"', "core"])
+    nodes[6]["configuration"] = ""
+    return topology
+
+
+@pytest.mark.parametrize("configs", [False, True])
+def test_direct_emitter_matches_templates(configs):
+    topology = CML2Topology(special_topology())
+    environment = get_environment()
+    nodes, links = topology.get_lab_nodes(), topology.get_lab_links()
+
+    jinja = Namespace(configs=configs, emitter="jinja")
+    direct = Namespace(configs=configs, emitter="direct")
+    main_tf = "".join(cml2tf.main.stream_main_tf(environment, topology, jinja))
+    assert "".join(emit_main_tf(topology, direct)) == main_tf
+    assert 'title = "Lab \\"one\\" $${x}"' in main_tf
+    if not configs:
+        assert 'configuration  = "banner motd \\"$${USER}\\""' in main_tf
+
+    # every heredoc streamed in chunks of a few lines
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr("cml2tf.topology.nodeconfig.CHUNK_SIZE", 16)
+        assert "".join(emit_main_tf(topology, direct, large_size=0)) == main_tf
+
+    for lab_nodes, lab_links in ((nodes[:10], links[:5]), ([], []), (nodes, [])):
+        assert "".join(emit_shard(lab_nodes, lab_links, direct)) == "".join(
+            cml2tf.main.stream_shard(environment, jinja, lab_nodes, lab_links)
+        )
+        assert "".join(
+            emit_main_tf(topology, direct, iter(lab_nodes), lab_links)
+        ) == "".join(
+            cml2tf.main.stream_main_tf(
+                environment, topology, jinja, lab_nodes, lab_links
+            )
+        )
+
+
+def test_main_emitter(request, tmp_path, capsys):
+    topology_file = Path(request.path).parent / "testdata" / "topology.yaml"
+    outdirs = {}
+    for emitter in ("jinja", "direct"):
+        outdirs[emitter] = tmp_path / emitter
+        argv = ["prog", "-c", "--shard", "count", "--shard-size", "2"]
+        argv += ["--emitter", emitter, "--large-config-size", "100"]
+        argv += ["-i", str(topology_file)]
+        with patch("sys.argv", argv + ["-o", str(outdirs[emitter])]):
+            cml2tf.main.main()
+    capsys.readouterr()
+
+    files = sorted(path.name for path in outdirs["jinja"].iterdir())
+    assert files == sorted(path.name for path in outdirs["direct"].iterdir())
+    # the manifest records modification times
+    files.remove(MANIFEST_FILE)
+    for name in files:
+        assert (outdirs["direct"] / name).read_bytes() == (
+            outdirs["jinja"] / name
+        ).read_bytes()
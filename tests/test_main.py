@@ -1,10 +1,21 @@
+import json
 import os
+import subprocess
+import sys
+import tracemalloc
 from argparse import Namespace
+from concurrent.futures import Future
 from pathlib import Path
 from unittest.mock import mock_open, patch
 
 import cml2tf.main
 import pytest
+import yaml
+from cml2tf.environment import get_environment
+from cml2tf.manifest import MANIFEST_FILE, Manifest
+from cml2tf.topology import CML2Topology
+
+from tests.synthetic import synthetic_topology, write_synthetic_export
 
 
 def test_read_cml2_topology():
@@ -20,7 +31,7 @@ def test_read_cml2_topology():
         new_callable=mock_open,
         read_data="lab: \n  title: Test Lab\n  description: This is a test lab\n  notes: Some notes",
     ) as mock_file:
-        with patch("yaml.safe_load", return_value=mock_yaml_data):
+        with patch("yaml.load", return_value=mock_yaml_data):
             result = cml2tf.main.read_cml2_topology(mock_file)
             assert result == mock_yaml_data
 
@@ -28,6 +39,26 @@ def test_read_cml2_topology():
         cml2tf.main.read_cml2_topology("doesnotexist")
 
 
+def test_get_yaml_loader(monkeypatch):
+    assert cml2tf.main.get_yaml_loader("python") is yaml.SafeLoader
+    if yaml.__with_libyaml__:
+        assert cml2tf.main.get_yaml_loader("auto") is yaml.CSafeLoader
+        assert cml2tf.main.get_yaml_loader("libyaml") is yaml.CSafeLoader
+
+    monkeypatch.delattr(yaml, "CSafeLoader")
+    assert cml2tf.main.get_yaml_loader("auto") is yaml.SafeLoader
+    with pytest.raises(SystemExit, match="1"):
+        cml2tf.main.get_yaml_loader("libyaml")
+
+
+@pytest.mark.skipif(not yaml.__with_libyaml__, reason="PyYAML built without libyaml")
+def test_read_cml2_topology_parsers_agree(request):
+    topology_file = Path(request.path).parent / "testdata" / "topology.yaml"
+    assert cml2tf.main.read_cml2_topology(
+        topology_file, "libyaml"
+    ) == cml2tf.main.read_cml2_topology(topology_file, "python")
+
+
 def test_save_file_to_disk():
     with patch("builtins.open", new_callable=mock_open()) as mock_file:
         cml2tf.main.save_file_to_disk("test.txt", "Hello, World!")
@@ -41,6 +72,34 @@ def test_save_file_to_disk():
             cml2tf.main.save_file_to_disk("doesnotexist", "bla")
 
 
+def test_save_file_to_disk_iterable(tmp_path):
+    filename = tmp_path / "test.txt"
+    cml2tf.main.save_file_to_disk(filename, (chunk for chunk in ["Hello, ", "World!"]))
+    assert filename.read_text() == "Hello, World!"
+
+
+def test_stream_main_tf_memory_is_flat(tmp_path):
+    environment = get_environment()
+    flags = Namespace(configs=False)
+
+    def peak_memory(node_count):
+        topology = CML2Topology(synthetic_topology(node_count, config_lines=100))
+        tracemalloc.start()
+        cml2tf.main.save_file_to_disk(
+            tmp_path / "main.tf",
+            cml2tf.main.stream_main_tf(environment, topology, flags),
+        )
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+
+    # compile the template before measuring
+    peak_memory(1)
+    # 10x the nodes, a fully rendered main.tf would need ~10x the memory
+    small = peak_memory(100)
+    assert peak_memory(1000) < 2 * small
+
+
 def test_create_directory():
     with patch("os.makedirs") as mock_makedirs, patch(
         "os.path.exists", return_value=False
@@ -64,7 +123,7 @@ def test_strip_extension():
     assert result == "test"
 
 
-def test_cml_to_terraform_convert():
+def test_cml_to_terraform_convert(tmp_path):
     mock_cml2topology = {
         "lab": {
             "title": "Test Lab",
@@ -72,28 +131,272 @@ def test_cml_to_terraform_convert():
             "notes": "Some notes",
         },
     }
-    mock_project_name = "test_project"
+    project = tmp_path / "test_project"
     mock_flags = Namespace(force=True)
 
-    saved_content = {}
+    cml2tf.main.cml_to_terraform_convert(mock_cml2topology, str(project), mock_flags)
+    assert sorted(path.name for path in project.iterdir()) == [
+        ".cml2tf-manifest.json",
+        "main.tf",
+        "variables.tf",
+    ]
+    # nothing is left behind next to the project directory
+    assert [path.name for path in tmp_path.iterdir()] == ["test_project"]
 
-    def mock_save(filename: str, content: str) -> None:
-        _ = filename
-        saved_content[filename] = content
 
-    with patch("cml2tf.main.create_directory"), patch("os.chdir"), patch(
-        "cml2tf.main.save_file_to_disk",
-        side_effect=mock_save,
-    ), patch("os.path.exists", return_value=False):
-        cml2tf.main.cml_to_terraform_convert(
-            mock_cml2topology, mock_project_name, mock_flags
-        )
-        assert len(saved_content.keys()) == 2
+def test_cml_to_terraform_convert_configs(request, tmp_path):
+    topology = cml2tf.main.read_cml2_topology(
+        Path(request.path).parent / "testdata" / "mini.yaml"
+    )
+    project = tmp_path / "mini"
+    cwd = os.getcwd()
+    cml2tf.main.cml_to_terraform_convert(
+        topology, str(project), Namespace(force=False, configs=True)
+    )
+    assert os.getcwd() == cwd
+    assert sorted(path.name for path in project.iterdir()) == [
+        ".cml2tf-manifest.json",
+        "alpine-0-node.cfg.cfg",
+        "ext-conn-0-default.cfg",
+        "main.tf",
+        "variables.tf",
+    ]
+    assert 'file("alpine-0-node.cfg.cfg")' in (project / "main.tf").read_text()
+
+
+def test_cml_to_terraform_convert_is_atomic(request, tmp_path, monkeypatch):
+    topology = cml2tf.main.read_cml2_topology(
+        Path(request.path).parent / "testdata" / "mini.yaml"
+    )
+    project = tmp_path / "mini"
+    flags = Namespace(force=True, configs=True)
+    cml2tf.main.cml_to_terraform_convert(topology, str(project), flags)
+    (project / "variables.tf").write_text("# changed by the user")
+    before = {path.name: path.read_text() for path in project.iterdir()}
+
+    def failing_main_tf(*args):
+        yield "partial"
+        raise OSError("disk full")
+
+    # a conversion failing halfway leaves the project untouched
+    topology["nodes"][0]["configuration"][0]["content"] = "NAT changed"
+    monkeypatch.setattr(cml2tf.main, "stream_main_tf", failing_main_tf)
+    with pytest.raises(SystemExit):
+        cml2tf.main.cml_to_terraform_convert(topology, str(project), flags)
+    assert {path.name: path.read_text() for path in project.iterdir()} == before
+    assert os.listdir(tmp_path) == ["mini"]
+
+    # variables.tf is kept when the conversion succeeds
+    monkeypatch.undo()
+    cml2tf.main.cml_to_terraform_convert(topology, str(project), flags)
+    assert (project / "variables.tf").read_text() == "# changed by the user"
+    assert (project / "ext-conn-0-default.cfg").read_text() == "NAT changed"
+
+
+def test_cml_to_terraform_convert_multi_config(request, tmp_path):
+    topology = cml2tf.main.read_cml2_topology(
+        Path(request.path).parent / "testdata" / "mini.yaml"
+    )
+    topology["nodes"][2]["configuration"].append(
+        {"name": "day0.txt", "content": "hostname alpine-0"}
+    )
+
+    inline = tmp_path / "inline"
+    cml2tf.main.cml_to_terraform_convert(
+        topology, str(inline), Namespace(force=False, configs=False)
+    )
+    main_tf = (inline / "main.tf").read_text()
+    assert "configurations = [" in main_tf
+    assert 'name    = "day0.txt"' in main_tf
+    assert 'content = "hostname alpine-0"' in main_tf
+    assert "        hostname alpine-0\n" in main_tf
+
+    files = tmp_path / "files"
+    cml2tf.main.cml_to_terraform_convert(
+        topology, str(files), Namespace(force=False, configs=True)
+    )
+    assert (files / "alpine-0-day0.txt.cfg").read_text() == "hostname alpine-0"
+    assert 'content = file("alpine-0-day0.txt.cfg")' in (files / "main.tf").read_text()
+
+
+def test_cml_to_terraform_convert_dedup_configs(request, tmp_path, capsys):
+    topology_file = Path(request.path).parent / "testdata" / "mini.yaml"
+    project = tmp_path / "mini"
+    # Every node is rendered into a shard of its own
+    flags = Namespace(force=True, configs=True, shard="count", shard_size=1)
+
+    topology = cml2tf.main.read_cml2_topology(topology_file)
+    shared = topology["nodes"][2]["configuration"][0]["content"]
+    topology["nodes"][0]["configuration"][0]["content"] = shared
+    cml2tf.main.cml_to_terraform_convert(topology, str(project), flags)
+    assert "2 configurations stored in 1 files (dedup ratio 2.0x" in (
+        capsys.readouterr().out
+    )
+    assert not (project / "alpine-0-node.cfg.cfg").exists()
+    assert (project / "ext-conn-0-default.cfg").read_text() == shared
+    clone_tf = project / "nodes_002.tf"
+    assert 'file("ext-conn-0-default.cfg")' in clone_tf.read_text()
+
+    # The clone gets a file of its own once the configurations differ
+    topology["nodes"][0]["configuration"][0]["content"] = "NAT"
+    cml2tf.main.cml_to_terraform_convert(topology, str(project), flags)
+    assert (project / "alpine-0-node.cfg.cfg").read_text() == shared
+    assert 'file("alpine-0-node.cfg.cfg")' in clone_tf.read_text()
+
+
+def test_cml_to_terraform_convert_incremental(request, tmp_path, capsys):
+    topology_file = Path(request.path).parent / "testdata" / "mini.yaml"
+    project = tmp_path / "mini"
+    flags = Namespace(force=True, configs=True)
+
+    # a file written again is a new file, a skipped file keeps its inode
+    def convert(topology):
+        cml2tf.main.cml_to_terraform_convert(topology, str(project), flags)
+        return {path.name: path.stat().st_ino for path in project.iterdir()}
+
+    first = convert(cml2tf.main.read_cml2_topology(topology_file))
+    assert "0 of 3 unchanged files skipped" in capsys.readouterr().out
+    main_tf = (project / "main.tf").read_text()
+
+    second = convert(cml2tf.main.read_cml2_topology(topology_file))
+    assert "0 of 7 resources changed, 3 of 3 unchanged files skipped" in (
+        capsys.readouterr().out
+    )
+    assert second["main.tf"] == first["main.tf"]
+    assert second["alpine-0-node.cfg.cfg"] == first["alpine-0-node.cfg.cfg"]
+    assert second.keys() == first.keys()
+
+    topology = cml2tf.main.read_cml2_topology(topology_file)
+    topology["nodes"][0]["configuration"][0]["content"] = "NAT changed"
+    third = convert(topology)
+    assert "1 of 7 resources changed, 1 of 3 unchanged files skipped" in (
+        capsys.readouterr().out
+    )
+    assert third["alpine-0-node.cfg.cfg"] == first["alpine-0-node.cfg.cfg"]
+    assert third["ext-conn-0-default.cfg"] != first["ext-conn-0-default.cfg"]
+    assert (project / "ext-conn-0-default.cfg").read_text() == "NAT changed"
+    assert (project / "main.tf").read_text() == main_tf
+
+
+def test_cml_to_terraform_convert_restores_edited_files(request, tmp_path, capsys):
+    topology_file = Path(request.path).parent / "testdata" / "mini.yaml"
+    project = tmp_path / "mini"
+    argv = ["prog", "-c", "-f", "-i", str(topology_file), "-o", str(project)]
+    with patch("sys.argv", argv):
+        cml2tf.main.main()
+    generated = {path.name: path.read_text() for path in project.iterdir()}
+
+    (project / "main.tf").write_text("garbage")
+    (project / "ext-conn-0-default.cfg").write_text("NAT")
+    (project / "alpine-0-node.cfg.cfg").unlink()
+    capsys.readouterr()
+    with patch("sys.argv", argv):
+        cml2tf.main.main()
+    assert "0 of 3 unchanged files skipped" in capsys.readouterr().out
+    for name in ("main.tf", "ext-conn-0-default.cfg", "alpine-0-node.cfg.cfg"):
+        assert (project / name).read_text() == generated[name]
+
+
+def test_cml_to_terraform_convert_into_cwd(request, tmp_path, monkeypatch):
+    topology_file = Path(request.path).parent / "testdata" / "mini.yaml"
+    project = tmp_path / "mini"
+    project.mkdir()
+    (project / "terraform.tfstate").write_text("state")
+    monkeypatch.chdir(project)
+    for _ in range(2):
+        with patch(
+            "sys.argv", ["prog", "-c", "-f", "-i", str(topology_file), "-o", "."]
+        ):
+            cml2tf.main.main()
+        assert os.getcwd() == str(project)
+    assert (project / "main.tf").exists()
+    assert (project / "terraform.tfstate").read_text() == "state"
+    assert os.listdir(tmp_path) == ["mini"]
+
+
+def test_cml_to_terraform_convert_sharded(request, tmp_path, capsys):
+    topology_file = Path(request.path).parent / "testdata" / "topology.yaml"
+    project = tmp_path / "topology"
+    single = tmp_path / "single"
+    flags = Namespace(force=True, configs=False, shard="count", shard_size=3)
+
+    topology = cml2tf.main.read_cml2_topology(topology_file)
+    cml2tf.main.cml_to_terraform_convert(topology, str(single), Namespace(force=True))
+    cml2tf.main.cml_to_terraform_convert(topology, str(project), flags)
+    files = sorted(path.name for path in project.glob("*.tf"))
+    assert files == [
+        "links_000.tf",
+        "links_001.tf",
+        "links_002.tf",
+        "main.tf",
+        "nodes_000.tf",
+        "nodes_001.tf",
+        "variables.tf",
+    ]
+    # the shards hold the same resources as a single main.tf
+    sharded = "".join((project / name).read_text() for name in files)
+    for block in (single / "main.tf").read_text().split("\n\n"):
+        assert block.strip() in sharded
+    capsys.readouterr()
+
+    # only the shard with the changed node is rendered again, unchanged files
+    # are carried over as they are
+    inodes = {path.name: path.stat().st_ino for path in project.iterdir()}
+    topology["nodes"][4]["x"] = 1000
+    cml2tf.main.cml_to_terraform_convert(topology, str(project), flags)
+    output = capsys.readouterr().out
+    rewritten = [
+        path.name
+        for path in project.iterdir()
+        if path.stat().st_ino != inodes[path.name]
+    ]
+    assert sorted(rewritten) == [".cml2tf-manifest.json", "nodes_001.tf"]
+    assert "1 of 16 resources changed, 5 of 6 unchanged files skipped" in output
+
+    # shards which are no longer generated are removed
+    flags.shard_size = 10
+    cml2tf.main.cml_to_terraform_convert(topology, str(project), flags)
+    assert sorted(path.name for path in project.glob("*.tf")) == [
+        "links_000.tf",
+        "main.tf",
+        "nodes_000.tf",
+        "variables.tf",
+    ]
+
+
+def test_wait_for_config_writes():
+    future = Future()
+    future.set_exception(OSError("disk full"))
+    with pytest.raises(SystemExit, match="1"):
+        cml2tf.main.wait_for_config_writes([future])
+
+
+@pytest.mark.parametrize("argv", [[], ["--help"], ["-j", "0", "-i", "lab.yaml"]])
+def test_startup_imports_are_lazy(argv):
+    script = (
+        "import sys\n"
+        "import cml2tf.main\n"
+        f"sys.argv = ['cml2tf'] + {argv!r}\n"
+        "try:\n"
+        "    cml2tf.main.main()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "heavy = ('yaml', 'jinja2', 'concurrent.futures', 'cml2tf.topology')\n"
+        "print(sorted(name for name in heavy if name in sys.modules))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+    ).stdout
+    assert output.splitlines()[-1] == "[]"
 
 
 @pytest.mark.parametrize(
     "toponame,expected",
-    [("topology.yaml", 8), ("mini.yaml", 4)],
+    [("topology.yaml", 9), ("mini.yaml", 5)],
 )
 def test_integration(request, tmp_path, toponame, expected):
     testdata = Path(request.path).parent / "testdata"
@@ -108,3 +411,89 @@ def test_integration(request, tmp_path, toponame, expected):
     ):
         cml2tf.main.main()
     assert len(list(test_dir.iterdir())) == expected
+
+
+def test_main_timings(request, tmp_path, capsys):
+    testdata = Path(request.path).parent / "testdata"
+    metrics_json = tmp_path / "metrics.json"
+
+    with patch(
+        "sys.argv",
+        ["prog", "-c", "--timings", "--metrics-json", str(metrics_json)]
+        + ["-i", f"{testdata}/topology.yaml", "-o", str(tmp_path / "out")],
+    ):
+        cml2tf.main.main()
+    output = capsys.readouterr().out
+    assert "phase" in output and "peak MiB" in output
+
+    metrics = json.loads(metrics_json.read_text())
+    assert set(metrics["phases"]) == {
+        "read",
+        "validate",
+        "model",
+        "render",
+        "write",
+        "hash",
+    }
+    assert metrics["counters"]["files_written"] == 9
+
+
+def test_main_memory_profile(request, tmp_path, capsys):
+    testdata = Path(request.path).parent / "testdata"
+    metrics_json = tmp_path / "metrics.json"
+
+    with patch(
+        "sys.argv",
+        ["prog", "--memory-profile", "3", "--metrics-json", str(metrics_json)]
+        + ["-i", f"{testdata}/topology.yaml", "-o", str(tmp_path / "out")],
+    ):
+        cml2tf.main.main()
+    output = capsys.readouterr().out
+    assert "top allocation sites of phase read:" in output
+    assert "top allocation sites of phase model:" in output
+
+    metrics = json.loads(metrics_json.read_text())
+    assert set(metrics["sites"]) == set(metrics["phases"])
+    assert all(len(sites) <= 3 for sites in metrics["sites"].values())
+    assert metrics["sites"]["read"][0]["bytes"] > 0
+
+
+def test_cml_to_terraform_stream(request, tmp_path, capsys):
+    topology_file = Path(request.path).parent / "testdata" / "topology.yaml"
+    flags = Namespace(force=True, configs=True)
+    cml2tf.main.cml_to_terraform_convert(
+        cml2tf.main.read_cml2_topology(topology_file), str(tmp_path / "load"), flags
+    )
+    cml2tf.main.cml_to_terraform_stream(
+        str(topology_file), str(tmp_path / "stream"), flags
+    )
+    for path in (tmp_path / "load").iterdir():
+        if path.name != MANIFEST_FILE:
+            assert (tmp_path / "stream" / path.name).read_text() == path.read_text()
+    load, stream = (Manifest.load(str(tmp_path / name)) for name in ("load", "stream"))
+    assert (stream.resources, stream.files) == (load.resources, load.files)
+
+    # The manifests agree, a regular conversion skips all streamed files
+    capsys.readouterr()
+    cml2tf.main.cml_to_terraform_convert(
+        cml2tf.main.read_cml2_topology(topology_file), str(tmp_path / "stream"), flags
+    )
+    assert "0 of 16 resources changed, 7 of 7 unchanged files skipped" in (
+        capsys.readouterr().out
+    )
+
+
+def test_cml_to_terraform_stream_memory(tmp_path, capsys):
+    topology_file = str(tmp_path / "lab.yaml")
+    write_synthetic_export(topology_file, 500, config_lines=200)
+
+    def peak_memory(stream):
+        flags = Namespace(force=True, configs=True, stream=stream)
+        tracemalloc.start()
+        cml2tf.main.convert_topology_file(topology_file, str(tmp_path / "out"), flags)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    # The configurations dominate the lab, only one node is held at a time
+    assert peak_memory(True) < peak_memory(False) / 3
@@ -0,0 +1,82 @@
+import hashlib
+import os
+
+from cml2tf.manifest import (
+    MANIFEST_FILE,
+    Manifest,
+    digest,
+    encoded_size,
+    resource_digests,
+)
+
+
+def test_resource_digests():
+    topology = {
+        "lab": {"title": "Test Lab"},
+        "nodes": [{"id": "n1", "label": "Node 1"}, {"id": "n2", "label": "Node 2"}],
+        "links": [{"id": "l1", "n1": "n1", "n2": "n2"}],
+    }
+    resources = resource_digests(topology, {"configs": False})
+    assert sorted(resources) == ["lab", "link:l1", "node:n1", "node:n2", "settings"]
+    assert resources == resource_digests(topology, {"configs": False})
+
+    topology["nodes"][1]["label"] = "Node 3"
+    changed = resource_digests(topology, {"configs": True})
+    assert Manifest(changed).changed_resources(Manifest(resources)) == [
+        "node:n2",
+        "settings",
+    ]
+
+
+def test_changed_resources_added_and_removed():
+    previous = Manifest({"lab": "a", "node:n1": "b"})
+    current = Manifest({"lab": "a", "node:n2": "b"})
+    assert current.changed_resources(previous) == ["node:n1", "node:n2"]
+    assert current.changed_resources(Manifest()) == ["lab", "node:n2"]
+
+
+def test_load_and_dumps(tmp_path):
+    manifest = Manifest({"lab": "a"}, {"main.tf": "b"})
+    (tmp_path / MANIFEST_FILE).write_text(manifest.dumps())
+    loaded = Manifest.load(str(tmp_path))
+    assert loaded.resources == manifest.resources
+    assert loaded.files == manifest.files
+
+
+def test_load_missing_or_invalid(tmp_path):
+    assert Manifest.load(str(tmp_path)).resources == {}
+    (tmp_path / MANIFEST_FILE).write_text("{not json")
+    assert Manifest.load(str(tmp_path)).files == {}
+    (tmp_path / MANIFEST_FILE).write_text('{"version": 0, "files": {"a": "b"}}')
+    assert Manifest.load(str(tmp_path)).files == {}
+
+
+def test_unchanged(tmp_path):
+    (tmp_path / "a.cfg").write_text("config")
+    manifest = Manifest(files={"a.cfg": digest("config"), "b.cfg": digest("x")})
+    manifest.record_fingerprints(str(tmp_path), Manifest())
+    assert manifest.fingerprints["b.cfg"] is None
+    assert manifest.unchanged(str(tmp_path), "a.cfg", digest("config"))
+    assert not manifest.unchanged(str(tmp_path), "a.cfg", digest("other"))
+    assert not manifest.unchanged(str(tmp_path), "b.cfg", digest("x"))
+
+    # edited by hand since it was written
+    (tmp_path / "a.cfg").write_text("edited")
+    assert not manifest.unchanged(str(tmp_path), "a.cfg", digest("config"))
+    (tmp_path / "a.cfg").write_text("config")
+    os.utime(tmp_path / "a.cfg", ns=(0, 0))
+    assert not manifest.unchanged(str(tmp_path), "a.cfg", digest("config"))
+
+    # files which were not written again keep their fingerprint
+    rewritten = Manifest(files=manifest.files)
+    rewritten.record_fingerprints(str(tmp_path / "missing"), manifest)
+    assert rewritten.fingerprints == manifest.fingerprints
+
+
+def test_digest_in_chunks(monkeypatch):
+    text = "hostname r1\nbanner ü €\n" * 100
+    expected = hashlib.sha256(text.encode()).hexdigest()
+    monkeypatch.setattr("cml2tf.manifest.CHUNK_SIZE", 7)
+    assert digest(text) == expected
+    assert encoded_size(text) == len(text.encode())
+    assert encoded_size("ascii only") == 10
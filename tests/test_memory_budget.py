@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import yaml
+
+
+def test_peak_memory_per_node_within_budget():
+    # Measured in a subprocess, so a tracer running the tests, like the one of
+    # coverage, does not allocate along with the conversion
+    root = Path(__file__).parents[1]
+    parser = "libyaml" if hasattr(yaml, "CSafeLoader") else "python"
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(root / "src"), str(root)])}
+    env.pop("COVERAGE_PROCESS_START", None)
+    result = subprocess.run(
+        [sys.executable, "-m", "tests.benchmarks.bench_memory"]
+        + ["--check", "--parser", parser],
+        capture_output=True,
+        text=True,
+        cwd=root,
+        env=env,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
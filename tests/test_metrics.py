@@ -0,0 +1,67 @@
+import json
+import time
+
+from cml2tf.metrics import NULL_METRICS, Metrics
+
+
+def test_null_metrics_are_noops():
+    assert not NULL_METRICS.enabled
+    with NULL_METRICS.phase("model"):
+        NULL_METRICS.count("nodes", 3)
+        NULL_METRICS.file_written("missing.tf")
+    chunks = ["a", "b"]
+    assert NULL_METRICS.timed(chunks, "render") is chunks
+
+
+def test_metrics_phases_exclude_nested_time():
+    metrics = Metrics()
+    with metrics.phase("write"):
+        time.sleep(0.02)
+        with metrics.phase("render"):
+            time.sleep(0.05)
+    metrics.close()
+    phases = metrics.as_dict()["phases"]
+    assert phases["render"]["seconds"] >= 0.05
+    assert 0.02 <= phases["write"]["seconds"] < 0.05
+    assert phases["write"]["peak_bytes"] >= 0
+
+
+def test_metrics_timed_and_counters(tmp_path):
+    metrics = Metrics()
+    assert list(metrics.timed(iter(["a", "b"]), "render")) == ["a", "b"]
+    metrics.count("nodes", 2)
+    metrics.count("nodes")
+    path = tmp_path / "main.tf"
+    path.write_text("12345")
+    metrics.file_written(str(path))
+    metrics.close()
+
+    data = json.loads(metrics.dumps())
+    assert "render" in data["phases"]
+    assert data["counters"] == {"nodes": 3, "files_written": 1, "bytes_written": 5}
+    report = metrics.report()
+    assert "render" in report
+    assert "bytes_written" in report
+
+
+def test_metrics_profile_top_sites():
+    metrics = Metrics(profile=2)
+    with metrics.phase("model"):
+        records = [bytes(1000) for _ in range(1000)]  # the largest site
+        with metrics.phase("render"):
+            chunks = list(metrics.timed((str(i) * 100 for i in range(100)), "render"))
+    metrics.close()
+
+    model, render = metrics.top_sites("model"), metrics.top_sites("render")
+    assert len(model) == 2 and "test_metrics.py:" in model[0][0]
+    assert model[0][1] >= 1000 * 1000 and model[0][2] >= 1000
+    assert "test_metrics.py:" in render[0][0]
+    assert render[0][0] != model[0][0]
+    assert len(records) == 1000 and len(chunks) == 100
+
+    data = json.loads(metrics.dumps())
+    assert data["sites"]["model"][0]["bytes"] == model[0][1]
+    assert "top allocation sites of phase model:" in metrics.report()
+    unprofiled = Metrics()
+    unprofiled.close()
+    assert "sites" not in unprofiled.as_dict()
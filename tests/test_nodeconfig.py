@@ -1,4 +1,5 @@
 import os
+import tracemalloc
 
 import pytest
 from cml2tf.topology.nodeconfig import NodeConfig
@@ -61,3 +62,99 @@ def test_fileout_list_config(tmp_path):
     with open(filename) as f:
         content = f.read()
     assert content == config_list[0]["content"]
+
+
+def test_indented_out():
+    config = NodeConfig("label", "line1\n\nline3")
+    assert config.out(indent=4) == "    line1\n    \n    line3"
+    assert config.out(indent=2) == "  line1\n  \n  line3"
+    assert config.out() == "line1\n\nline3"
+    assert not config.oneline()
+    assert not config.empty()
+
+
+def test_derived_views_are_computed_once():
+    config = NodeConfig("label", [{"name": "Main", "content": "line1\nline2"}])
+    assert config.out() is config.out()
+    config._config = []
+    # the configuration is selected once, later changes are not seen
+    assert config.out() == "line1\nline2"
+    assert not config.empty()
+
+
+def test_filename():
+    assert NodeConfig("label", "one line").filename() == "label.cfg"
+    config = NodeConfig("label", [{"name": "Main", "content": "one line"}])
+    assert config.filename() == "label-Main.cfg"
+
+
+def test_fileout_directory(tmp_path):
+    config = NodeConfig("label", "one line")
+    assert config.fileout(str(tmp_path)) == "label.cfg"
+    assert (tmp_path / "label.cfg").read_text() == "one line"
+
+
+def test_multi_config():
+    config = NodeConfig(
+        "label",
+        [{"name": "Main", "content": ""}, {"name": "day0", "content": "line"}],
+    )
+    assert config.multi()
+    assert not config.empty()
+    assert [item.name() for item in config.configs()] == ["Main", "day0"]
+    assert [item.filename() for item in config.configs()] == [
+        "label-Main.cfg",
+        "label-day0.cfg",
+    ]
+    assert config.configs()[1].out() == "line"
+
+
+def test_single_config_configs():
+    config = NodeConfig("label", [{"name": "Main", "content": "one line"}])
+    assert not config.multi()
+    assert config.configs() == [config]
+    assert config.name() == "Main"
+    assert NodeConfig("label", "one line").name() is None
+
+
+def test_store():
+    config = NodeConfig("label", "one line")
+    config.store("other.cfg")
+    assert config.filename() == "other.cfg"
+
+
+@pytest.mark.parametrize(
+    "text", ["", "one line", "line1\n\nline3\n", "\n" + "x" * 40 + "\nlast" * 9]
+)
+def test_chunks(monkeypatch, text):
+    monkeypatch.setattr("cml2tf.topology.nodeconfig.CHUNK_SIZE", 8)
+    config = NodeConfig("label", text)
+    for indent in (0, 4):
+        chunks = list(config.chunks(indent=indent))
+        assert "".join(chunks) == NodeConfig("label", text).out(indent=indent)
+        assert all(len(chunk.split("\n")[0]) <= 8 + 40 for chunk in chunks)
+
+
+def test_indented_config_is_not_cached():
+    config = NodeConfig("label", "line1\nline2")
+    assert config.out(indent=4) == "    line1\n    line2"
+    assert config.out(indent=4) is not config.out(indent=4)
+
+
+def test_fileout_large_config(tmp_path, monkeypatch):
+    monkeypatch.setattr("cml2tf.topology.nodeconfig.CHUNK_SIZE", 1 << 16)
+    text = "\n".join(
+        f"ip route 10.{i >> 8}.{i & 255}.0 255.255.255.0 Null0" for i in range(200000)
+    )
+    config = NodeConfig("label", text + "\nbanner é")
+
+    def peak_memory(large_size):
+        tracemalloc.start()
+        config.fileout(str(tmp_path), large_size)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert (tmp_path / "label.cfg").read_text() == config.out()
+        return peak
+
+    assert peak_memory(large_size=0) < 1 << 20
+    assert peak_memory(large_size=len(text) * 2) > config.size()
@@ -0,0 +1,57 @@
+import pytest
+import yaml
+from cml2tf.reader import INTERFACE_METADATA, iter_nodes, scan_topology
+
+LOADERS = [yaml.SafeLoader] + (
+    [yaml.CSafeLoader] if hasattr(yaml, "CSafeLoader") else []
+)
+
+
+@pytest.mark.parametrize("loader", LOADERS)
+@pytest.mark.parametrize("toponame", ["mini.yaml", "topology.yaml"])
+def test_reader_agrees_with_yaml_load(request, toponame, loader):
+    topology_file = request.path.parent / "testdata" / toponame
+    with open(topology_file) as file:
+        topology = yaml.load(file, Loader=loader)
+
+    assert list(iter_nodes(str(topology_file), loader)) == topology["nodes"]
+
+    skeleton = scan_topology(str(topology_file), loader)
+    assert skeleton["lab"] == topology["lab"]
+    assert skeleton["links"] == topology["links"]
+    assert skeleton["nodes"] == [
+        {
+            "id": node["id"],
+            "label": node["label"],
+            "interfaces": [
+                {key: interface[key] for key in INTERFACE_METADATA if key in interface}
+                for interface in node["interfaces"]
+            ],
+        }
+        for node in topology["nodes"]
+    ]
+
+
+def test_reader_aliases_and_empty_sections(tmp_path):
+    topology_file = tmp_path / "lab.yaml"
+    topology_file.write_text(
+        "annotations: [{x: 1}]\n"
+        + "nodes:\n"
+        + "  - {id: n0, label: &name r1, tags: [a]}\n"
+        + "  - {id: n1, label: *name, x: 10}\n"
+        + "links: []\n"
+        + "lab: {title: lab}\n"
+    )
+    assert list(iter_nodes(str(topology_file))) == [
+        {"id": "n0", "label": "r1", "tags": ["a"]},
+        {"id": "n1", "label": "r1", "x": 10},
+    ]
+    assert scan_topology(str(topology_file)) == {
+        "nodes": [{"id": "n0", "label": "r1"}, {"id": "n1", "label": "r1"}],
+        "links": [],
+        "lab": {"title": "lab"},
+    }
+
+    topology_file.write_text("- not a mapping\n")
+    with pytest.raises(ValueError):
+        scan_topology(str(topology_file))
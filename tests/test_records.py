@@ -0,0 +1,53 @@
+from collections.abc import Mapping
+
+import pytest
+from cml2tf.topology import LinkRecord
+
+
+@pytest.fixture
+def link():
+    return LinkRecord("l1", "Node 1", "Node 2", 0, 1)
+
+
+def test_attributes(link):
+    assert link.link_name == "l1"
+    assert link.slot_b == 1
+    assert not hasattr(link, "__dict__")
+    with pytest.raises(AttributeError):
+        link.unknown = 1
+
+
+def test_dict_access(link):
+    assert link["node_a"] == "Node 1"
+    assert link.get("node_b") == "Node 2"
+    assert link.get("unknown", "default") == "default"
+    assert list(link.keys()) == ["link_name", "node_a", "node_b", "slot_a", "slot_b"]
+    with pytest.raises(KeyError):
+        link["unknown"]
+
+
+def test_mapping(link):
+    assert isinstance(link, Mapping)
+    assert "node_a" in link and "unknown" not in link
+    assert len(link) == 5
+    assert list(link) == list(link.keys())
+    assert list(link.values()) == ["l1", "Node 1", "Node 2", 0, 1]
+    assert dict(link.items()) == link.as_dict()
+
+
+def test_as_dict(link):
+    assert link.as_dict() == {
+        "link_name": "l1",
+        "node_a": "Node 1",
+        "node_b": "Node 2",
+        "slot_a": 0,
+        "slot_b": 1,
+    }
+    assert dict(link) == link.as_dict()
+
+
+def test_equality(link):
+    assert link == LinkRecord("l1", "Node 1", "Node 2", 0, 1)
+    assert link != LinkRecord("l1", "Node 1", "Node 2", 0, 2)
+    assert link != link.as_dict()
+    assert repr(link).startswith("LinkRecord(link_name='l1'")
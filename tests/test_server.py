@@ -0,0 +1,106 @@
+import io
+import json
+import tarfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from pathlib import Path
+from unittest.mock import patch
+
+import cml2tf.main
+import pytest
+from cml2tf.api import ConvertOptions, convert
+from cml2tf.server import ConversionServer, ResultCache
+
+from tests.synthetic import synthetic_topology
+
+
+@pytest.fixture
+def server():
+    server = ConversionServer(("127.0.0.1", 0), workers=4, cache_size=1 << 20)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, path: str, body: bytes, headers=None):
+    connection = HTTPConnection(*server.server_address[:2])
+    try:
+        connection.request("POST", path, body, headers or {})
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        connection.close()
+
+
+def test_result_cache_evicts_least_recently_used():
+    cache = ResultCache(10)
+    cache.put("a", {"main.tf": "aaaa"})
+    cache.put("b", {"main.tf": "bbbb"})
+    assert cache.get("a") == {"main.tf": "aaaa"}
+    cache.put("c", {"main.tf": "cccc"})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    cache.put("d", {"main.tf": "d" * 11})
+    assert cache.get("d") is None
+    assert cache.stats()["bytes"] == 8
+
+
+def test_server_convert(request, server):
+    topology_file = Path(request.path).parent / "testdata" / "topology.yaml"
+    body = topology_file.read_bytes()
+
+    status, headers, data = post(server, "/convert?configs=1", body)
+    assert status == 200 and headers["X-Cache"] == "miss"
+    expected = convert(topology_file, ConvertOptions(configs=True))
+    assert json.loads(data)["files"] == expected
+
+    status, headers, data = post(
+        server, "/convert?configs=1", body, {"Accept": "application/x-tar"}
+    )
+    assert status == 200 and headers["X-Cache"] == "hit"
+    with tarfile.open(fileobj=io.BytesIO(data)) as archive:
+        assert {
+            member.name: archive.extractfile(member).read().decode()
+            for member in archive.getmembers()
+        } == expected
+
+    status, headers, _ = post(server, "/convert", body)
+    assert headers["X-Cache"] == "miss"
+
+
+def test_server_errors(server):
+    assert post(server, "/convert", b"lab: [")[0] == 422
+    assert post(server, "/convert", b"nodes: []")[0] == 422
+    assert post(server, "/convert?shard=rack", b"lab: {}")[0] == 400
+    assert post(server, "/convert?shard_size=many", b"lab: {}")[0] == 400
+    assert post(server, "/labs", b"")[0] == 404
+
+    connection = HTTPConnection(*server.server_address[:2])
+    connection.request("GET", "/health")
+    health = json.loads(connection.getresponse().read())
+    connection.close()
+    assert health["status"] == "ok" and health["cache"]["entries"] == 0
+
+
+def test_server_concurrent_requests(server):
+    exports = [
+        json.dumps(synthetic_topology(10 + count, config_lines=3)).encode()
+        for count in range(4)
+    ]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(
+            executor.map(lambda body: post(server, "/convert", body), exports * 4)
+        )
+    for index, (status, _, data) in enumerate(responses):
+        assert status == 200
+        assert json.loads(data)["files"] == convert(exports[index % 4])
+    stats = server.cache.stats()
+    assert stats["entries"] == 4 and stats["hits"] + stats["misses"] == 16
+
+
+def test_main_serve_options():
+    with patch("sys.argv", ["prog", "serve", "--workers", "0"]):
+        with pytest.raises(SystemExit, match="2"):
+            cml2tf.main.main()
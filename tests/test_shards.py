@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+from cml2tf.shards import plan_shards, shard_by_count, shard_by_tag
+
+
+def node(name, tags):
+    return SimpleNamespace(node_name=name, node_tags=tags)
+
+
+def test_shard_by_count():
+    assert shard_by_count("nodes", [1, 2, 3, 4, 5], 2) == {
+        "nodes_000.tf": [1, 2],
+        "nodes_001.tf": [3, 4],
+        "nodes_002.tf": [5],
+    }
+    assert shard_by_count("links", [], 2) == {}
+
+
+def test_shard_by_tag():
+    nodes = [node("a", ["core"]), node("b", []), node("c", ["edge/1", "core"])]
+    nodes.append(node("d", ["core"]))
+    assert shard_by_tag("nodes", nodes) == {
+        "nodes_core.tf": [nodes[0], nodes[3]],
+        "nodes_untagged.tf": [nodes[1]],
+        "nodes_edge_1.tf": [nodes[2]],
+    }
+
+
+def test_plan_shards():
+    nodes = [node("a", ["core"]), node("b", ["edge"])]
+    links = [{"link_name": "l0"}, {"link_name": "l1"}, {"link_name": "l2"}]
+    shards = plan_shards(nodes, links, "count", 2)
+    assert [shard.filename for shard in shards] == [
+        "nodes_000.tf",
+        "links_000.tf",
+        "links_001.tf",
+    ]
+    assert shards[0].nodes == nodes and shards[0].links == []
+    assert shards[2].links == links[2:]
+
+    shards = plan_shards(nodes, links, "tag", 2)
+    assert [shard.filename for shard in shards][:2] == [
+        "nodes_core.tf",
+        "nodes_edge.tf",
+    ]
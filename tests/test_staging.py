@@ -0,0 +1,62 @@
+import os
+import stat
+
+import pytest
+from cml2tf.staging import StagedDirectory
+
+
+def test_staged_directory_new(tmp_path):
+    directory = tmp_path / "out" / "project"
+    with StagedDirectory(str(directory)) as staging:
+        staging.write("main.tf", iter(["a", "b"]))
+        assert not directory.exists()
+        assert staging.commit() == []
+    assert (directory / "main.tf").read_text() == "ab"
+    assert stat.S_IMODE(directory.stat().st_mode) != 0o700
+    assert os.listdir(tmp_path / "out") == ["project"]
+
+
+def test_staged_directory_keeps_other_files(tmp_path):
+    directory = tmp_path / "project"
+    (directory / ".terraform" / "providers").mkdir(parents=True)
+    (directory / ".terraform" / "providers" / "cml2").write_text("binary")
+    (directory / "terraform.tfstate").write_text("state")
+    (directory / "main.tf").write_text("old")
+    (directory / "stale.tf").write_text("stale")
+    os.symlink("terraform.tfstate", directory / "link")
+    os.chmod(directory, 0o750)
+    inode = directory.stat().st_ino
+
+    with StagedDirectory(str(directory)) as staging:
+        staging.write("main.tf", "new")
+        with open(staging.file("r1.cfg"), "w") as file:
+            file.write("config")
+        assert staging.commit(drop=["stale.tf", "missing.tf"]) == ["stale.tf"]
+
+    assert sorted(os.listdir(directory)) == [
+        ".terraform",
+        "link",
+        "main.tf",
+        "r1.cfg",
+        "terraform.tfstate",
+    ]
+    assert directory.stat().st_ino == inode
+    assert (directory / "main.tf").read_text() == "new"
+    assert (directory / "r1.cfg").read_text() == "config"
+    assert (directory / ".terraform" / "providers" / "cml2").read_text() == "binary"
+    assert os.readlink(directory / "link") == "terraform.tfstate"
+    assert stat.S_IMODE(directory.stat().st_mode) == 0o750
+    assert os.listdir(tmp_path) == ["project"]
+
+
+def test_staged_directory_failure(tmp_path):
+    directory = tmp_path / "project"
+    directory.mkdir()
+    (directory / "main.tf").write_text("old")
+
+    with pytest.raises(SystemExit):
+        with StagedDirectory(str(directory)) as staging:
+            staging.write("main.tf", "new")
+            exit(1)
+    assert (directory / "main.tf").read_text() == "old"
+    assert os.listdir(tmp_path) == ["project"]
@@ -0,0 +1,32 @@
+import pytest
+from cml2tf.main import read_cml2_topology
+from cml2tf.topology import CML2Topology
+
+from tests.synthetic import synthetic_topology, write_synthetic_export
+
+
+def test_synthetic_topology():
+    topology = synthetic_topology(50, config_lines=9, links_per_node=3)
+    assert len(topology["nodes"]) == 50
+    assert len(topology["links"]) == 49 * 3
+    assert topology["nodes"][1]["configuration"].count("\n") == 8
+    # every interface is used by exactly one link
+    interfaces = sum(len(node["interfaces"]) for node in topology["nodes"])
+    assert interfaces == 2 * len(topology["links"])
+
+    model = CML2Topology(topology)
+    assert len(model.get_lab_links()) == 49 * 3
+    assert topology == synthetic_topology(50, config_lines=9, links_per_node=3)
+
+
+@pytest.mark.parametrize("multi_config,expected", [(0.0, 0), (1.0, 10)])
+def test_synthetic_multi_config(multi_config, expected):
+    topology = synthetic_topology(10, multi_config=multi_config)
+    configs = [node["configuration"] for node in topology["nodes"]]
+    assert sum(isinstance(config, list) for config in configs) == expected
+
+
+def test_write_synthetic_export(tmp_path):
+    filename = tmp_path / "lab.yaml"
+    write_synthetic_export(filename, 20, multi_config=0.5)
+    assert read_cml2_topology(filename) == synthetic_topology(20, multi_config=0.5)
@@ -0,0 +1,99 @@
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import cml2tf.main
+import pytest
+import yaml
+from cml2tf.api import ConversionError, convert
+from cml2tf.validate import (
+    TopologyError,
+    check_topology,
+    is_identifier,
+    validate_topology,
+)
+
+from tests.synthetic import synthetic_topology
+
+
+@pytest.mark.parametrize("toponame", ["mini.yaml", "topology.yaml"])
+def test_validate_topology_valid(request, toponame):
+    topology_file = Path(request.path).parent / "testdata" / toponame
+    assert validate_topology(yaml.safe_load(topology_file.read_text())) == []
+    assert validate_topology(synthetic_topology(100, links_per_node=3)) == []
+    assert validate_topology({"lab": {}}) == []
+
+
+def test_is_identifier():
+    assert is_identifier("iosv-0") and is_identifier("_r1") and is_identifier("Ä1")
+    assert not is_identifier("0r") and not is_identifier("r 1")
+    assert (
+        not is_identifier("r.1") and not is_identifier("") and not is_identifier(None)
+    )
+
+
+def test_validate_topology_reports_every_error():
+    topology = synthetic_topology(4)
+    nodes, links = topology["nodes"], topology["links"]
+    nodes[1]["label"] = "node 1"
+    nodes[2]["label"] = "node-0"
+    nodes[3]["id"] = "n0"
+    nodes[0]["interfaces"].append({"id": "i9", "type": "physical"})
+    nodes[0]["interfaces"].append({"id": "lo0", "type": "loopback"})
+    links[0]["n1"] = "n7"
+    links[1]["i2"] = "i5"
+    links[2].update(id="l0", n1="n0", i1="lo0")
+
+    assert validate_topology(topology) == [
+        "Interface 'i9' on node 'n0' has no slot",
+        "Node 'n1' label 'node 1' is not a valid Terraform identifier",
+        "Node 'n2' label 'node-0' is already used by node 'n0'",
+        "Node ID 'n0' is used by more than one node",
+        "Interface ID 'i0' is used more than once on node 'n0'",
+        "Link 'l0' references missing node 'n7'",
+        "Link 'l1' references missing interface 'i5' on node 'n2'",
+        "Link ID 'l0' is used by more than one link",
+        "Link 'l0' connects interface 'lo0' on node 'n0' which has no slot",
+        "Link 'l0' references missing node 'n3'",
+    ]
+    with pytest.raises(TopologyError, match="has 10 errors") as error:
+        check_topology(topology)
+    assert len(error.value.errors) == 10
+    with pytest.raises(ConversionError) as error:
+        convert(topology)
+    assert len(error.value.errors) == 10
+
+
+def test_validate_topology_is_fast():
+    topology = synthetic_topology(10000, links_per_node=2)
+    topology["links"][-1]["n2"] = "missing"
+
+    start = time.perf_counter()
+    errors = validate_topology(topology)
+    elapsed = time.perf_counter() - start
+    assert errors == [
+        f"Link 'l{len(topology['links']) - 1}' references missing node 'missing'"
+    ]
+    assert elapsed < 1.0
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_main_invalid_topology_writes_nothing(tmp_path, capsys, stream):
+    topology = synthetic_topology(50)
+    topology["nodes"][10]["label"] = "node-1"
+    topology["links"][20]["n1"] = "n99"
+    lab = tmp_path / "lab.yaml"
+    lab.write_text(yaml.safe_dump(topology))
+    outdir = tmp_path / "out"
+
+    argv = ["prog", "-c", "-i", str(lab), "-o", str(outdir)]
+    with patch("sys.argv", argv + (["--stream"] if stream else [])):
+        with pytest.raises(SystemExit, match="1"):
+            cml2tf.main.main()
+    output = capsys.readouterr().out.splitlines()
+    assert output == [
+        "Error: Node 'n10' label 'node-1' is already used by node 'n1'",
+        "Error: Link 'l20' references missing node 'n99'",
+        "Error: The topology has 2 errors, nothing was converted.",
+    ]
+    assert list(tmp_path.iterdir()) == [lab]
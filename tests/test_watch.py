@@ -0,0 +1,110 @@
+import shutil
+import threading
+import time
+from argparse import Namespace
+from pathlib import Path
+
+import cml2tf.watch
+import pytest
+from cml2tf.watch import LabWatcher, file_digest, stat_inputs
+
+
+@pytest.fixture
+def lab(request, tmp_path):
+    testdata = Path(request.path).parent / "testdata"
+    lab = tmp_path / "mini.yaml"
+    shutil.copy(testdata / "mini.yaml", lab)
+    return lab
+
+
+@pytest.fixture
+def conversions(monkeypatch):
+    calls = []
+    convert_lab = cml2tf.watch.convert_lab
+
+    def counting_convert_lab(yaml_file, outdir, flags, capture=True):
+        calls.append((yaml_file, flags.force))
+        return convert_lab(yaml_file, outdir, flags, capture)
+
+    monkeypatch.setattr(cml2tf.watch, "convert_lab", counting_convert_lab)
+    return calls
+
+
+def flags(outdir=None):
+    return Namespace(
+        parser="auto",
+        outdir=outdir,
+        configs=False,
+        force=False,
+        shard=None,
+        shard_size=500,
+        template_cache=None,
+    )
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_stat_inputs_and_digest(lab, tmp_path):
+    assert list(stat_inputs([str(tmp_path)])) == [str(lab)]
+    assert stat_inputs([str(tmp_path / "missing.yaml")]) == {}
+    assert file_digest(str(lab)) == file_digest(str(lab))
+    assert file_digest(str(tmp_path / "missing.yaml")) is None
+
+
+def test_convert_changed_skips_unchanged_content(lab, tmp_path, conversions, capsys):
+    watcher = LabWatcher([str(lab)], flags(str(tmp_path / "out")))
+    assert [result.ok for result in watcher.convert_changed([str(lab)])] == [True]
+    assert (tmp_path / "out" / "main.tf").exists()
+
+    # Touching the file without changing it does not convert it again
+    lab.write_bytes(lab.read_bytes())
+    assert watcher.convert_changed([str(lab)]) == []
+
+    # Converting again overwrites the directory created by the first run
+    lab.write_text(lab.read_text().replace("mini", "mini2"))
+    assert [result.ok for result in watcher.convert_changed([str(lab)])] == [True]
+    assert conversions == [(str(lab), False), (str(lab), True)]
+    assert "Converted" in capsys.readouterr().out
+
+
+def test_convert_changed_prints_output(lab, tmp_path, capsys):
+    watcher = LabWatcher([str(lab)], flags(str(tmp_path / "out")))
+    watcher.convert_changed([str(lab)])
+    output = capsys.readouterr().out.splitlines()
+    assert f"3 files saved to '{tmp_path / 'out'}'." in output
+    assert output[-1].startswith(f"Converted {lab} -> ")
+
+    # The errors of a failed conversion are shown, not only the last line
+    lab.write_text(lab.read_text().replace("n1: n0", "n1: n9"))
+    assert [result.ok for result in watcher.convert_changed([str(lab)])] == [False]
+    output = capsys.readouterr().out.splitlines()
+    assert output == [
+        "Error: Link 'l0' references missing node 'n9'",
+        "Error: The topology has 1 error, nothing was converted.",
+        f"FAILED  {lab}: exit status 1",
+    ]
+
+
+def test_watcher_debounces_bursts(lab, tmp_path, conversions):
+    watcher = LabWatcher([str(tmp_path)], flags(str(tmp_path / "out")), True, 0.2, 0.01)
+    thread = threading.Thread(target=watcher.run)
+    thread.start()
+    try:
+        wait_for(lambda: len(conversions) == 1)
+        content = lab.read_text()
+        for number in range(5):
+            lab.write_text(content.replace("mini", f"mini{number}"))
+            time.sleep(0.02)
+        wait_for(lambda: len(conversions) == 2)
+        time.sleep(0.3)
+        assert len(conversions) == 2
+        main_tf = tmp_path / "out" / "mini" / "main.tf"
+        assert "mini4" in main_tf.read_text()
+    finally:
+        watcher.stop()
+        thread.join()
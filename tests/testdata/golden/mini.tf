@@ -0,0 +1,82 @@
+terraform {
+  required_providers {
+    cml2 = {
+      source = "registry.terraform.io/ciscodevnet/cml2"
+      version = ">=0.8.0"
+    }
+  }
+}
+
+provider "cml2" {
+  address  = var.address
+  username = var.username
+  password = var.password
+}
+
+resource "cml2_lab" "this" {
+  title = "mini"
+}
+
+
+resource "cml2_node" "ext-conn-0" {
+  lab_id         = cml2_lab.this.id
+  label          = "ext-conn-0"
+  nodedefinition = "external_connector"
+  configuration  = "NAT"
+  x              = -360
+  y              = -200
+}
+
+resource "cml2_node" "unmanaged-switch-0" {
+  lab_id         = cml2_lab.this.id
+  label          = "unmanaged-switch-0"
+  nodedefinition = "unmanaged_switch"
+  x              = -200
+  y              = -200
+}
+
+resource "cml2_node" "alpine-0" {
+  lab_id         = cml2_lab.this.id
+  label          = "alpine-0"
+  nodedefinition = "alpine"
+  configuration  = <<-EOT
+    # this is a shell script which will be sourced at boot
+    hostname alpine-0
+    # configurable user account
+    USERNAME=cisco
+    PASSWORD=cisco
+  EOT
+  x              = -40
+  y              = -200
+}
+
+
+
+resource "cml2_link" "l0" {
+  lab_id         = cml2_lab.this.id
+  node_a         = cml2_node.ext-conn-0.id
+  slot_a         = 0
+  node_b         = cml2_node.unmanaged-switch-0.id
+  slot_b         = 0
+}
+
+resource "cml2_link" "l1" {
+  lab_id         = cml2_lab.this.id
+  node_a         = cml2_node.unmanaged-switch-0.id
+  slot_a         = 1
+  node_b         = cml2_node.alpine-0.id
+  slot_b         = 0
+}
+
+
+resource "cml2_lifecycle" "lc" {
+  lab_id     = cml2_lab.this.id
+  # elements is still required up to version 0.7.0
+  elements   = []
+  # depends_on is the "native" replacement for elements
+  depends_on = [
+    cml2_link.l0,
+    cml2_link.l1,
+  ]
+  state = "STARTED"
+}
\ No newline at end of file
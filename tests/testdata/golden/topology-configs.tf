@@ -0,0 +1,158 @@
+terraform {
+  required_providers {
+    cml2 = {
+      source = "registry.terraform.io/ciscodevnet/cml2"
+      version = ">=0.8.0"
+    }
+  }
+}
+
+provider "cml2" {
+  address  = var.address
+  username = var.username
+  password = var.password
+}
+
+resource "cml2_lab" "this" {
+  title = "devwks-2722-initial"
+}
+
+
+resource "cml2_node" "ext-conn-0" {
+  lab_id         = cml2_lab.this.id
+  label          = "ext-conn-0"
+  nodedefinition = "external_connector"
+  configuration  = file("ext-conn-0-default.cfg")
+  x              = -440
+  y              = -240
+}
+
+resource "cml2_node" "iol-l2-0" {
+  lab_id         = cml2_lab.this.id
+  label          = "iol-l2-0"
+  nodedefinition = "ioll2-xe"
+  configuration  = file("iol-l2-0-ios_config.txt.cfg")
+  x              = -200
+  y              = -240
+}
+
+resource "cml2_node" "iol-0" {
+  lab_id         = cml2_lab.this.id
+  label          = "iol-0"
+  nodedefinition = "iol-xe"
+  configuration  = file("iol-0-ios_config.txt.cfg")
+  x              = -40
+  y              = -360
+}
+
+resource "cml2_node" "iol-1" {
+  lab_id         = cml2_lab.this.id
+  label          = "iol-1"
+  nodedefinition = "iol-xe"
+  configuration  = file("iol-1-ios_config.txt.cfg")
+  x              = -40
+  y              = -120
+}
+
+resource "cml2_node" "iol-2" {
+  lab_id         = cml2_lab.this.id
+  label          = "iol-2"
+  nodedefinition = "iol-xe"
+  configuration  = file("iol-2-ios_config.txt.cfg")
+  x              = 120
+  y              = -240
+}
+
+resource "cml2_node" "alpine-0" {
+  lab_id         = cml2_lab.this.id
+  label          = "alpine-0"
+  nodedefinition = "alpine"
+  configuration  = file("alpine-0-node.cfg.cfg")
+  x              = 320
+  y              = -240
+}
+
+
+
+resource "cml2_link" "l0" {
+  lab_id         = cml2_lab.this.id
+  node_a         = cml2_node.ext-conn-0.id
+  slot_a         = 0
+  node_b         = cml2_node.iol-l2-0.id
+  slot_b         = 0
+}
+
+resource "cml2_link" "l1" {
+  lab_id         = cml2_lab.this.id
+  node_a         = cml2_node.iol-l2-0.id
+  slot_a         = 1
+  node_b         = cml2_node.iol-0.id
+  slot_b         = 0
+}
+
+resource "cml2_link" "l2" {
+  lab_id         = cml2_lab.this.id
+  node_a         = cml2_node.iol-l2-0.id
+  slot_a         = 2
+  node_b         = cml2_node.iol-2.id
+  slot_b         = 0
+}
+
+resource "cml2_link" "l3" {
+  lab_id         = cml2_lab.this.id
+  node_a         = cml2_node.iol-l2-0.id
+  slot_a         = 3
+  node_b         = cml2_node.iol-1.id
+  slot_b         = 0
+}
+
+resource "cml2_link" "l4" {
+  lab_id         = cml2_lab.this.id
+  node_a         = cml2_node.iol-0.id
+  slot_a         = 1
+  node_b         = cml2_node.iol-1.id
+  slot_b         = 1
+}
+
+resource "cml2_link" "l5" {
+  lab_id         = cml2_lab.this.id
+  node_a         = cml2_node.iol-0.id
+  slot_a         = 2
+  node_b         = cml2_node.iol-2.id
+  slot_b         = 1
+}
+
+resource "cml2_link" "l6" {
+  lab_id         = cml2_lab.this.id
+  node_a         = cml2_node.iol-2.id
+  slot_a         = 2
+  node_b         = cml2_node.iol-1.id
+  slot_b         = 2
+}
+
+resource "cml2_link" "l7" {
+  lab_id         = cml2_lab.this.id
+  node_a         = cml2_node.iol-2.id
+  slot_a         = 3
+  node_b         = cml2_node.alpine-0.id
+  slot_b         = 0
+}
+
+
+resource "cml2_lifecycle" "lc" {
+  lab_id     = cml2_lab.this.id
+  # elements is still required up to version 0.7.0
+  elements   = []
+  # depends_on is the "native" replacement for elements
+  depends_on = [
+    cml2_link.l0,
+    cml2_link.l1,
+    cml2_link.l2,
+    cml2_link.l3,
+    cml2_link.l4,
+    cml2_link.l5,
+    cml2_link.l6,
+    cml2_link.l7,
+  ]
+  state = "STARTED"
+}
\ No newline at end of file
@@ -0,0 +1,442 @@
+terraform {
+  required_providers {
+    cml2 = {
+      source = "registry.terraform.io/ciscodevnet/cml2"
+      version = ">=0.8.0"
+    }
+  }
+}
+
+provider "cml2" {
+  address  = var.address
+  username = var.username
+  password = var.password
+}
+
+resource "cml2_lab" "this" {
+  title = "devwks-2722-initial"
+}
+
+
+resource "cml2_node" "ext-conn-0" {
+  lab_id         = cml2_lab.this.id
+  label          = "ext-conn-0"
+  nodedefinition = "external_connector"
+  configuration  = "NAT"
+  x              = -440
+  y              = -240
+}
+
+resource "cml2_node" "iol-l2-0" {
+  lab_id         = cml2_lab.this.id
+  label          = "iol-l2-0"
+  nodedefinition = "ioll2-xe"
+  configuration  = <<-EOT
+    ! IOSvL2 Config generated on 2024-01-15 17:40
+    ! by ank-ng
+    !
+    version 15.2
+    service timestamps debug datetime msec
+    service timestamps log datetime msec
+    no service password-encryption
+    service compress-config
+    no service config
+    enable password devwks-2722
+    ip classless
+    ip subnet-zero
+    ip domain lookup
+    ip domain name virl.lab
+    !
+    crypto key generate rsa general-keys modulus 2048
+    !
+    username admin priv 15 password devwks-2722
+    !
+    line vty 0 4
+    transport input ssh
+    exec-timeout 720 0
+    login local
+    !
+    line con 0
+    password devwks-2722
+    !
+    hostname iol-l2-0
+    !
+    boot-start-marker
+    boot-end-marker
+    !
+    !
+    no aaa new-model
+    !
+    vtp domain virl.lab
+    vtp mode transparent
+    !
+    vlan 2
+      name ank_vlan2
+    !
+    !
+    cdp run
+    !
+    !
+    ip cef
+    no ipv6 cef
+    !
+    spanning-tree mode pvst
+    spanning-tree extend system-id
+    !
+    vlan internal allocation policy ascending
+    !
+    !
+    vrf definition Mgmt-intf
+    !
+     address-family ipv4
+     exit-address-family
+     !
+     address-family ipv6
+     exit-address-family
+    !
+    !
+    interface Loopback0
+        description not connected
+        shutdown
+    interface Ethernet0/0
+        description to port.ext-conn-0
+        no shutdown
+    interface Ethernet0/1
+        description to Ethernet0/0.iol-0
+        no shutdown
+    interface Ethernet0/2
+        description to Ethernet0/0.iol-2
+        no shutdown
+    interface Ethernet0/3
+        description to Ethernet0/0.iol-1
+        no shutdown
+    !
+    interface vlan 1
+        ip address dhcp
+        no shutdown
+    !
+    !
+    ip forward-protocol nd
+    !
+    no ip http server
+    no ip http secure-server
+    !
+    !
+    control-plane
+    !
+    ntp server time.windows.com prefer
+    !
+    end
+  EOT
+  x              = -200
+  y              = -240
+}
+
+resource "cml2_node" "iol-0" {
+  lab_id         = cml2_lab.this.id
+  label          = "iol-0"
+  nodedefinition = "iol-xe"
+  configuration  = <<-EOT
+    ! IOS Config generated on 2024-01-15 17:40
+    ! by ank-ng
+    !
+    hostname iol-0
+    boot-start-marker
+    boot-end-marker
+    !
+    !
+    no aaa new-model
+    !
+    !
+    service timestamps debug datetime msec
+    service timestamps log datetime msec
+    no service password-encryption
+    no service config
+    enable password cisco
+    enable secret cisco
+    ip classless
+    ip subnet-zero
+    no ip domain lookup
+    ip domain name virl.info
+    crypto key generate rsa modulus 768
+    ip ssh server algorithm authentication password
+    username cisco privilege 15 secret cisco
+    line vty 0 4
+     transport input ssh telnet
+     exec-timeout 720 0
+     password cisco
+     login local
+    line con 0
+     password cisco
+    !
+    cdp run
+    !
+    !
+    interface Loopback0
+        description not connected
+        no ip address
+        shutdown
+    interface Ethernet0/0
+        description to Ethernet0/1.iol-l2-0
+        ip address dhcp
+        no shutdown
+    interface Ethernet0/1
+        description to Ethernet0/1.iol-1
+        ip address 172.16.16.1 255.255.255.252
+        no shutdown
+    interface Ethernet0/2
+        description to Ethernet0/1.iol-2
+        ip address 172.16.16.5 255.255.255.252
+        no shutdown
+    interface Ethernet0/3
+        description not connected
+        no ip address
+        shutdown
+    !
+    !
+    end
+  EOT
+  x              = -40
+  y              = -360
+}
+
+resource "cml2_node" "iol-1" {
+  lab_id         = cml2_lab.this.id
+  label          = "iol-1"
+  nodedefinition = "iol-xe"
+  configuration  = <<-EOT
+    ! IOS Config generated on 2024-01-15 17:40
+    ! by ank-ng
+    !
+    hostname iol-1
+    boot-start-marker
+    boot-end-marker
+    !
+    !
+    no aaa new-model
+    !
+    !
+    service timestamps debug datetime msec
+    service timestamps log datetime msec
+    no service password-encryption
+    no service config
+    enable password cisco
+    enable secret cisco
+    ip classless
+    ip subnet-zero
+    no ip domain lookup
+    ip domain name virl.info
+    crypto key generate rsa modulus 768
+    ip ssh server algorithm authentication password
+    username cisco privilege 15 secret cisco
+    line vty 0 4
+     transport input ssh telnet
+     exec-timeout 720 0
+     password cisco
+     login local
+    line con 0
+     password cisco
+    !
+    cdp run
+    !
+    !
+    interface Loopback0
+        description not connected
+        no ip address
+        shutdown
+    interface Ethernet0/0
+        description to Ethernet0/3.iol-l2-0
+        ip address dhcp
+        no shutdown
+    interface Ethernet0/1
+        description to Ethernet0/1.iol-0
+        ip address 172.16.16.2 255.255.255.252
+        no shutdown
+    interface Ethernet0/2
+        description to Ethernet0/2.iol-2
+        ip address 172.16.16.9 255.255.255.252
+        no shutdown
+    interface Ethernet0/3
+        description not connected
+        no ip address
+        shutdown
+    !
+    !
+    end
+  EOT
+  x              = -40
+  y              = -120
+}
+
+resource "cml2_node" "iol-2" {
+  lab_id         = cml2_lab.this.id
+  label          = "iol-2"
+  nodedefinition = "iol-xe"
+  configuration  = <<-EOT
+    ! IOS Config generated on 2024-01-15 17:40
+    ! by ank-ng
+    !
+    hostname iol-2
+    boot-start-marker
+    boot-end-marker
+    !
+    !
+    no aaa new-model
+    !
+    !
+    service timestamps debug datetime msec
+    service timestamps log datetime msec
+    no service password-encryption
+    no service config
+    enable password cisco
+    enable secret cisco
+    ip classless
+    ip subnet-zero
+    no ip domain lookup
+    ip domain name virl.info
+    crypto key generate rsa modulus 768
+    ip ssh server algorithm authentication password
+    username cisco privilege 15 secret cisco
+    line vty 0 4
+     transport input ssh telnet
+     exec-timeout 720 0
+     password cisco
+     login local
+    line con 0
+     password cisco
+    !
+    cdp run
+    !
+    ip dhcp excluded-address 172.16.17.1 172.16.17.127
+    !
+    ip dhcp pool local-e0-3
+     network 172.16.17.0 255.255.255.0
+     lease 0 0 10
+    !
+    interface Loopback0
+        description not connected
+        no ip address
+        shutdown
+    interface Ethernet0/0
+        description to Ethernet0/2.iol-l2-0
+        ip address dhcp
+        no shutdown
+    interface Ethernet0/1
+        description to Ethernet0/2.iol-0
+        ip address 172.16.16.6 255.255.255.252
+        no shutdown
+    interface Ethernet0/2
+        description to Ethernet0/2.iol-1
+        ip address 172.16.16.10 255.255.255.252
+        no shutdown
+    interface Ethernet0/3
+        description to eth0.alpine-0
+        ip address 172.16.17.1 255.255.255.0
+        no shutdown
+    !
+    !
+    end
+  EOT
+  x              = 120
+  y              = -240
+}
+
+resource "cml2_node" "alpine-0" {
+  lab_id         = cml2_lab.this.id
+  label          = "alpine-0"
+  nodedefinition = "alpine"
+  configuration  = <<-EOT
+    # this is a shell script which will be sourced at boot
+    hostname alpine-0
+    # configurable user account
+    USERNAME=cisco
+    PASSWORD=cisco
+  EOT
+  x              = 320
+  y              = -240
+}
+
+
+
+resource "cml2_link" "l0" {
+  lab_id         = cml2_lab.this.id
+  node_a         = cml2_node.ext-conn-0.id
+  slot_a         = 0
+  node_b         = cml2_node.iol-l2-0.id
+  slot_b         = 0
+}
+
+resource "cml2_link" "l1" {
+  lab_id         = cml2_lab.this.id
+  node_a         = cml2_node.iol-l2-0.id
+  slot_a         = 1
+  node_b         = cml2_node.iol-0.id
+  slot_b         = 0
+}
+
+resource "cml2_link" "l2" {
+  lab_id         = cml2_lab.this.id
+  node_a         = cml2_node.iol-l2-0.id
+  slot_a         = 2
+  node_b         = cml2_node.iol-2.id
+  slot_b         = 0
+}
+
+resource "cml2_link" "l3" {
+  lab_id         = cml2_lab.this.id
+  node_a         = cml2_node.iol-l2-0.id
+  slot_a         = 3
+  node_b         = cml2_node.iol-1.id
+  slot_b         = 0
+}
+
+resource "cml2_link" "l4" {
+  lab_id         = cml2_lab.this.id
+  node_a         = cml2_node.iol-0.id
+  slot_a         = 1
+  node_b         = cml2_node.iol-1.id
+  slot_b         = 1
+}
+
+resource "cml2_link" "l5" {
+  lab_id         = cml2_lab.this.id
+  node_a         = cml2_node.iol-0.id
+  slot_a         = 2
+  node_b         = cml2_node.iol-2.id
+  slot_b         = 1
+}
+
+resource "cml2_link" "l6" {
+  lab_id         = cml2_lab.this.id
+  node_a         = cml2_node.iol-2.id
+  slot_a         = 2
+  node_b         = cml2_node.iol-1.id
+  slot_b         = 2
+}
+
+resource "cml2_link" "l7" {
+  lab_id         = cml2_lab.this.id
+  node_a         = cml2_node.iol-2.id
+  slot_a         = 3
+  node_b         = cml2_node.alpine-0.id
+  slot_b         = 0
+}
+
+
+resource "cml2_lifecycle" "lc" {
+  lab_id     = cml2_lab.this.id
+  # elements is still required up to version 0.7.0
+  elements   = []
+  # depends_on is the "native" replacement for elements
+  depends_on = [
+    cml2_link.l0,
+    cml2_link.l1,
+    cml2_link.l2,
+    cml2_link.l3,
+    cml2_link.l4,
+    cml2_link.l5,
+    cml2_link.l6,
+    cml2_link.l7,
+  ]
+  state = "STARTED"
+}
\ No newline at end of file